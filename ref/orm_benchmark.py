@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""Benchmark of the raw SQL and Tortoise ORM database layers.
+
+Times the bulk writes and leaderboard query of each layer on a scratch copy
+of the core schema:
+    python ref/orm_benchmark.py --users 5000
+"""
+
+import aiosqlite
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'twitch_bot')
+)
+
+from tortoise import Tortoise  # noqa: E402
+
+from database import database_utils, migration_utils  # noqa: E402
+from database.database_models import Users  # noqa: E402
+
+# Rows written per statement by the ORM bulk operations.
+BATCH_SIZE = 500
+
+
+async def create_schema(db_path: str) -> None:
+    """Apply the core migrations to a new database."""
+    async with aiosqlite.connect(db_path) as connection:
+        # The migrations call the time helpers registered as SQL functions.
+        await database_utils.register_functions(connection)
+        for _, _, path in await migration_utils.find_migrations(
+            migration_utils.CORE_MIGRATIONS_PATH
+        ):
+            with open(path, 'r') as in_file:
+                script = in_file.read()
+            for statement in await migration_utils.split_statements(script):
+                await connection.execute(statement)
+        await connection.commit()
+
+
+async def timed(results: dict, name: str, coroutine: object) -> None:
+    """Time a coroutine and store the result in seconds."""
+    start = time.perf_counter()
+    await coroutine
+    results[name] = time.perf_counter() - start
+
+
+async def bench_raw(db_path: str, users: list) -> dict:
+    """Benchmark the raw SQL layer."""
+    results = {}
+    async with aiosqlite.connect(db_path) as connection:
+
+        async def insert():
+            await connection.executemany(
+                'INSERT INTO users (username, user_id, loyalty_points) '
+                'VALUES (?, ?, ?);',
+                [(u['username'], u['user_id'], 0) for u in users],
+            )
+            await connection.commit()
+
+        async def update():
+            await connection.executemany(
+                'UPDATE users SET loyalty_points = loyalty_points + ? '
+                'WHERE id = ?;',
+                [(u['loyalty_points'], i + 1) for i, u in enumerate(users)],
+            )
+            await connection.commit()
+
+        async def leaderboard():
+            async with connection.execute(
+                'SELECT username, loyalty_points FROM users '
+                'ORDER BY loyalty_points DESC LIMIT 10;'
+            ) as cursor:
+                await cursor.fetchall()
+
+        await timed(results, 'insert', insert())
+        await timed(results, 'update', update())
+        await timed(results, 'leaderboard', leaderboard())
+
+    return results
+
+
+async def bench_orm(db_path: str, users: list) -> dict:
+    """Benchmark the Tortoise ORM layer."""
+    results = {}
+    await Tortoise.init(
+        db_url=f'sqlite://{db_path}',
+        modules={'models': ['database.database_models']},
+    )
+
+    async def insert():
+        await Users.bulk_create(
+            [
+                Users(username=u['username'], user_id=u['user_id'])
+                for u in users
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+    async def update():
+        points = {i + 1: u['loyalty_points'] for i, u in enumerate(users)}
+        rows = await Users.filter(id__in=list(points))
+        for row in rows:
+            row.loyalty_points = points[row.id]
+        await Users.bulk_update(
+            rows, ['loyalty_points'], batch_size=BATCH_SIZE
+        )
+
+    async def leaderboard():
+        await Users.all().order_by('-loyalty_points').limit(10)
+
+    await timed(results, 'insert', insert())
+    await timed(results, 'update', update())
+    await timed(results, 'leaderboard', leaderboard())
+
+    await Tortoise.close_connections()
+
+    return results
+
+
+async def run(user_count: int) -> None:
+    """Run both benchmarks and print the timings."""
+    users = [
+        {'username': f'user{i}', 'user_id': i, 'loyalty_points': i % 97}
+        for i in range(1, user_count + 1)
+    ]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, bench in [('raw', bench_raw), ('orm', bench_orm)]:
+            db_path = os.path.join(temp_dir, f'{name}.db')
+            await create_schema(db_path)
+            results[name] = await bench(db_path, users)
+
+    print(f'{user_count} users')
+    print(f'{"operation":<12}{"raw (s)":>10}{"orm (s)":>10}')
+    for operation in results['raw']:
+        print(
+            f'{operation:<12}{results["raw"][operation]:>10.4f}'
+            f'{results["orm"][operation]:>10.4f}'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=5000)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.users))
@@ -1,17 +1,24 @@
 """Functions for getting Twitch Data."""
 
 import hashlib
-from typing import Callable, Optional
+from typing import Callable, Optional, Union
 
 from configs import config_utils
 from init import CACHE
 from server_utils import get_request, patch_request, post_request
 
+# Time in seconds API calls are cached and the number of calls kept.
+API_CACHE_TTL = 6 * 60 * 60
+API_CACHE_SIZE = 1000
+
 
 def check_cache(func: Callable) -> Callable:
     """Decorator to check if the API call has been cached.
 
-    This is only applicable if the arguments are the same as well.
+    This is only applicable if the arguments are the same as well. Calls are
+    kept for API_CACHE_TTL seconds each, and the least recently used ones are
+    dropped past API_CACHE_SIZE. Only use it for data that rarely changes,
+    live data (streams, followers, chatters) must not be cached.
     """
 
     async def wrapper(*args: list, **kwargs: dict) -> dict or list:
@@ -26,37 +33,32 @@ def check_cache(func: Callable) -> Callable:
         Returns:
             data (dict or list): Data from the API call.
         """
-        api_cache = await CACHE.get('api')
-        if not api_cache:
-            api_cache = await CACHE.add('api', {}, 360)
-
-        func_name = func.__name__
-
-        if func_name not in api_cache.data:
-            api_cache.data[func_name] = {}
+        api_cache = CACHE.namespace('api', API_CACHE_SIZE)
 
         # Convert the arguments to a string and hash it for comparison.
         all_args = ','.join([str(a) for a in args]) + ','.join(
             [f'{k}:{v}' for (k, v) in kwargs.items()]
         )
-        args_hash = hashlib.md5(all_args.encode('utf-8'))
+        args_hash = hashlib.md5(all_args.encode('utf-8')).hexdigest()
+        key = f'{func.__name__}/{args_hash}'
 
-        # If the function has been called before and the argument hash matches,
+        # If the function has been called before with the same arguments,
         # load the cached data.
-        if args_hash in api_cache.data[func_name]:
-            data = api_cache.data[func_name][args_hash]
+        entry = api_cache.entry(key)
+        if entry is not None:
+            return entry.data
 
-        # Otherwise, call the function and cache the returned data.
-        else:
-            data = await func(*args, **kwargs)
-            api_cache.data[func_name][args_hash] = data
+        # Otherwise, call the function and cache the returned data. Empty
+        # responses, e.g. from a failed call, are not cached.
+        data = await func(*args, **kwargs)
+        if data:
+            api_cache.set(key, data, ttl=API_CACHE_TTL)
 
         return data
 
     return wrapper
 
 
-@check_cache
 async def get_channel_data(auth: object, channel_name: str) -> dict:
     """Get the information about a channel.
 
@@ -234,23 +236,27 @@ async def get_global_emotes(auth: object) -> dict:
     return data.get('data', [])
 
 
-@check_cache
-async def get_stream_data(auth: object, user_id: str) -> dict:
-    """Get stream data.
+async def fetch_stream_data(auth: object, user_id: Union[str, list]) -> list:
+    """Get the current stream data, bypassing the cache.
+
+    Used for polling, where every call needs fresh data and caching each
+    response would only grow the cache.
 
     Args:
         auth (Auth): App access info class.
-        user_id (str): Twitch user ID.
+        user_id (str|list): Twitch user ID or a list of up to 100 IDs to get
+            the data for several channels in one request.
 
     Returns:
-        (dict): Stream data.
+        (list): Stream data of the channels that are live.
     """
     url = 'https://api.twitch.tv/helix/streams'
     headers = {
         'Client-Id': auth.client_id,
         'Authorization': f'Bearer {auth.bearer}',
     }
-    params = {'user_id': user_id}
+    user_ids = user_id if isinstance(user_id, list) else [user_id]
+    params = [('user_id', str(uid)) for uid in user_ids[:100]]
 
     response_code, data = await get_request(url, headers, params)
 
@@ -264,7 +270,20 @@ async def get_stream_data(auth: object, user_id: str) -> dict:
     return data.get('data', [])
 
 
-@check_cache
+async def get_stream_data(auth: object, user_id: Union[str, list]) -> list:
+    """Get stream data.
+
+    Args:
+        auth (Auth): App access info class.
+        user_id (str|list): Twitch user ID or a list of up to 100 IDs to get
+            the data for several channels in one request.
+
+    Returns:
+        (list): Stream data of the channels that are live.
+    """
+    return await fetch_stream_data(auth, user_id)
+
+
 async def get_follow_count(auth: object, user_id: int = None) -> int:
     """Get the follow count for a user.
 
@@ -294,7 +313,6 @@ async def get_follow_count(auth: object, user_id: int = None) -> int:
     return data.get('total', 0)
 
 
-@check_cache
 async def get_follow_data(
     auth: object, from_id: Optional[str] = None, to_id: Optional[str] = None
 ) -> dict:
@@ -355,7 +373,6 @@ async def get_follow_data(
     return data_dict[0] if data_dict else {}
 
 
-@check_cache
 async def get_chatters(channel_name: str) -> dict:
     """Get a dictionary of people chatting in the stream.
 
@@ -375,7 +392,6 @@ async def get_chatters(channel_name: str) -> dict:
     return data.get('chatters', {})
 
 
-@check_cache
 async def get_subscribers(auth: object, user_id: Optional[int] = None) -> list:
     """Get the subscribers for the given broadcaster.
 
@@ -459,7 +475,6 @@ async def create_marker(
     return data.get('data', [])
 
 
-@check_cache
 async def get_schedule(auth: object, segments: Optional[int] = 3) -> dict:
     """Get the stream schedule for the given broadcaster.
 
@@ -493,7 +508,6 @@ async def get_schedule(auth: object, segments: Optional[int] = 3) -> dict:
     return data.get('data', {})
 
 
-@check_cache
 async def get_goals(auth: object) -> list:
     """Get the goals for the given broadcaster.
 
@@ -526,7 +540,6 @@ async def get_goals(auth: object) -> list:
     return data.get('data', [])
 
 
-@check_cache
 async def get_chat_settings(auth: object) -> dict:
     """Get the chat settings for the given broadcaster.
 
@@ -2,7 +2,6 @@
 
 import asyncio
 import re
-import sqlite3
 import traceback
 
 from datetime import datetime
@@ -10,7 +9,7 @@ from datetime import datetime
 import api
 import auth
 import plugin_loader
-import utils
+import time_utils
 
 from commands import commands
 from configs import config_utils
@@ -23,11 +22,24 @@ from log import LOG
 from moderator import moderator
 from obs import obs_utils
 from tcp_utils import TCPServer
+from viewer_sampler import ViewerSampler
 
 from chat.chat_connection import ChatConnection
+from database.analytics import AnalyticsDatabase
+from database.backup import BackupScheduler
+from database.export import StreamExporter
+from database.plugin_schema import PluginSchema
+from database.plugin_state import PluginStateStore
+from database.retention import RetentionManager
+from database.rollups import ViewerRollups
+from database.stream_counters import StreamCounters
+from database.user_repository import UserRepository
 from hotkeys.hotkeys import Hotkeys
 from loyalty.loyalty_manager import LoyaltyManager
+from loyalty.presence import PresenceTracker
 from obs.obs_connection import OBSConnection
+from reports.stream_report import StreamReporter
+from reports.trends import StreamTrends
 
 USER_REGEX = re.compile(r'(@[\w]+)')
 
@@ -117,6 +129,46 @@ class TwitchBot(object):
         # Initialize the database connection.
         self.db = await database_utils.Database().init()
 
+        # Initialize the in-memory user data.
+        self.users = await UserRepository().init(self)
+
+        # Initialize the in-memory stream stats counters.
+        self.counters = await StreamCounters().init(self)
+
+        # Initialize the plugin state store.
+        self.plugin_state = await PluginStateStore().init(self)
+        self.plugin_schema = await PluginSchema().init(self)
+
+        # Initialize the viewer stats rollups.
+        self.rollups = await ViewerRollups().init(self)
+
+        # Initialize the viewer count sampling.
+        self.viewer_sampler = await ViewerSampler().init(self)
+
+        # Initialize the plugin table retention.
+        self.retention = await RetentionManager().init(self)
+
+        # Initialize the scheduled database backups.
+        self.backups = await BackupScheduler().init(self)
+
+        # Initialize the read-only snapshot for heavy queries. Without one
+        # they run on the main database.
+        self.analytics = self.db
+        if self.twitch_config.get('analytics_refresh', 15):
+            analytics = await AnalyticsDatabase().init(self)
+            if analytics.connection:
+                self.analytics = analytics
+
+        # Initialize the stream history export.
+        self.exporter = await StreamExporter().init(self)
+
+        # Initialize the stream recap reports.
+        self.reports = await StreamReporter().init(self)
+
+        # Initialize the cross-stream trends and load the cached ones.
+        self.trends = await StreamTrends().init(self)
+        await self.trends.get_trends()
+
         # Load all the plugins.
         await self._initialize_plugins()
 
@@ -141,6 +193,9 @@ class TwitchBot(object):
         # Initialize the loyalty manager.
         self.loyalty_manager = await LoyaltyManager().init(self)
 
+        # Initialize the presence tracking for watch time and view points.
+        self.presence = await PresenceTracker().init(self)
+
         # Initialize TCP server.
         self.tcp_server = tcp_server
 
@@ -159,52 +214,22 @@ class TwitchBot(object):
     async def _initialize_plugins(self, do_reload: bool = False) -> None:
         """Initialize the plugins.
 
-        If a database table does not already exist for the plugin, create one.
-        If the table requires a reset, perform that as well.
+        Plugins with fields get a table if it does not already exist, the
+        others keep everything in the plugin state. If the plugin requires a
+        reset, perform that as well. Plugins whose schema didn't change
+        since the last start are skipped. Fails if the tables can't be set
+        up, since the plugins and their migrations need them.
 
         Args:
             reload (bool): Used to signal that the plugins should be reloaded.
         """
         self.plugins = await plugin_loader.load_plugins(do_reload)
 
-        for category in self.plugins:
-            for command in self.plugins[category]:
-                plugin = self.plugins[category][command]
-                plugin_name = plugin.__name__
-                LOG.debug(f'Initializing {plugin_name}')
-
-                has_table = hasattr(plugin, 'TABLE')
-                has_fields = hasattr(plugin, 'FIELDS')
-
-                if has_table and has_fields:
-                    # Create a default table for the plugin.
-                    await self.db.create_table(plugin_name, None)
-                    # Create the custom table with the custom fields.
-                    await self.db.create_table(plugin.TABLE, plugin.FIELDS)
+        # Don't reset the tables if reloading the plugins.
+        await self.plugin_schema.bootstrap(self.plugins, reset=not do_reload)
 
-                elif not has_table and has_fields:
-                    # Create the default table with the custom fields.
-                    await self.db.create_table(plugin_name, plugin.FIELDS)
-
-                else:
-                    # Create a default table for the plugin.
-                    await self.db.create_table(plugin_name, None)
-
-                # Don't reset the tables if reloading the plugins.
-                if do_reload:
-                    return
-
-                # Reset the given field values in the table.
-                if hasattr(plugin, 'RESET'):
-                    reset_fields = plugin.RESET
-                    reset_fields['last_user_id'] = self.BOT_USER_ID
-
-                    if has_table:
-                        # Reset the given fields for the custom table.
-                        await self.db.insert(plugin.TABLE, reset_fields)
-                    else:
-                        # Reset the given fields for the default plugin table.
-                        await self.db.insert(plugin_name, reset_fields)
+        # Apply the plugin schema migrations once their tables exist.
+        await self.db.migrator.migrate_plugins(self.plugins)
 
     async def dispatch_command(
         self, event: Event, user: dict, command: str, command_args: list[str]
@@ -243,13 +268,11 @@ class TwitchBot(object):
             )
             return
 
-        # Get the last row of the table
-        last_row = await self.db.get_last_row(plugin_name)
-        if last_row:
-            row_dict = dict(last_row)
-            last_run = await utils.parse_datetime(row_dict.get('last_run'))
-            delta = datetime.now() - last_run
-            delta_minutes = delta.seconds / 60
+        # Get the last run from the plugin state.
+        row_dict = await self.plugin_state.items(plugin_name)
+        if row_dict.get('last_run'):
+            delta = time_utils.now_ms() - row_dict['last_run']
+            delta_minutes = delta / 60000
 
             # Check for a plugin timeout.
             if hasattr(plugin, 'TIMEOUT'):
@@ -388,8 +411,8 @@ class TwitchBot(object):
                 )
                 return
 
-    async def _get_user_db_data(self, user_data: dict) -> sqlite3.Row:
-        """Get the user data from the database.
+    async def _get_user_db_data(self, user_data: dict) -> dict:
+        """Get the user data from the user repository.
 
         If the user does not exist, they are added.
 
@@ -397,26 +420,9 @@ class TwitchBot(object):
             user_data (dict): User data from Twitch.
 
         Returns:
-            (sqlite3.Row): Row containing the user data from the database.
+            (dict): Row containing the user data from the database.
         """
-        # Get the user data from the databse if it exists.
-        user_db_data = await self.db.read(
-            'users', queries={'username': user_data['login']}
-        )
-
-        # If the user is not in the database, add them.
-        if not user_db_data:
-            LOG.debug('New user, adding.')
-            update_dict = {
-                'username': user_data['login'],
-                'user_id': user_data['id'],
-                'last_join_time': str(datetime.now()),
-            }
-            await self.db.insert('users', update_dict)
-
-        return await self.db.read(
-            'users', queries={'username': user_data['login']}
-        )
+        return await self.users.get(user_data)
 
     async def run(self) -> None:
         """Main functionality of the bot."""
@@ -1,73 +1,517 @@
 """Data Cache.
 
 Transient arbitrary data storage.
+
+Data lives in namespaces (CacheStore), each a dictionary of entries with
+synchronous O(1) get and set. Entries can expire: their expiry times are kept
+in a min-heap, so removing the expired entries only looks at the ones that
+are due instead of every key. A namespace can also be bounded in size, in
+which case the least recently used entries are evicted first.
+
+Namespaces are hierarchical, their names are paths like 'plugins/raffle'.
+The keys of a namespace are also kept sorted, so the keys under a prefix are
+found with a binary search instead of scanning every key, which works for
+hierarchical keys such as 'get_channel_data/<hash>' too. Regex searches are
+restricted to a single namespace.
+
+Each namespace counts its hits, misses, expirations and evictions, which
+Cache.report() publishes to the metrics together with the entry counts and an
+approximate size, sampled with sys.getsizeof.
+
+Cache keeps the original async API (add, get, exists, ...) on the default
+namespace, so existing callers keep working, and hands out the namespaces:
+    raffle = CACHE.namespace('plugins/raffle')
+    raffle.set('users', [], ttl=3600)
 """
 
 import asyncio
+import bisect
 import datetime
+import heapq
 import re
+import sys
+import time
 import traceback
 
-from typing import Optional
+from collections import OrderedDict
+from typing import Any, Optional, Pattern, Union
+
+# Namespace used by the async API.
+DEFAULT_NAMESPACE = ''
+
+# Separator of the namespace paths.
+SEPARATOR = '/'
+
+# Entries measured per namespace to estimate its size.
+SIZE_SAMPLES = 32
+
+
+def approximate_size(value: Any) -> int:
+    """Approximate the memory used by a value.
+
+    Containers add the shallow size of their items, nested containers are
+    not followed.
+
+    Args:
+        value (any): Value to measure.
+
+    Returns:
+        (int): Size in bytes.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += sys.getsizeof(key) + sys.getsizeof(item)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += sys.getsizeof(item)
+
+    return size
 
 
 class CacheData(object):
     """Object for storing data in the cache."""
 
-    def __init__(self, data: object, duration: Optional[int] = None) -> None:
+    __slots__ = ('data', 'creation_time', 'expires_at', 'sequence')
+
+    def __init__(
+        self,
+        data: object,
+        ttl: Optional[float] = None,
+        sequence: Optional[int] = 0,
+    ) -> None:
         """Init.
 
         Args:
             data (object): Value to store.
-            duration (int, optional): Length of time in minutes to store the
-                data.
-                Default is no duration.
+            ttl (float, optional): Length of time in seconds to store the
+                data. Default is no expiry.
+            sequence (int, optional): Version of the entry in its namespace.
         """
         super(CacheData, self).__init__()
 
         self.data = data
-        self.creation_time = datetime.datetime.now()
+        self.creation_time = time.monotonic()
+        self.expires_at = self.creation_time + ttl if ttl else None
+        self.sequence = sequence
 
-        if duration:
-            self.duration = datetime.timedelta(minutes=duration)
-            self.expiration = self.creation_time + self.duration
+    @property
+    def expiration(self) -> Optional[datetime.datetime]:
+        """Local time the data expires at, None if it doesn't expire."""
+        if self.expires_at is None:
+            return None
 
-        else:
-            self.duration = None
-            self.expiration = None
+        return datetime.datetime.now() + datetime.timedelta(
+            seconds=self.expires_at - time.monotonic()
+        )
 
     @property
-    async def expired(self) -> bool:
+    def expired(self) -> bool:
         """True if expired, otherwise False."""
-        if not self.expiration:
+        if self.expires_at is None:
             return False
 
-        return datetime.datetime.now() > self.expiration
+        return time.monotonic() >= self.expires_at
 
     @property
-    async def remaining(self) -> int:
-        """Return time remaining before the data expires.
+    def remaining(self) -> int:
+        """Return the time in minutes remaining before the data expires.
 
-        If there is no experation, returns -1.
+        If there is no expiration, returns -1.
         """
-        if not self.expiration:
+        if self.expires_at is None:
             return -1
 
-        if self.expired():
+        return max(int((self.expires_at - time.monotonic()) // 60), 0)
+
+
+class CacheStore(object):
+    """Namespace of the cache."""
+
+    def __init__(self, name: str, max_size: Optional[int] = None) -> None:
+        """Init.
+
+        Args:
+            name (str): Namespace name.
+            max_size (int, optional): Maximum number of entries, the least
+                recently used are evicted past it. Default is unbounded.
+        """
+        super(CacheStore, self).__init__()
+
+        self.name = name
+        self.max_size = max_size
+
+        self.entries = OrderedDict()
+        # Keys in sorted order for the prefix lookups.
+        self.index = []
+        # Expiry times as (expires_at, sequence, key). Entries that were
+        # replaced or extended leave stale items, which are skipped.
+        self.heap = []
+        self.sequence = 0
+
+        # Counts since the last report.
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def __contains__(self, key: str) -> bool:
+        """Check if a key is stored and not expired."""
+        return self.entry(key) is not None
+
+    def __len__(self) -> int:
+        """Number of stored entries, including expired ones not purged."""
+        return len(self.entries)
+
+    def entry(self, key: str) -> Optional[CacheData]:
+        """Get the entry of a key.
+
+        Args:
+            key (str): Key of the data.
+
+        Returns:
+            (CacheData|None): The entry, None if missing or expired.
+        """
+        entry = self._lookup(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return entry
+
+    def _lookup(self, key: str) -> Optional[CacheData]:
+        """Get the entry of a key without counting a hit or miss.
+
+        Args:
+            key (str): Key of the data.
+
+        Returns:
+            (CacheData|None): The entry, None if missing or expired.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        if entry.expires_at is not None and entry.expired:
+            self._remove(key)
+            self.expirations += 1
+            return None
+
+        if self.max_size:
+            self.entries.move_to_end(key)
+
+        return entry
+
+    def get(self, key: str, default: Optional[Any] = None) -> Any:
+        """Get the data of a key.
+
+        Args:
+            key (str): Key of the data.
+            default (any, optional): Returned if the key is not stored.
+
+        Returns:
+            (any): The data.
+        """
+        entry = self.entry(key)
+        return default if entry is None else entry.data
+
+    def set(
+        self,
+        key: str,
+        data: Optional[Any] = None,
+        ttl: Optional[float] = None,
+        overwrite: Optional[bool] = True,
+    ) -> Optional[CacheData]:
+        """Store data.
+
+        Args:
+            key (str): Key to store the data with.
+            data (any, optional): Data to store.
+            ttl (float, optional): Length of time in seconds to store the
+                data. Default is no expiry.
+            overwrite (bool, optional): Whether or not to overwrite the data
+                if it exists. Default is True.
+
+        Returns:
+            (CacheData|None): The new entry, None if it wasn't overwritten.
+        """
+        if not overwrite and self._lookup(key) is not None:
+            return None
+
+        self.sequence += 1
+        entry = CacheData(data, ttl, self.sequence)
+        if key not in self.entries:
+            bisect.insort(self.index, key)
+        self.entries[key] = entry
+        if self.max_size:
+            self.entries.move_to_end(key)
+
+        if entry.expires_at is not None:
+            self._schedule(key, entry)
+
+        if self.max_size:
+            self.purge()
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+        return entry
+
+    def extend(self, key: str, ttl: float) -> bool:
+        """Extend the time an entry is stored.
+
+        Entries without an expiry are left as they are.
+
+        Args:
+            key (str): Key of the data.
+            ttl (float): Length of time in seconds to add.
+
+        Returns:
+            (bool): True if the entry was extended, otherwise False.
+        """
+        entry = self._lookup(key)
+        if entry is None or entry.expires_at is None:
+            return False
+
+        self.sequence += 1
+        entry.sequence = self.sequence
+        entry.expires_at += ttl
+        self._schedule(key, entry)
+
+        return True
+
+    def delete(self, key: str) -> bool:
+        """Delete a key.
+
+        Args:
+            key (str): Key to delete.
+
+        Returns:
+            (bool): True if the key was stored, otherwise False.
+        """
+        if key not in self.entries:
+            return False
+
+        self._remove(key)
+        return True
+
+    def keys(self, prefix: Optional[str] = '') -> list:
+        """Get the stored keys in sorted order.
+
+        Args:
+            prefix (str, optional): Only get the keys starting with it.
+
+        Returns:
+            (list): Keys, expired ones included until they are purged.
+        """
+        if not prefix:
+            return list(self.index)
+
+        # Every key with the prefix sorts before the next possible prefix.
+        start = bisect.bisect_left(self.index, prefix)
+        end = bisect.bisect_left(
+            self.index, prefix[:-1] + chr(ord(prefix[-1]) + 1), start
+        )
+
+        return self.index[start:end]
+
+    def items(self, prefix: Optional[str] = '') -> list:
+        """Get the stored entries in key order.
+
+        Args:
+            prefix (str, optional): Only get the keys starting with it.
+
+        Returns:
+            (list): List of (key, CacheData) tuples, without expired ones.
+        """
+        found = []
+        for key in self.keys(prefix):
+            entry = self._lookup(key)
+            if entry is not None:
+                found.append((key, entry))
+
+        return found
+
+    def search(
+        self, pattern: Union[str, Pattern], prefix: Optional[str] = ''
+    ) -> list:
+        """Find the entries whose key matches a regex.
+
+        Args:
+            pattern (str|Pattern): Regex, searched for anywhere in the keys.
+            prefix (str, optional): Only search the keys starting with it.
+
+        Returns:
+            (list): List of (key, CacheData) tuples, without expired ones.
+        """
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern)
+
+        return [
+            (key, entry)
+            for key, entry in self.items(prefix)
+            if pattern.search(key)
+        ]
+
+    def clear(self) -> None:
+        """Delete every key."""
+        self.entries.clear()
+        self.index.clear()
+        self.heap.clear()
+
+    def purge(self) -> int:
+        """Delete the expired entries.
+
+        Only the entries that are due are looked at.
+
+        Returns:
+            (int): Number of deleted entries.
+        """
+        now = time.monotonic()
+        purged = 0
+        while self.heap and self.heap[0][0] <= now:
+            _, sequence, key = heapq.heappop(self.heap)
+            entry = self.entries.get(key)
+            if entry is not None and entry.sequence == sequence:
+                self._remove(key)
+                purged += 1
+
+        self.expirations += purged
+        return purged
+
+    def approximate_bytes(self) -> int:
+        """Estimate the memory used by the keys and data of the namespace.
+
+        Up to SIZE_SAMPLES entries spread over the keys are measured and the
+        average is scaled to the number of entries.
+
+        Returns:
+            (int): Size in bytes.
+        """
+        if not self.index:
             return 0
 
-        remaining = datetime.datetime.now() - self.expiration
-        return int(remaining.total_seconds / 60)
+        step = max(len(self.index) // SIZE_SAMPLES, 1)
+        sample = self.index[::step][:SIZE_SAMPLES]
+        total = sum(
+            sys.getsizeof(key) + approximate_size(self.entries[key].data)
+            for key in sample
+        )
+
+        return int(total / len(sample) * len(self.index))
+
+    def _remove(self, key: str) -> None:
+        """Remove a stored key.
+
+        Its heap item is left behind and skipped when popped.
+
+        Args:
+            key (str): Key to remove.
+        """
+        del self.entries[key]
+        del self.index[bisect.bisect_left(self.index, key)]
+
+    def _schedule(self, key: str, entry: CacheData) -> None:
+        """Add the expiry of an entry to the heap.
+
+        Args:
+            key (str): Key of the data.
+            entry (CacheData): The entry.
+        """
+        heapq.heappush(self.heap, (entry.expires_at, entry.sequence, key))
+
+        # Rebuild the heap once stale items outnumber the live ones.
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = [
+                (e.expires_at, e.sequence, k)
+                for k, e in self.entries.items()
+                if e.expires_at is not None
+            ]
+            heapq.heapify(self.heap)
 
 
 class Cache(object):
     """In-memory data cache."""
 
-    def __init__(self) -> None:
-        """Init."""
+    def __init__(self, metrics: Optional[object] = None) -> None:
+        """Init.
+
+        Args:
+            metrics (Metrics, optional): Metrics the namespaces are reported
+                to. Default is not reporting them.
+        """
         super(Cache, self).__init__()
 
-        self.cache = {}
+        self.metrics = metrics
+
+        self.namespaces = {}
+        # Namespace names in sorted order for the subtree lookups.
+        self.paths = []
+        self.cache = self.namespace(DEFAULT_NAMESPACE)
+
+    def namespace(
+        self, name: str, max_size: Optional[int] = None
+    ) -> CacheStore:
+        """Get a namespace, creating it on first use.
+
+        Args:
+            name (str): Namespace path, e.g. 'plugins/raffle'.
+            max_size (int, optional): Maximum number of entries.
+                Only used when the namespace is created.
+
+        Returns:
+            (CacheStore): The namespace.
+        """
+        store = self.namespaces.get(name)
+        if store is None:
+            store = self.namespaces[name] = CacheStore(name, max_size)
+            bisect.insort(self.paths, name)
+
+        return store
+
+    def subtree(self, name: str) -> list:
+        """Get a namespace and the namespaces below it.
+
+        Args:
+            name (str): Namespace path, e.g. 'plugins' for 'plugins/*'.
+
+        Returns:
+            (list): Namespaces in path order.
+        """
+        if name == DEFAULT_NAMESPACE:
+            return [self.namespaces[path] for path in self.paths]
+
+        found = [self.namespaces[name]] if name in self.namespaces else []
+
+        prefix = name + SEPARATOR
+        start = bisect.bisect_left(self.paths, prefix)
+        for path in self.paths[start:]:
+            if not path.startswith(prefix):
+                break
+            found.append(self.namespaces[path])
+
+        return found
+
+    def report(self) -> None:
+        """Publish the metrics of every namespace.
+
+        Counters: cache_hits, cache_misses, cache_expirations and
+        cache_evictions. Gauges: cache_entries and cache_bytes. All of them
+        are labelled with the namespace.
+        """
+        if self.metrics is None:
+            return
+
+        for name, store in list(self.namespaces.items()):
+            for counter in ['hits', 'misses', 'expirations', 'evictions']:
+                count = getattr(store, counter)
+                if count:
+                    self.metrics.incr(f'cache_{counter}', name, count)
+                    setattr(store, counter, 0)
+
+            self.metrics.set('cache_entries', len(store), name)
+            self.metrics.set('cache_bytes', store.approximate_bytes(), name)
 
     async def add(
         self,
@@ -90,18 +534,15 @@ class Cache(object):
             (CacheData|None): CacheData if the data was added correctly,
                 otherwise None.
         """
-        if key in self.cache and not self.cache[key].expired and not overwrite:
-            return None
-
         try:
-            self.cache[key] = CacheData(data, duration)
+            return self.cache.set(
+                key, data, duration * 60 if duration else None, overwrite
+            )
 
         except Exception:
             traceback.print_exc()
             return None
 
-        return self.cache[key]
-
     async def get(self, key: str) -> CacheData:
         """Get data from the cache if it exists.
 
@@ -111,7 +552,7 @@ class Cache(object):
         Returns:
             (CacheData | None): The matching data if it exists, otherwise None.
         """
-        return self.cache.get(key, None)
+        return self.cache.entry(key)
 
     async def exists(self, key: str) -> bool:
         """Check if the key exists in the cache.
@@ -122,7 +563,7 @@ class Cache(object):
         Returns:
             (bool): True if the key exists in the cache, otherwise False.
         """
-        return True if key in self.cache else False
+        return key in self.cache
 
     async def find(self, search: str) -> CacheData:
         """Find a key from a search string.
@@ -135,33 +576,21 @@ class Cache(object):
         Returns:
             (list): List of CacheData where the key matches the search string.
         """
-        found = []
-        for key in await self.list():
-            match = re.search(search, key)
-            if not match:
-                continue
-
-            found.append(await self.get(key))
-
-        return found
+        return [entry for _, entry in self.cache.search(search)]
 
     async def list(self) -> list:
         """Return a list of keys in the cache."""
-        return list(self.cache.keys())
+        return self.cache.keys()
 
     async def extend(self, key: str, length: Optional[int] = 60) -> None:
         """Extend the given keys duration.
 
         Args:
             key (str): Key to renew.
-            length (int, optional): Length of time in minutes to store the
-                data.
-                Default is no duration.
+            length (int, optional): Length of time in minutes to add.
+                Default is 60.
         """
-        if await self.exists(key) and self.cache[key].expiration:
-            extension = datetime.timedelta(minutes=length)
-            self.cache[key].duration += extension
-            self.cache[key].expiration += extension
+        self.cache.extend(key, length * 60)
 
     async def delete(self, key: str) -> None:
         """Delete the key and associated data if it exists.
@@ -172,30 +601,21 @@ class Cache(object):
         Returns:
             (bool): True if the key exists in the cache, otherwise False.
         """
-        if key not in self.cache:
-            return False
-
-        try:
-            del self.cache[key]
-
-        except Exception:
-            traceback.print_exc()
-            return False
-
-        return True
+        return self.cache.delete(key)
 
     async def clear(self) -> None:
         """Clear the cache."""
-        self.cache.clear()
+        for store in self.namespaces.values():
+            store.clear()
 
     async def clean(self) -> None:
         """Clean expired keys from the cache."""
-        for key in list(self.cache.keys()):
-            if await self.cache[key].expired:
-                await self.delete(key)
+        for store in list(self.namespaces.values()):
+            store.purge()
 
     async def clean_task(self) -> None:
         """Asynchronous task for cleaning the cache of expired keys."""
         while True:
             await asyncio.sleep(60)
             await self.clean()
+            self.report()
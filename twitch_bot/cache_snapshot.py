@@ -0,0 +1,245 @@
+"""Cache Snapshot.
+
+Keeps selected cache namespaces across restarts, so a restart mid-stream
+picks up the running raffle, queue or trivia question instead of starting
+over.
+
+The namespaces in <cache_snapshot_namespaces> (and the namespaces below them)
+are pickled to <cache_snapshot_path> every <cache_snapshot_interval> minutes
+and on shutdown, and loaded back at startup. Expiry times are stored as wall
+clock times, so the entries keep the time they had left and the ones that
+expired while the bot was down are dropped.
+
+Namespaces holding data that can't be pickled are skipped with a warning.
+The snapshot is a pickle, so it must only be read from a trusted location.
+"""
+
+import asyncio
+import os
+import pickle
+import time
+
+from typing import Optional
+
+from cache import DEFAULT_NAMESPACE, SEPARATOR, CacheStore
+from configs import config_utils
+from init import CACHE
+from log import LOG
+
+SNAPSHOT_VERSION = 1
+
+
+class CacheSnapshot(object):
+    """Cache Snapshot Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(CacheSnapshot, self).__init__()
+
+    async def init(self) -> object:
+        """Async init.
+
+        Returns:
+            self (CacheSnapshot): Class instance.
+        """
+        config = await config_utils.load_config_file('bot_config')
+
+        # Namespaces to keep, including the namespaces below them. Nothing is
+        # kept by default.
+        self.namespaces = config.get('cache_snapshot_namespaces') or []
+        # Time in minutes between snapshots, 0 only saves on shutdown.
+        self.interval = config.get('cache_snapshot_interval', 5)
+
+        self.path = os.path.join(
+            os.path.dirname(__file__),
+            config.get('cache_snapshot_path', 'cache_snapshot.pickle'),
+        )
+
+        return self
+
+    def _get_stores(self) -> list:
+        """Get the namespaces to keep.
+
+        Returns:
+            (list): List of CacheStore.
+        """
+        stores = {}
+        for name in self.namespaces:
+            # The default namespace is the root, don't take everything.
+            if name == DEFAULT_NAMESPACE:
+                found = [CACHE.cache]
+            else:
+                found = CACHE.subtree(name)
+
+            for store in found:
+                stores[store.name] = store
+
+        return list(stores.values())
+
+    @staticmethod
+    def _dump_store(store: CacheStore) -> Optional[bytes]:
+        """Pickle the live entries of a namespace.
+
+        Args:
+            store (CacheStore): Namespace.
+
+        Returns:
+            (bytes|None): Pickled namespace, None if it can't be pickled.
+        """
+        now = time.monotonic()
+        wall_now = time.time()
+
+        # Entries in least recently used order, with wall clock expiry times.
+        entries = []
+        for key, entry in store.entries.items():
+            if entry.expires_at is None:
+                entries.append((key, entry.data, None))
+            elif entry.expires_at > now:
+                expires = wall_now + entry.expires_at - now
+                entries.append((key, entry.data, expires))
+
+        try:
+            return pickle.dumps(
+                {'max_size': store.max_size, 'entries': entries},
+                protocol=5,
+            )
+
+        except Exception as e:
+            LOG.warning(
+                'Unable to snapshot the cache namespace {}: {}'.format(
+                    store.name, getattr(e, 'message', repr(e))
+                )
+            )
+            return None
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        """Write the snapshot, replacing the previous one in one step.
+
+        Args:
+            path (str): Path of the snapshot.
+            data (bytes): Pickled snapshot.
+        """
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as out_file:
+            out_file.write(data)
+
+        os.replace(temp_path, path)
+
+    async def save(self) -> bool:
+        """Save the selected namespaces.
+
+        Returns:
+            (bool): True if the snapshot was written, otherwise False.
+        """
+        if not self.namespaces:
+            return False
+
+        start = time.perf_counter()
+        stores = {}
+        for store in self._get_stores():
+            data = self._dump_store(store)
+            if data is not None:
+                stores[store.name] = data
+
+        snapshot = pickle.dumps(
+            {
+                'version': SNAPSHOT_VERSION,
+                'created': time.time(),
+                'stores': stores,
+            },
+            protocol=5,
+        )
+
+        try:
+            await asyncio.to_thread(self._write, self.path, snapshot)
+
+        except Exception as e:
+            LOG.error(
+                'Unable to write the cache snapshot: {}'.format(
+                    getattr(e, 'message', repr(e))
+                )
+            )
+            return False
+
+        LOG.debug(
+            f'Saved {len(stores)} cache namespaces ({len(snapshot)} bytes) '
+            f'in {time.perf_counter() - start:.3f}s.'
+        )
+        return True
+
+    async def restore(self) -> int:
+        """Load the selected namespaces from the last snapshot.
+
+        Returns:
+            (int): Number of restored entries.
+        """
+        if not self.namespaces or not os.path.exists(self.path):
+            return 0
+
+        start = time.perf_counter()
+        try:
+            with open(self.path, 'rb') as in_file:
+                snapshot = pickle.load(in_file)
+
+        except Exception as e:
+            LOG.error(
+                'Unable to read the cache snapshot: {}'.format(
+                    getattr(e, 'message', repr(e))
+                )
+            )
+            return 0
+
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            LOG.warning('Ignoring a cache snapshot from another version.')
+            return 0
+
+        restored = 0
+        now = time.time()
+        for name, data in snapshot['stores'].items():
+            # Only restore the namespaces that are still selected.
+            if not any(
+                name == n or name.startswith(n + SEPARATOR)
+                for n in self.namespaces
+            ):
+                continue
+
+            try:
+                store_data = pickle.loads(data)
+
+            except Exception as e:
+                LOG.warning(
+                    'Unable to restore the cache namespace {}: {}'.format(
+                        name, getattr(e, 'message', repr(e))
+                    )
+                )
+                continue
+
+            store = CACHE.namespace(name, store_data['max_size'])
+            for key, value, expires in store_data['entries']:
+                if expires is None:
+                    store.set(key, value)
+                elif expires > now:
+                    store.set(key, value, ttl=expires - now)
+                else:
+                    continue
+
+                restored += 1
+
+        LOG.info(
+            f'Restored {restored} cache entries from '
+            f'{now - snapshot["created"]:.0f}s ago in '
+            f'{time.perf_counter() - start:.3f}s.'
+        )
+        return restored
+
+    async def run(self) -> None:
+        """Asynchronous task for saving the snapshots."""
+        if not self.namespaces or not self.interval:
+            LOG.debug('Scheduled cache snapshots are disabled.')
+            return
+
+        LOG.debug('Running cache snapshot loop.')
+        while True:
+            await asyncio.sleep(self.interval * 60)
+            await self.save()
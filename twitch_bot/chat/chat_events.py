@@ -5,9 +5,10 @@ import re
 from datetime import datetime
 
 import api
+import time_utils
 
+from chat.presence_index import get_presence
 from events import Event
-from init import CACHE
 from log import LOG
 
 MESSAGE_RE = re.compile(
@@ -166,15 +167,11 @@ class ExistingUsersEvent(ChatEvent):
             user_db_data = await bot._get_user_db_data(user_data)
 
             # Otherwise, update the user data in the database.
-            update_dict = {'last_join_time': str(datetime.now())}
-            await bot.db.update(
-                'users', update_dict, {'username': user_db_data['username']}
-            )
+            update_dict = {'last_join_time': time_utils.now_ms()}
+            await bot.users.update(user_db_data['username'], update_dict)
 
-            # Add user to cache.
-            user_cache = await CACHE.get('users')
-            if username not in user_cache.data:
-                user_cache.data.append(username)
+            # Add user to the presence index.
+            get_presence().join(username)
 
 
 class NamesEndEvent(ChatEvent):
@@ -295,19 +292,15 @@ class JoinEvent(ChatEvent):
         user_db_data = await bot._get_user_db_data(user_data)
 
         # Otherwise, update the user data in the database.
-        update_dict = {'last_join_time': str(datetime.now())}
-        await bot.db.update(
-            'users', update_dict, {'username': user_db_data['username']}
-        )
+        update_dict = {'last_join_time': time_utils.now_ms()}
+        await bot.users.update(user_db_data['username'], update_dict)
 
         # Announce the user if 'announce' is set in the database.
         if user_db_data['announce'] == 1:
             await bot.send_message(f'Welcome {username}!')
 
-        # Add user to cache.
-        user_cache = await CACHE.get('users')
-        if username not in user_cache.data:
-            user_cache.data.append(username)
+        # Add user to the presence index.
+        get_presence().join(username)
 
 
 class NoticeEvent(ChatEvent):
@@ -373,17 +366,11 @@ class PartEvent(ChatEvent):
         # Get the user data from the database.
         user_db_data = await bot._get_user_db_data(user_data)
 
-        # Update the time spent watching the stream.
-        last_leave_time = datetime.now()
-        session_time_watched = (
-            last_leave_time
-            - datetime.fromisoformat(user_db_data['last_join_time'])
-        ).total_seconds() / 60
-        time_watched = int(user_db_data['time_watched'] + session_time_watched)
-
+        # Time watched is credited by the presence tick while the user is in
+        # chat and up to now when they leave, so only the session needs to
+        # be closed here.
         update_dict = {
-            'time_watched': time_watched,
-            'last_leave_time': last_leave_time,
+            'last_leave_time': time_utils.now_ms(),
             'messages_sent_session': 0,
             'messages_sent_total': (
                 int(user_db_data['messages_sent_total'])
@@ -392,14 +379,10 @@ class PartEvent(ChatEvent):
         }
 
         # Update the database.
-        await bot.db.update(
-            'users', update_dict, {'user_id': user_db_data['user_id']}
-        )
+        await bot.users.update(user_db_data['username'], update_dict)
 
-        # Remove user from cache.
-        user_cache = await CACHE.get('users')
-        if username in user_cache.data:
-            user_cache.data.remove(username)
+        # Remove user from the presence index.
+        await bot.presence.part(username)
 
 
 class PubmsgEvent(ChatEvent):
@@ -434,14 +417,21 @@ class PubmsgEvent(ChatEvent):
 
         bot.last_message_time = datetime.now()
 
-        # Get the user data from the username.
-        user_data = await api.get_user_data(bot.auth, user['name'])
+        # The message tags already carry the user id, so only ask the API
+        # when they are missing.
+        if self.user_id:
+            user_data = {'login': self.username, 'id': self.user_id}
+        else:
+            user_data = await api.get_user_data(bot.auth, user['name'])
+
         LOG.debug(f'user_data: {user_data}')
         if not user_data:
             return
 
         # Get the user data from the database.
         user_db_data = await bot._get_user_db_data(user_data)
+        if not user_db_data:
+            return
 
         # Run the message past the Moderator.
         mod_approved = await bot.moderator.check_message(user, message)
@@ -473,27 +463,15 @@ class PubmsgEvent(ChatEvent):
             await bot.send_message(f'Welcome @{self.username}!')
 
         # Increment the number of sent messages in the database.
-        users_update_dict = {
-            'messages_sent_session': user_db_data['messages_sent_session'] + 1
-        }
-
-        await bot.db.update(
-            'users', users_update_dict, {'user_id': user_db_data['user_id']}
+        await bot.users.increment(
+            user_db_data['username'], 'messages_sent_session'
         )
 
         # Update the stream stats database.
-        stream_stats_last_row = dict(await bot.db.get_last_row('stream_stats'))
-
-        await bot.db.update(
-            'stream_stats',
-            {'messages': int(stream_stats_last_row.get('messages', 0)) + 1},
-            {'id': stream_stats_last_row.get('id', 0)},
-        )
+        await bot.counters.increment('messages')
 
-        # Add unique chatters to the cache.
-        chatters_cache = await CACHE.get('chatters')
-        if self.username not in chatters_cache.data:
-            chatters_cache.data.append(self.username)
+        # Count the message and add unique chatters to the presence index.
+        get_presence().message(self.username)
 
 
 class RoomstateEvent(ChatEvent):
@@ -11,6 +11,7 @@ import api
 import chatters
 import utils
 
+from chat.presence_index import get_presence
 from log import LOG
 
 
@@ -225,12 +226,23 @@ class Command(object):
     async def get_random_chatter(self) -> str:
         """Pick a random chatter.
 
+        Users in chat are picked from the presence index, the chatters from
+        Twitch are only used if nobody has joined yet. The owner and the bot
+        are never picked.
+
         Returns:
             (str): Random chatter name.
         """
-        return self.chatters.chatters[
-            randint(0, self.chatters.chatter_count - 1)
-        ]
+        excluded = {self.bot.owner, self.bot.username}
+        username = get_presence().random(exclude=excluded)
+        if username:
+            return username
+
+        chatters = [c for c in self.chatters.chatters if c not in excluded]
+        if not chatters:
+            return ''
+
+        return chatters[randint(0, len(chatters) - 1)]
 
     async def get_follower_count(self) -> int:
         """Get the total number of followers.
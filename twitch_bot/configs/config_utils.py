@@ -18,14 +18,7 @@ async def load_cached_config(config_name: str) -> dict:
     Returns:
         (dict): Config data if it exists.
     """
-    config_cache = await CACHE.get('configs')
-
-    if not config_cache:
-        LOG.debug('Creating config cache.')
-        # Assume the config is good for 6 hours.
-        config_cache = await CACHE.add('configs', data={}, duration=360)
-
-    return config_cache.data.get(config_name, {})
+    return CACHE.namespace('configs').get(config_name, {})
 
 
 async def cache_config(config_name: str, config_data: dict) -> None:
@@ -35,8 +28,8 @@ async def cache_config(config_name: str, config_data: dict) -> None:
         config_name (str): Config name.
         config_data (dict): Config description.
     """
-    config_cache = await CACHE.get('configs')
-    config_cache.data[config_name] = config_data
+    # Assume the config is good for 6 hours.
+    CACHE.namespace('configs').set(config_name, config_data, ttl=6 * 60 * 60)
 
 
 async def load_config_file(config_name: str, refresh: bool = False) -> str:
@@ -9,6 +9,7 @@ from remi import App, Server
 import zmq_utils
 
 from discord import discord_sender
+from init import METRICS
 from log import LOG
 
 
@@ -161,6 +162,15 @@ class Console(App):
         discord_container = self.create_discord_container()
         main_container.append(discord_container)
 
+        trends_container = self.create_trends_container()
+        main_container.append(trends_container)
+
+        metrics_container = self.create_metrics_container()
+        main_container.append(metrics_container)
+
+        cache_container = self.create_cache_container()
+        main_container.append(cache_container)
+
         # event_container = self.create_event_container()
         # main_container.append(event_container)
 
@@ -446,6 +456,122 @@ class Console(App):
 
         return discord_container
 
+    def create_trends_container(self) -> gui.Container:
+        """Create a container for the stream trends widgets.
+
+        Returns:
+            trends_container (gui.Container): Container widget with the
+                stream trends widgets.
+        """
+        trends_container = gui.Container(
+            width='100%',
+            layout_orientation=gui.Container.LAYOUT_HORIZONTAL,
+            margin='0px',
+            style={
+                'display': 'flex',
+                'overflow': 'auto',
+                'align-items': 'center',
+            },
+        )
+
+        trends_label = gui.Label(
+            'Stream Trends: ', margin='5px', width='150px', height='40px'
+        )
+        trends_label.style['text-align'] = 'right'
+        trends_label.style['padding-top'] = '20px'
+        trends_container.append(trends_label)
+
+        # Filled from the trends in memory, so opening the console never
+        # waits on the database.
+        self.trends_text = gui.Label('', margin='5px', width='650px')
+        self.trends_text.style['white-space'] = 'pre-line'
+        self.show_trends(self.bot.trends.latest)
+        trends_container.append(self.trends_text)
+
+        self.refresh_trends_button = gui.Button('Refresh', margin='5px')
+        self.refresh_trends_button.attributes['name'] = 'refresh_trends'
+        self.refresh_trends_button.style['padding'] = '10px 20px'
+        self.refresh_trends_button.onclick.do(self.refresh_trends)
+        trends_container.append(self.refresh_trends_button)
+
+        return trends_container
+
+    def create_metrics_container(self) -> gui.Container:
+        """Create a container for the database metrics widgets.
+
+        Returns:
+            metrics_container (gui.Container): Container widget with the
+                database metrics widgets.
+        """
+        metrics_container = gui.Container(
+            width='100%',
+            layout_orientation=gui.Container.LAYOUT_HORIZONTAL,
+            margin='0px',
+            style={
+                'display': 'flex',
+                'overflow': 'auto',
+                'align-items': 'center',
+            },
+        )
+
+        metrics_label = gui.Label(
+            'Statements: ', margin='5px', width='150px', height='40px'
+        )
+        metrics_label.style['text-align'] = 'right'
+        metrics_label.style['padding-top'] = '20px'
+        metrics_container.append(metrics_label)
+
+        self.metrics_text = gui.Label('', margin='5px', width='650px')
+        self.metrics_text.style['white-space'] = 'pre-line'
+        self.show_metrics()
+        metrics_container.append(self.metrics_text)
+
+        self.refresh_metrics_button = gui.Button('Refresh', margin='5px')
+        self.refresh_metrics_button.attributes['name'] = 'refresh_metrics'
+        self.refresh_metrics_button.style['padding'] = '10px 20px'
+        self.refresh_metrics_button.onclick.do(self.refresh_metrics)
+        metrics_container.append(self.refresh_metrics_button)
+
+        return metrics_container
+
+    def create_cache_container(self) -> gui.Container:
+        """Create a container for the cache metrics widgets.
+
+        Returns:
+            cache_container (gui.Container): Container widget with the cache
+                metrics widgets.
+        """
+        cache_container = gui.Container(
+            width='100%',
+            layout_orientation=gui.Container.LAYOUT_HORIZONTAL,
+            margin='0px',
+            style={
+                'display': 'flex',
+                'overflow': 'auto',
+                'align-items': 'center',
+            },
+        )
+
+        cache_label = gui.Label(
+            'Cache: ', margin='5px', width='150px', height='40px'
+        )
+        cache_label.style['text-align'] = 'right'
+        cache_label.style['padding-top'] = '20px'
+        cache_container.append(cache_label)
+
+        self.cache_text = gui.Label('', margin='5px', width='650px')
+        self.cache_text.style['white-space'] = 'pre-line'
+        self.show_cache_metrics()
+        cache_container.append(self.cache_text)
+
+        self.refresh_cache_button = gui.Button('Refresh', margin='5px')
+        self.refresh_cache_button.attributes['name'] = 'refresh_cache'
+        self.refresh_cache_button.style['padding'] = '10px 20px'
+        self.refresh_cache_button.onclick.do(self.refresh_cache_metrics)
+        cache_container.append(self.refresh_cache_button)
+
+        return cache_container
+
     def create_event_container(self) -> gui.Container:
         """Create a container for the event related widgets.
 
@@ -630,6 +756,88 @@ class Console(App):
         if message:
             asyncio.run(discord_sender.send_discord_message(message))
 
+    def refresh_trends(self, widget: gui.Widget) -> None:
+        """Recompute the stream trends.
+
+        Args:
+            widget (gui.Widget): Widget that made the function call.
+        """
+        self.show_trends(
+            asyncio.run(self.bot.trends.get_trends(refresh=True))
+        )
+
+    def show_trends(self, trends: list) -> None:
+        """Show the stream trends, one week per line.
+
+        Args:
+            trends (list): Weekly trends, newest week first.
+        """
+        if not trends:
+            self.trends_text.set_text('No stream trends yet.')
+            return
+
+        self.trends_text.set_text(
+            '\n'.join(self.bot.trends.format_week(week) for week in trends)
+        )
+
+    def refresh_metrics(self, widget: gui.Widget) -> None:
+        """Show the current database metrics.
+
+        Args:
+            widget (gui.Widget): Widget that made the function call.
+        """
+        self.show_metrics()
+
+    def show_metrics(self) -> None:
+        """Show the statements taking the most time, one per line."""
+        lines = []
+        for name in ['db', 'analytics']:
+            slow = METRICS.counters.get(f'{name}_slow_statements', {})
+            for shape, stats in METRICS.top(f'{name}_statement_ms', limit=5):
+                lines.append(
+                    f'{name}: {stats["total"]:.0f}ms total, '
+                    f'{stats["count"]} runs, p95 {stats["p95"]}ms, '
+                    f'{slow.get(shape, 0)} slow | {shape[:120]}'
+                )
+
+        self.metrics_text.set_text('\n'.join(lines) or 'No statements yet.')
+
+    def refresh_cache_metrics(self, widget: gui.Widget) -> None:
+        """Show the current cache metrics.
+
+        Args:
+            widget (gui.Widget): Widget that made the function call.
+        """
+        self.show_cache_metrics()
+
+    def show_cache_metrics(self) -> None:
+        """Show the metrics of each cache namespace, one per line.
+
+        The metrics are published by the cache cleaning task every minute,
+        the cache itself is only touched by the bot's event loop.
+        """
+        # Copied, since the event loop keeps updating them.
+        counters = {
+            counter: dict(METRICS.counters.get(f'cache_{counter}', {}))
+            for counter in ['hits', 'misses', 'expirations', 'evictions']
+        }
+        entries = dict(METRICS.gauges.get('cache_entries', {}))
+        sizes = dict(METRICS.gauges.get('cache_bytes', {}))
+
+        lines = []
+        for name in sorted(entries):
+            hits = counters['hits'].get(name, 0)
+            lookups = hits + counters['misses'].get(name, 0)
+            hit_rate = f'{hits / lookups:.0%}' if lookups else '-'
+            lines.append(
+                f'{name or "(default)"}: {entries[name]} entries, '
+                f'~{sizes.get(name, 0) / 1024:.0f}KB, {hit_rate} hits '
+                f'of {lookups}, {counters["expirations"].get(name, 0)} '
+                f'expired, {counters["evictions"].get(name, 0)} evicted'
+            )
+
+        self.cache_text.set_text('\n'.join(lines) or 'Nothing cached yet.')
+
     def send_event(self, widget: gui.Widget) -> None:
         """Send an event.
 
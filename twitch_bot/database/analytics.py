@@ -0,0 +1,218 @@
+"""Analytics snapshot database.
+
+Heavy read-only queries (reports, trends, leaderboards) run against a
+periodically refreshed copy of the database instead of the main connection,
+so a multi-second report never queues in front of chat and event writes.
+
+The copy is taken with VACUUM INTO on a separate connection, which reads a
+consistent view of the WAL database without blocking writers, and is opened
+read-only. Snapshots alternate between two files so a refresh never replaces
+a file that is still open. Statements hold the connection, so a refresh
+waits for the running ones, and chunked reads (iter_chunks) pin the snapshot
+they started on, which is only closed once they finish. A refresh that would
+replace a snapshot still pinned is skipped until the next interval.
+
+AnalyticsDatabase keeps the read interface of Database, so plugins opt in by
+setting ANALYTICS = True and keep using self.db. Writes on it fail, they
+belong on bot.db. If snapshots are disabled or the first one fails,
+bot.analytics is the main database.
+"""
+
+import aiosqlite
+import asyncio
+import contextlib
+import os
+import time
+
+from typing import AsyncIterator, Optional
+
+from database.database_utils import Database, register_functions
+from log import LOG
+
+
+class AnalyticsDatabase(Database):
+    """Read-only snapshot database interaction object."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(AnalyticsDatabase, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (AnalyticsDatabase): Class instance.
+        """
+        self.source = bot.db
+        self.twitch_config = bot.twitch_config
+
+        # Time in minutes between snapshots.
+        self.interval = self.twitch_config.get('analytics_refresh', 15)
+        self.chunk_size = self.source.chunk_size
+        self.slow_query_ms = self.source.slow_query_ms
+        self.metrics_name = 'analytics'
+        self.explained = {}
+
+        name, ext = os.path.splitext(
+            self.twitch_config.get('analytics_path', 'analytics.db')
+        )
+        base = os.path.join(os.path.dirname(self.source.db_path), name)
+        self.paths = [f'{base}_a{ext}', f'{base}_b{ext}']
+        self.generation = 0
+        self.db_path = None
+
+        self.connection = None
+        self.cursor = None
+        self.last_refresh = None
+
+        self.lock = asyncio.Lock()
+        self.lock_owner = None
+        self.transaction_depth = 0
+        self.rollback_callbacks = []
+
+        # Number of chunked reads by snapshot path, and the replaced
+        # connections waiting for theirs to finish.
+        self.pins = {}
+        self.retired = {}
+
+        await self.refresh()
+
+        return self
+
+    async def refresh(self) -> bool:
+        """Take a new snapshot and switch the queries over to it.
+
+        Returns:
+            (bool): True if the snapshot was refreshed, otherwise False.
+        """
+        async with self.hold():
+            path = self.paths[self.generation % 2]
+            if path in self.pins:
+                LOG.debug(
+                    'The previous analytics snapshot is still being read, '
+                    'skipping the refresh.'
+                )
+                return False
+
+            start = time.monotonic()
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+
+                async with aiosqlite.connect(self.source.db_path) as source:
+                    await source.execute('VACUUM INTO ?;', [path])
+
+                connection = await aiosqlite.connect(
+                    f'file:{path}?mode=ro', uri=True
+                )
+
+            except Exception as e:
+                LOG.error(
+                    'Unable to refresh the analytics snapshot: {}'.format(
+                        getattr(e, 'message', repr(e))
+                    )
+                )
+                return False
+
+            connection.row_factory = aiosqlite.Row
+            await register_functions(connection)
+            old_connection, old_path = self.connection, self.db_path
+
+            self.connection = connection
+            self.cursor = await connection.cursor()
+            self.db_path = path
+            self.generation += 1
+            self.last_refresh = time.time()
+
+            if old_path in self.pins:
+                self.retired[old_path] = old_connection
+            elif old_connection:
+                await old_connection.close()
+
+        LOG.debug(
+            'Refreshed the analytics snapshot in '
+            f'{time.monotonic() - start:.2f}s.'
+        )
+        return True
+
+    async def execute(
+        self,
+        cmd: str,
+        parameters: Optional[list] = None,
+        commit: Optional[bool] = False,
+    ) -> list:
+        """Run a read-only statement on the snapshot.
+
+        Args:
+            cmd (str): SQL statement using '?' placeholders.
+            parameters (iterable, optional): Values bound to the placeholders.
+            commit (bool, optional): Ignored, the snapshot is read-only.
+
+        Returns:
+            data (list): Row(s) returned by the statement.
+        """
+        return await super(AnalyticsDatabase, self).execute(
+            cmd, parameters, commit=False
+        )
+
+    @contextlib.asynccontextmanager
+    async def pin(self) -> AsyncIterator[None]:
+        """Keep the current snapshot open until the block ends.
+
+        Yields:
+            None
+        """
+        path = self.db_path
+        self.pins[path] = self.pins.get(path, 0) + 1
+        try:
+            yield
+        finally:
+            self.pins[path] -= 1
+            if not self.pins[path]:
+                del self.pins[path]
+                retired = self.retired.pop(path, None)
+                if retired:
+                    await retired.close()
+
+    async def iter_chunks(self, table: str, **kwargs) -> AsyncIterator[list]:
+        """Read a table in chunks, all from the same snapshot.
+
+        Args:
+            table (str): Table name.
+            kwargs: Options of Database.iter_chunks().
+
+        Yields:
+            (list): Chunk of rows, or tuples if 'tuples' is set.
+
+        Raises:
+            BotDBError: If a chunk cannot be read.
+        """
+        async with self.pin():
+            async for chunk in super(AnalyticsDatabase, self).iter_chunks(
+                table, **kwargs
+            ):
+                yield chunk
+
+    async def close(self) -> None:
+        """Close the snapshot and remove its files."""
+        for connection in self.retired.values():
+            await connection.close()
+        self.retired = {}
+
+        if self.connection:
+            await self.connection.close()
+            self.connection = None
+
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def run(self) -> None:
+        """Asynchronous task for refreshing the snapshot."""
+        LOG.debug('Running analytics snapshot loop.')
+        while True:
+            await asyncio.sleep(self.interval * 60)
+            await self.refresh()
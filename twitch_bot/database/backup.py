@@ -0,0 +1,186 @@
+"""Database backups.
+
+Takes scheduled, compressed snapshots of the database without stalling the
+bot. Snapshots are read from a separate connection, so the main connection
+stays free for chat and event writes while the copy runs, and the database
+runs in WAL mode so the reader never blocks writers.
+
+The snapshot is taken with VACUUM INTO, which copies a consistent view of the
+database in a single read transaction. On SQLite versions without it, the
+online backup API is used instead, copying a limited number of pages per step
+with a pause in between. The last <backup_keep> snapshots are kept.
+"""
+
+import asyncio
+import aiosqlite
+import gzip
+import os
+import shutil
+import time
+
+from datetime import datetime
+from typing import Optional
+
+import time_utils
+
+from log import LOG
+
+BACKUP_PREFIX = 'backup_'
+BACKUP_SUFFIX = '.db.gz'
+
+
+class BackupScheduler(object):
+    """Backup Scheduler Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(BackupScheduler, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (BackupScheduler): Class instance.
+        """
+        self.db = bot.db
+
+        config = bot.twitch_config
+
+        # Time in minutes between backups, 0 disables scheduled backups.
+        self.interval = config.get('backup_interval', 360)
+        # Number of snapshots to keep.
+        self.keep = max(int(config.get('backup_keep', 5)), 1)
+        # Pages copied per step and the pause in seconds between steps when
+        # falling back to the online backup API.
+        self.pages = config.get('backup_pages', 256)
+        self.pause = config.get('backup_pause', 0.05)
+
+        self.backup_dir = os.path.join(
+            os.path.dirname(self.db.db_path),
+            config.get('backup_path', 'backups'),
+        )
+        os.makedirs(self.backup_dir, exist_ok=True)
+
+        return self
+
+    async def _vacuum_into(self, path: str) -> None:
+        """Copy the database with VACUUM INTO on a separate connection.
+
+        Args:
+            path (str): Path of the uncompressed snapshot.
+        """
+        async with aiosqlite.connect(self.db.db_path) as source:
+            await source.execute('VACUUM INTO ?;', [path])
+
+    async def _step_backup(self, path: str) -> None:
+        """Copy the database a few pages at a time on a separate connection.
+
+        Args:
+            path (str): Path of the uncompressed snapshot.
+        """
+        async with aiosqlite.connect(self.db.db_path) as source:
+            async with aiosqlite.connect(path) as target:
+                await source.backup(target, pages=self.pages, sleep=self.pause)
+
+    @staticmethod
+    def _compress(source: str, destination: str) -> None:
+        """Compress a snapshot and remove the uncompressed copy.
+
+        Args:
+            source (str): Path of the uncompressed snapshot.
+            destination (str): Path of the compressed snapshot.
+        """
+        with open(source, 'rb') as in_file:
+            with gzip.open(destination, 'wb') as out_file:
+                shutil.copyfileobj(in_file, out_file)
+
+        os.remove(source)
+
+    async def backup(self) -> Optional[str]:
+        """Take a compressed snapshot of the database.
+
+        Returns:
+            (str|None): Path of the snapshot or None if the backup failed.
+        """
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        name = f'{BACKUP_PREFIX}{timestamp}'
+        raw_path = os.path.join(self.backup_dir, f'{name}.db')
+        path = os.path.join(self.backup_dir, f'{name}{BACKUP_SUFFIX}')
+
+        start = time.monotonic()
+        method = 'vacuum'
+        try:
+            try:
+                await self._vacuum_into(raw_path)
+
+            except aiosqlite.OperationalError:
+                # VACUUM INTO needs SQLite 3.27+.
+                LOG.debug('VACUUM INTO failed, using the online backup API.')
+                if os.path.exists(raw_path):
+                    os.remove(raw_path)
+                method = 'backup'
+                await self._step_backup(raw_path)
+
+            size = os.path.getsize(raw_path)
+            await asyncio.to_thread(self._compress, raw_path, path)
+
+        except Exception as e:
+            LOG.error(
+                'Unable to back up the database: {}'.format(
+                    getattr(e, 'message', repr(e))
+                )
+            )
+            if os.path.exists(raw_path):
+                os.remove(raw_path)
+            return None
+
+        duration = time.monotonic() - start
+        compressed_size = os.path.getsize(path)
+
+        await self.db.execute(
+            'INSERT INTO backup_history '
+            '(path, method, duration, size, compressed_size, created) '
+            'VALUES (?, ?, ?, ?, ?, ?);',
+            [
+                path,
+                method,
+                duration,
+                size,
+                compressed_size,
+                time_utils.now_ms(),
+            ],
+        )
+        LOG.info(
+            f'Backed up the database in {duration:.2f}s '
+            f'({size} bytes, {compressed_size} compressed).'
+        )
+
+        await self.rotate()
+
+        return path
+
+    async def rotate(self) -> None:
+        """Remove the oldest snapshots beyond the number to keep."""
+        snapshots = sorted(
+            f
+            for f in os.listdir(self.backup_dir)
+            if f.startswith(BACKUP_PREFIX) and f.endswith(BACKUP_SUFFIX)
+        )
+
+        for snapshot in snapshots[: -self.keep]:
+            os.remove(os.path.join(self.backup_dir, snapshot))
+            LOG.debug(f'Removed old backup {snapshot}.')
+
+    async def run(self) -> None:
+        """Asynchronous task for taking scheduled backups."""
+        if not self.interval:
+            LOG.debug('Scheduled backups are disabled.')
+            return
+
+        LOG.debug('Running backup loop.')
+        while True:
+            await asyncio.sleep(self.interval * 60)
+            await self.backup()
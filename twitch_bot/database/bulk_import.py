@@ -0,0 +1,424 @@
+"""Bulk import of users and chat logs.
+
+Loads CSV or JSON Lines files into the users table or the chat_messages
+archive, e.g. when moving over from another bot or restoring from logs:
+    python -m database.bulk_import users users.csv
+    python -m database.bulk_import chat_messages chat.jsonl --map text=message
+
+The file is streamed, so only one batch is held in memory. Each batch is
+written with a single executemany in its own transaction, with the
+synchronous pragma off and a large page cache for the duration of the import.
+The secondary indexes of the table are dropped first and built once at the
+end, which is much faster than updating them row by row. Unique indexes are
+kept, since the users are upserted on theirs.
+
+The columns are taken from the CSV header (or the first JSON line) and
+matched to the table by name, '--map' renames them. Timestamps can be epoch
+milliseconds or dates, which are read as local times. The bot should not be
+running during an import.
+"""
+
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import time
+
+from types import SimpleNamespace
+from typing import Iterator, Optional, TextIO
+
+import time_utils
+
+from database import database_utils
+from exceptions.exceptions import BotDBError
+from log import LOG
+
+# Import settings of the tables:
+#   required: Columns every row needs.
+#   conflict: Unique columns to update existing rows on.
+#   timestamps: Columns holding epoch milliseconds.
+IMPORT_TABLES = {
+    'chat_messages': {
+        'required': ['sent_at', 'username', 'message'],
+        'conflict': [],
+        'timestamps': ['sent_at'],
+    },
+    'users': {
+        'required': ['username', 'user_id'],
+        'conflict': ['username', 'user_id'],
+        'timestamps': [
+            'ban_until',
+            'first_join_time',
+            'last_join_time',
+            'last_leave_time',
+        ],
+    },
+}
+
+# Pragmas relaxed during the import, restored afterwards.
+IMPORT_PRAGMAS = {
+    'synchronous': 'OFF',
+    'cache_size': -262144,
+    'temp_store': 'MEMORY',
+}
+
+
+def read_records(handle: TextIO, file_format: str) -> Iterator[dict]:
+    """Read the records of a file one at a time.
+
+    Args:
+        handle (TextIO): Open file.
+        file_format (str): Either 'csv' or 'jsonl'.
+
+    Yields:
+        (dict): Record as field: value.
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(handle)
+        return
+
+    for line in handle:
+        if line.strip():
+            yield json.loads(line)
+
+
+class BulkImporter(object):
+    """Bulk Importer Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(BulkImporter, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (BulkImporter): Class instance.
+        """
+        self.db = bot.db
+
+        # Rows written per executemany and transaction.
+        self.batch_size = bot.twitch_config.get('import_batch_size', 50000)
+
+        return self
+
+    async def _get_columns(self, table: str) -> dict:
+        """Get the columns of a table and their defaults.
+
+        Args:
+            table (str): Table name.
+
+        Returns:
+            (dict): Dictionary of column: default value SQL or None.
+        """
+        columns = await self.db.execute(
+            f'PRAGMA table_info({table});', commit=False
+        )
+        return {c['name']: c['dflt_value'] for c in columns or []}
+
+    async def _relax_pragmas(self) -> dict:
+        """Set the import pragmas.
+
+        Returns:
+            (dict): Previous values of the pragmas.
+        """
+        previous = {}
+        for pragma, value in IMPORT_PRAGMAS.items():
+            rows = await self.db.execute(f'PRAGMA {pragma};', commit=False)
+            previous[pragma] = rows[0][0]
+            await self.db.execute(f'PRAGMA {pragma} = {value};', commit=False)
+
+        return previous
+
+    async def _restore_pragmas(self, previous: dict) -> None:
+        """Restore the pragmas changed for the import.
+
+        Args:
+            previous (dict): Previous values of the pragmas.
+        """
+        for pragma, value in previous.items():
+            await self.db.execute(f'PRAGMA {pragma} = {value};', commit=False)
+
+    async def _drop_indexes(self, table: str) -> list:
+        """Drop the secondary indexes of a table.
+
+        Args:
+            table (str): Table name.
+
+        Returns:
+            (list): CREATE statements of the dropped indexes.
+        """
+        indexes = await self.db.execute(
+            'SELECT name, sql FROM sqlite_master WHERE type = "index" '
+            'AND tbl_name = ? AND sql IS NOT NULL;',
+            [table],
+            commit=False,
+        )
+
+        dropped = []
+        for index in indexes or []:
+            if 'UNIQUE' in index['sql'].upper():
+                continue
+
+            await self.db.execute(f'DROP INDEX {index["name"]};')
+            dropped.append(index['sql'])
+
+        return dropped
+
+    async def _create_indexes(self, statements: list) -> None:
+        """Build indexes dropped for the import.
+
+        Args:
+            statements (list): CREATE statements of the indexes.
+        """
+        for statement in statements:
+            start = time.perf_counter()
+            await self.db.execute(statement)
+            LOG.info(
+                f'Built index in {time.perf_counter() - start:.1f}s: '
+                f'{statement}'
+            )
+
+    @staticmethod
+    def _insert_statement(table: str, columns: list, defaults: dict) -> str:
+        """Build the statement inserting one row.
+
+        Empty values fall back to the column defaults and rows that already
+        exist are updated with the imported columns.
+
+        Args:
+            table (str): Table name.
+            columns (list): Imported columns.
+            defaults (dict): Dictionary of column: default value SQL or None.
+
+        Returns:
+            (str): SQL statement.
+        """
+        values = [
+            f'COALESCE(?, {defaults[c]})' if defaults[c] is not None else '?'
+            for c in columns
+        ]
+        cmd = (
+            f'INSERT INTO {table} ({", ".join(columns)}) '
+            f'VALUES ({", ".join(values)})'
+        )
+
+        conflict = IMPORT_TABLES[table]['conflict']
+        if conflict:
+            updates = [
+                f'{c} = excluded.{c}' for c in columns if c not in conflict
+            ]
+            if updates:
+                action = f'DO UPDATE SET {", ".join(updates)}'
+            else:
+                action = 'DO NOTHING'
+            cmd += f' ON CONFLICT ({", ".join(conflict)}) {action}'
+
+        return cmd + ';'
+
+    async def import_file(
+        self,
+        table: str,
+        path: str,
+        file_format: Optional[str] = None,
+        mapping: Optional[dict] = None,
+    ) -> int:
+        """Import a CSV or JSON Lines file into a table.
+
+        Args:
+            table (str): Table name, one of IMPORT_TABLES.
+            path (str): Path to the file.
+            file_format (str, optional): Either 'csv' or 'jsonl'.
+                Default is taken from the file extension.
+            mapping (dict, optional): Dictionary of file field: column.
+
+        Returns:
+            (int): Number of imported rows.
+        """
+        settings = IMPORT_TABLES[table]
+        mapping = mapping or {}
+        if not file_format:
+            file_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+        defaults = await self._get_columns(table)
+        defaults.pop('id', None)
+        size = os.path.getsize(path) or 1
+
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            records = read_records(handle, file_format)
+            first = next(records, None)
+            if first is None:
+                LOG.warning(f'Nothing to import from {path}.')
+                return 0
+
+            # Field read for each column.
+            fields = {}
+            for field in first:
+                column = mapping.get(field, field)
+                if column in defaults:
+                    fields[column] = field
+
+            missing = [c for c in settings['required'] if c not in fields]
+            if missing:
+                LOG.error(f'Unable to import {path}, missing {missing}.')
+                return 0
+
+            columns = list(fields)
+            sources = [fields[c] for c in columns]
+            timestamps = [
+                i for i, c in enumerate(columns) if c in settings['timestamps']
+            ]
+            required = [
+                i for i, c in enumerate(columns) if c in settings['required']
+            ]
+            cmd = self._insert_statement(table, columns, defaults)
+
+            previous = await self._relax_pragmas()
+            dropped = await self._drop_indexes(table)
+            # Every batch is slower than the threshold, which says nothing.
+            slow_query_ms, self.db.slow_query_ms = self.db.slow_query_ms, None
+
+            imported = 0
+            skipped = 0
+            start = time.perf_counter()
+            # Batch being written while the next one is read.
+            pending = None
+            try:
+                batch = []
+                for record in itertools.chain([first], records):
+                    row = [record.get(source) for source in sources]
+                    if '' in row:
+                        row = [None if v == '' else v for v in row]
+                    for index in timestamps:
+                        if row[index] is not None:
+                            row[index] = time_utils.to_epoch_ms(row[index])
+
+                    if None in row and any(row[i] is None for i in required):
+                        skipped += 1
+                        continue
+
+                    batch.append(row)
+                    if len(batch) < self.batch_size:
+                        continue
+
+                    if pending is not None:
+                        imported += await pending
+                    pending = asyncio.ensure_future(
+                        self._write_batch(cmd, batch)
+                    )
+                    # Hand the batch to the database thread.
+                    await asyncio.sleep(0)
+                    batch = []
+
+                    elapsed = time.perf_counter() - start
+                    LOG.info(
+                        f'Imported {imported} rows into {table} '
+                        f'({handle.buffer.tell() / size:.0%}, '
+                        f'{imported / elapsed:.0f} rows/s).'
+                    )
+
+                if pending is not None:
+                    imported += await pending
+                if batch:
+                    imported += await self._write_batch(cmd, batch)
+
+            finally:
+                if pending is not None:
+                    await asyncio.gather(pending, return_exceptions=True)
+                await self._create_indexes(dropped)
+                await self._restore_pragmas(previous)
+                self.db.slow_query_ms = slow_query_ms
+
+        await self.db.execute('PRAGMA optimize;', commit=False)
+
+        LOG.info(
+            f'Imported {imported} rows into {table} in '
+            f'{time.perf_counter() - start:.1f}s, skipped {skipped} rows '
+            'with missing values.'
+        )
+        return imported
+
+    async def _write_batch(self, cmd: str, batch: list) -> int:
+        """Write a batch of rows in one transaction.
+
+        Args:
+            cmd (str): SQL statement.
+            batch (list): Rows of values.
+
+        Returns:
+            (int): Number of written rows.
+
+        Raises:
+            BotDBError: If the batch could not be written.
+        """
+        async with self.db.transaction():
+            result = await self.db.execute_many(cmd, batch, commit=False)
+            if result is None:
+                raise BotDBError('Unable to write the import batch.')
+
+        return len(batch)
+
+
+async def run_import(
+    table: str,
+    path: str,
+    file_format: Optional[str] = None,
+    mapping: Optional[dict] = None,
+) -> None:
+    """Run an import outside of the bot.
+
+    Args:
+        table (str): Table name, one of IMPORT_TABLES.
+        path (str): Path to the file.
+        file_format (str, optional): Either 'csv' or 'jsonl'.
+        mapping (dict, optional): Dictionary of file field: column.
+    """
+    db = await database_utils.Database().init()
+
+    importer = await BulkImporter().init(
+        SimpleNamespace(db=db, twitch_config=db.twitch_config)
+    )
+    try:
+        await importer.import_file(table, path, file_format, mapping)
+
+    except Exception as e:
+        LOG.error(
+            'Unable to import {}: {}'.format(
+                path, getattr(e, 'message', repr(e))
+            )
+        )
+
+    await db.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('table', choices=sorted(IMPORT_TABLES))
+    parser.add_argument('path', help='CSV or JSON Lines file to import.')
+    parser.add_argument(
+        '--format',
+        choices=['csv', 'jsonl'],
+        help='File format, taken from the extension by default.',
+    )
+    parser.add_argument(
+        '--map',
+        action='append',
+        default=[],
+        metavar='FIELD=COLUMN',
+        help='Import a field of the file into a differently named column.',
+    )
+    args = vars(parser.parse_args())
+
+    asyncio.run(
+        run_import(
+            args['table'],
+            args['path'],
+            file_format=args.get('format'),
+            mapping=dict(m.split('=', 1) for m in args.get('map', [])),
+        )
+    )
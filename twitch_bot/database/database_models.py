@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 
-"""Test of the Tortoise ORM Models."""
+"""Database models.
+
+Tortoise ORM models of the core tables. The tables themselves are created by
+the migrations in 'database/migrations', so keep these in line with them.
+"""
 
 from tortoise import fields
 from tortoise.models import Model
@@ -10,31 +14,27 @@ class Users(Model):
     """Users table model."""
 
     id = fields.IntField(pk=True)
-    username = fields.CharField(max_length=255, unique=True)
-    user_id = fields.IntField(unique=True)
+    username = fields.CharField(max_length=255)
+    # Only unique together with the username, like the users_index.
+    user_id = fields.IntField()
     is_mod = fields.BooleanField(default=False)
     is_regular = fields.BooleanField(default=False)
     is_banned = fields.BooleanField(default=False)
-    ban_until = fields.CharField(max_length=255, default='1970-01-01 00:00:00')
+    # Timestamps are epoch milliseconds.
+    ban_until = fields.BigIntField(default=0)
     time_watched = fields.IntField(default=0)
     messages_sent_session = fields.IntField(default=0)
     messages_sent_total = fields.IntField(default=0)
-    first_join_time = fields.CharField(
-        max_length=255, default='1970-01-01 00:00:00'
-    )
-    last_join_time = fields.CharField(
-        max_length=255, default='1970-01-01 00:00:00'
-    )
-    last_leave_time = fields.CharField(
-        max_length=255, default='1970-01-01 00:00:00'
-    )
+    first_join_time = fields.BigIntField(default=0)
+    last_join_time = fields.BigIntField(default=0)
+    last_leave_time = fields.BigIntField(default=0)
     announce = fields.BooleanField(default=False)
     points = fields.IntField(default=0)
     loyalty_points = fields.IntField(default=0)
 
     class Meta:
         table = 'users'
-        indexes = ('username', 'user_id')
+        unique_together = ('username', 'user_id')
 
     def as_dict(self) -> dict:
         data_dict = {
@@ -66,8 +66,8 @@ class ViewerStats(Model):
     """Viewer stats table model."""
 
     id = fields.IntField(pk=True)
-    date = fields.CharField(max_length=255, default='1970-01-01')
-    time = fields.CharField(max_length=255, default='00:00:00')
+    # Epoch milliseconds.
+    sample_time = fields.BigIntField(default=0)
     viewer_count = fields.IntField(default=0)
 
     class Meta:
@@ -76,8 +76,7 @@ class ViewerStats(Model):
     def as_dict(self) -> dict:
         data_dict = {
             'id': self.id,
-            'date': self.date,
-            'time': self.time,
+            'sample_time': self.sample_time,
             'viewer_count': self.viewer_count,
         }
         return data_dict
@@ -97,12 +96,8 @@ class StreamStats(Model):
     messages = fields.IntField(default=0)
     raids = fields.IntField(default=0)
     rewards = fields.IntField(default=0)
-    stream_end = fields.CharField(
-        max_length=255, default='1970-01-01 00:00:00'
-    )
-    stream_start = fields.CharField(
-        max_length=255, default='1970-01-01 00:00:00'
-    )
+    stream_end = fields.BigIntField(default=0)
+    stream_start = fields.BigIntField(default=0)
     subscribers = fields.IntField(default=0)
 
     class Meta:
@@ -132,13 +127,9 @@ class StreamEvents(Model):
     """Stream events table model."""
 
     id = fields.IntField(pk=True)
-    stream_end = fields.CharField(
-        max_length=255, default='1970-01-01 00:00:00'
-    )
-    stream_start = fields.CharField(
-        max_length=255, default='1970-01-01 00:00:00'
-    )
-    usernames = fields.CharField(max_length=255)
+    stream_end = fields.BigIntField(default=0)
+    stream_start = fields.BigIntField(default=0)
+    usernames = fields.TextField(null=True)
 
     class Meta:
         table = 'stream_events'
@@ -155,3 +146,55 @@ class StreamEvents(Model):
     def __str__(self) -> str:
         data_dict = self.as_dict()
         return ', '.join([f'{k}: {data_dict[k]}' for k in data_dict])
+
+
+class StreamCountersState(Model):
+    """Stream counters state table model."""
+
+    id = fields.IntField(pk=True)
+    last_seq = fields.IntField(default=0)
+
+    class Meta:
+        table = 'stream_counters_state'
+
+    def as_dict(self) -> dict:
+        data_dict = {
+            'id': self.id,
+            'last_seq': self.last_seq,
+        }
+        return data_dict
+
+    def __str__(self) -> str:
+        data_dict = self.as_dict()
+        return ', '.join([f'{k}: {data_dict[k]}' for k in data_dict])
+
+
+class BackupHistory(Model):
+    """Backup history table model."""
+
+    id = fields.IntField(pk=True)
+    path = fields.TextField()
+    method = fields.CharField(max_length=255)
+    duration = fields.FloatField(default=0)
+    size = fields.IntField(default=0)
+    compressed_size = fields.IntField(default=0)
+    created = fields.BigIntField(default=0)
+
+    class Meta:
+        table = 'backup_history'
+
+    def as_dict(self) -> dict:
+        data_dict = {
+            'id': self.id,
+            'path': self.path,
+            'method': self.method,
+            'duration': self.duration,
+            'size': self.size,
+            'compressed_size': self.compressed_size,
+            'created': self.created,
+        }
+        return data_dict
+
+    def __str__(self) -> str:
+        data_dict = self.as_dict()
+        return ', '.join([f'{k}: {data_dict[k]}' for k in data_dict])
@@ -1,17 +1,39 @@
 """Database Utils."""
 
-import aiofiles
 import aiosqlite
+import asyncio
+import contextlib
+import functools
 import os
+import re
+import time
 import traceback
 
-from datetime import datetime
-from typing import Callable, Optional
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+import time_utils
 
 from configs import config_utils
 
+from database.migration_utils import Migrator
+from exceptions.exceptions import BotDBError
+from init import METRICS
 from log import LOG
 
+# Statements that EXPLAIN QUERY PLAN can describe.
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'REPLACE', 'UPDATE', 'DELETE')
+
+# Minimum time in seconds between query plans logged for the same shape.
+EXPLAIN_INTERVAL = 600
+
+LITERAL_RE = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\b\d+(?:\.\d+)?\b"
+)
+PLACEHOLDER_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+VALUES_LIST_RE = re.compile(
+    r'\(\?, \.\.\.\)(?:\s*,\s*\(\?, \.\.\.\))+'
+)
+
 
 def database_decorator(func: Callable) -> Callable:
     """Commit plugin data to the database.
@@ -35,10 +57,14 @@ def database_decorator(func: Callable) -> Callable:
         has_table = hasattr(plugin, 'TABLE')
         has_fields = hasattr(plugin, 'FIELDS')
 
+        # Plugins without fields keep everything in their plugin state,
+        # which stands in for the last row.
         if has_table:
             last_row = await bot.db.get_last_row(plugin.TABLE)
-        else:
+        elif has_fields:
             last_row = await bot.db.get_last_row(plugin_name)
+        else:
+            last_row = await plugin.state.items()
         LOG.debug('db decorator last_row: {}'.format(dict(last_row)))
 
         # Run the plugin function.
@@ -50,31 +76,73 @@ def database_decorator(func: Callable) -> Callable:
 
         update_dict = {
             'last_user_id': user['id'],
-            'last_run': str(datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+            'last_run': time_utils.now_ms(),
         }
 
-        if has_table and has_fields:
-            # Update default plugin table first.
-            await bot.db.insert(plugin_name, update_dict)
+        # The timeouts and timers read the last run from the plugin state.
+        await plugin.state.update(update_dict)
 
-            # Append the update dict with values from the plugin.
-            update_dict.update(function_update_dict)
-            # Update the plugin specific table.
-            await bot.db.insert(plugin.TABLE, update_dict)
+        if not has_fields:
+            if isinstance(function_update_dict, dict):
+                await plugin.state.update(function_update_dict)
+            return
 
-        elif not has_table and has_fields:
-            # Append the update dict with values from the plugin.
-            update_dict.update(function_update_dict)
-            # Update default plugin table with added values..
-            await bot.db.insert(plugin_name, update_dict)
+        # Plugins with a 'state' retention policy only keep a single row, so
+        # update it in place instead of appending a new one.
+        policy = await bot.retention.get_policy(plugin)
+        if policy.get('mode') == 'state':
+            write = bot.db.upsert_last_row
+        else:
+            write = bot.db.insert
+
+        # Append the update dict with values from the plugin.
+        update_dict.update(function_update_dict or {})
+
+        if has_table:
+            # Update the plugin specific table.
+            # The custom table usually holds actual data (e.g. quotes) so it
+            # is only updated in place if the policy explicitly includes it.
+            if policy.get('include_table', False):
+                await write(plugin.TABLE, update_dict)
+            else:
+                await bot.db.insert(plugin.TABLE, update_dict)
 
         else:
-            # Only update default plugin table.
-            await bot.db.insert(plugin_name, update_dict)
+            # Update default plugin table with added values.
+            await write(plugin_name, update_dict)
 
     return decorated
 
 
+async def register_functions(connection: aiosqlite.Connection) -> None:
+    """Register the time helpers as SQL functions on a connection.
+
+    Args:
+        connection (aiosqlite.Connection): Database connection.
+    """
+    await connection.create_function('to_epoch_ms', 1, time_utils.to_epoch_ms)
+    await connection.create_function('local_date', 1, time_utils.local_date)
+
+
+@functools.lru_cache(maxsize=1024)
+def statement_shape(cmd: str) -> str:
+    """Reduce a statement to its shape.
+
+    Literals become '?' and lists of placeholders collapse, so statements
+    that only differ in their values (e.g. the queries of read() or an IN
+    list of any length) are timed together.
+
+    Args:
+        cmd (str): SQL statement.
+
+    Returns:
+        (str): Statement shape.
+    """
+    shape = LITERAL_RE.sub('?', ' '.join(cmd.split()))
+    shape = PLACEHOLDER_LIST_RE.sub('(?, ...)', shape)
+    return VALUES_LIST_RE.sub('(?, ...), ...', shape).rstrip(';')
+
+
 def check_database_response(func: Callable) -> Callable:
     """Decorator to check the response from the database."""
 
@@ -90,6 +158,8 @@ def check_database_response(func: Callable) -> Callable:
             for (k, v) in kwargs.items()
         }
 
+        result = None
+
         # Ensure the response from the database did not error out.
         try:
             result = await func(*args, **kwargs)
@@ -103,13 +173,52 @@ def check_database_response(func: Callable) -> Callable:
             # If the level is 'debug', print the traceback as well.
             if LOG.level == 0:
                 traceback.print_exc()
-                result = None
 
         return result
 
     return wrapper
 
 
+def check_database_statement(func: Callable) -> Callable:
+    """Decorator to check the response from a raw database statement.
+
+    Unlike check_database_response, the arguments are not sanitized since
+    they contain SQL and bound parameters.
+    """
+
+    async def wrapper(*args, **kwargs) -> object:
+        """Check database response code."""
+        result = None
+
+        try:
+            result = await func(*args, **kwargs)
+
+        except Exception as e:
+            LOG.error(
+                'Unable to communicate properly with database: {}'.format(
+                    getattr(e, 'message', repr(e))
+                )
+            )
+            # If the level is 'debug', print the traceback as well.
+            if LOG.level == 0:
+                traceback.print_exc()
+
+        return result
+
+    return wrapper
+
+
+def locked(func: Callable) -> Callable:
+    """Decorator to hold the database connection while a method runs."""
+
+    async def wrapper(db: object, *args, **kwargs) -> object:
+        """Run the method once no other task holds the connection."""
+        async with db.hold():
+            return await func(db, *args, **kwargs)
+
+    return wrapper
+
+
 class Database(object):
     """Database interaction object."""
 
@@ -117,18 +226,56 @@ class Database(object):
         """Init."""
         super(Database, self).__init__()
 
-    async def init(self) -> None:
-        """Async init."""
+    async def init(self, migrate: Optional[bool] = True) -> None:
+        """Async init.
+
+        Args:
+            migrate (bool, optional): Apply the pending core migrations.
+                Default is True.
+        """
         self.twitch_config = await config_utils.load_config_file('bot_config')
         self.db_path = os.path.join(
             os.path.dirname(__file__), self.twitch_config.get('database_path')
         )
+        # Rows fetched per query by iter_rows and iter_chunks.
+        self.chunk_size = self.twitch_config.get('database_chunk_size', 1000)
+
+        # Statements slower than this (in milliseconds) are logged with
+        # their query plan, empty to turn the log off.
+        self.slow_query_ms = self.twitch_config.get('slow_query_ms', 100)
+        # Prefix of the statement metrics.
+        self.metrics_name = 'db'
+        self.explained = {}
+
+        # All the tasks share one connection, so each statement and each
+        # transaction holds it until done, see transaction().
+        self.lock = asyncio.Lock()
+        self.lock_owner = None
+        self.transaction_depth = 0
+        self.rollback_callbacks = []
+
+        # Local times are in the configured timezone everywhere, including
+        # the migrations and the command line tools.
+        time_utils.set_timezone(self.twitch_config.get('timezone'))
 
         self.connection = await self._connect_to_db()
         self.connection.row_factory = aiosqlite.Row
         self.cursor = await self.connection.cursor()
-
-        await self._create_default_tables()
+        await register_functions(self.connection)
+
+        # Allow freed pages to be reclaimed in small steps after compaction.
+        # This only takes effect on new databases, existing databases need a
+        # full VACUUM to switch modes.
+        await self.cursor.execute('PRAGMA auto_vacuum = INCREMENTAL;')
+        # Let backups and other readers run alongside the bot's writes.
+        # The pragma returns the new mode, which has to be read so the
+        # statement doesn't stay open and block commits.
+        await self.cursor.execute('PRAGMA journal_mode = WAL;')
+        await self.cursor.fetchall()
+
+        self.migrator = await Migrator().init(self)
+        if migrate:
+            await self.migrator.migrate_core()
 
         return self
 
@@ -147,7 +294,104 @@ class Database(object):
         LOG.debug(f'Connecting to database at: {db_path}')
         return await aiosqlite.connect(db_path)
 
+    @contextlib.asynccontextmanager
+    async def hold(self) -> AsyncIterator[None]:
+        """Hold the connection for the current task.
+
+        Re-entrant, so methods holding it can call each other.
+        """
+        task = asyncio.current_task()
+        if self.lock_owner is task:
+            yield
+            return
+
+        async with self.lock:
+            self.lock_owner = task
+            try:
+                yield
+            finally:
+                self.lock_owner = None
+
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """Run statements in one transaction.
+
+        The connection is held for the whole transaction, so statements and
+        commits of other tasks wait for it instead of ending up inside it.
+        It is committed at the end of the block and rolled back if the block
+        raises. Statements in it run with commit=False, failed ones return
+        None and should raise to roll the transaction back.
+
+        Nested transactions of the same task join the outer one, so writers
+        can be combined into a larger transaction, e.g. settling a stream.
+
+        Yields:
+            None
+
+        Raises:
+            BotDBError: If the transaction can't be started or committed.
+        """
+        async with self.hold():
+            if self.transaction_depth:
+                self.transaction_depth += 1
+                try:
+                    yield
+                finally:
+                    self.transaction_depth -= 1
+                return
+
+            try:
+                # Commit whatever a statement without a transaction left.
+                if self.connection.in_transaction:
+                    await self.connection.commit()
+                await self.connection.execute('BEGIN;')
+
+            except Exception as e:
+                raise BotDBError(
+                    'Unable to begin a transaction: {}'.format(
+                        getattr(e, 'message', repr(e))
+                    )
+                )
+
+            self.transaction_depth = 1
+            self.rollback_callbacks = []
+            try:
+                yield
+
+                try:
+                    await self.connection.commit()
+
+                except Exception as e:
+                    raise BotDBError(
+                        'Unable to commit the transaction: {}'.format(
+                            getattr(e, 'message', repr(e))
+                        )
+                    )
+
+            except BaseException:
+                await self.connection.rollback()
+                for callback in self.rollback_callbacks:
+                    await callback()
+                raise
+
+            finally:
+                self.transaction_depth = 0
+                self.rollback_callbacks = []
+
+    def on_rollback(self, callback: Callable) -> None:
+        """Run a callback if the current transaction is rolled back.
+
+        Lets writers put back the in-memory changes they took out for a
+        transaction, including one they only joined. A writer that fails
+        inside a joined transaction leaves the rollback to its caller.
+
+        Args:
+            callback (function): Coroutine function without arguments.
+        """
+        self.rollback_callbacks.append(callback)
+
     @check_database_response
+    @locked
     async def read(
         self,
         table: str,
@@ -171,6 +415,7 @@ class Database(object):
             data (list|None): Row(s) from the database in the form:
                 [sqlite3.Row1, sqlite3.Row2, sqlite3.Row3, ...]
                 If no data is found, None is returned.
+                Use iter_rows() to read large tables instead of select_all.
         """
         if not columns:
             columns = '*'
@@ -193,7 +438,7 @@ class Database(object):
             where = ''
 
         cmd = f'SELECT {columns} FROM {table}{where} ORDER BY id DESC{limit};'
-        await self.cursor.execute(cmd)
+        await self._run(cmd)
         data = await self.cursor.fetchall()
 
         if data and not select_all:
@@ -202,6 +447,7 @@ class Database(object):
         return data
 
     @check_database_response
+    @locked
     async def read_range(
         self, table: str, ranges: list, columns: Optional[list] = None
     ) -> dict:
@@ -238,22 +484,301 @@ class Database(object):
         where = 'WHERE {}'.format(' AND '.join(fields))
 
         cmd = f'SELECT {columns} FROM {table} {where};'
-        await self.cursor.execute(cmd)
+        await self._run(cmd)
         data = await self.cursor.fetchall()
 
         return data
 
+    async def _run(self, cmd: str) -> aiosqlite.Cursor:
+        """Run a statement on the shared cursor and time it.
+
+        Args:
+            cmd (str): SQL statement.
+
+        Returns:
+            (aiosqlite.Cursor): The cursor, to fetch the rows from.
+        """
+        start = time.perf_counter()
+        await self.cursor.execute(cmd)
+        await self._record(cmd, start)
+
+        return self.cursor
+
+    async def _record(
+        self,
+        cmd: str,
+        start: float,
+        parameters: Optional[Iterable] = None,
+        many: Optional[bool] = False,
+    ) -> None:
+        """Record the time taken by a statement under its shape.
+
+        Statements slower than 'slow_query_ms' are also counted and logged
+        with their bound parameter count and query plan.
+
+        Args:
+            cmd (str): SQL statement.
+            start (float): time.perf_counter() before the statement ran.
+            parameters (iterable, optional): Values bound to the statement.
+            many (bool, optional): Whether the statement ran once per set
+                of parameters. Default is False.
+        """
+        elapsed = (time.perf_counter() - start) * 1000
+        shape = statement_shape(cmd)
+        METRICS.observe(f'{self.metrics_name}_statement_ms', elapsed, shape)
+
+        if self.slow_query_ms is None or elapsed < self.slow_query_ms:
+            return
+
+        METRICS.incr(f'{self.metrics_name}_slow_statements', shape)
+
+        # Iterators were consumed by executemany and can't be counted.
+        if not isinstance(parameters, (list, tuple)):
+            parameters = None
+        if many and parameters:
+            count = f'{len(parameters)} x {len(parameters[0])}'
+            parameters = parameters[0]
+        else:
+            count = len(parameters or ())
+
+        LOG.warning(
+            f'Slow statement on {self.metrics_name} ({elapsed:.1f}ms, '
+            f'{count} parameters): {shape}'
+        )
+
+        if not shape.upper().startswith(EXPLAINABLE):
+            return
+        now = time.monotonic()
+        last = self.explained.get(shape)
+        if last is not None and now - last < EXPLAIN_INTERVAL:
+            return
+        self.explained[shape] = now
+
+        try:
+            async with self.connection.execute(
+                f'EXPLAIN QUERY PLAN {cmd}', parameters or ()
+            ) as cursor:
+                plan = await cursor.fetchall()
+
+        except Exception as e:
+            LOG.error(
+                'Unable to explain the slow statement: {}'.format(
+                    getattr(e, 'message', repr(e))
+                )
+            )
+            return
+
+        # Rows are (id, parent, notused, detail), indent them as a tree.
+        depths = {0: 0}
+        lines = []
+        for row in plan:
+            depth = depths.get(row[1], 0) + 1
+            depths[row[0]] = depth
+            lines.append('  ' * depth + row[3])
+        LOG.warning('Query plan:\n{}'.format('\n'.join(lines)))
+
+    @check_database_statement
+    @locked
+    async def execute(
+        self,
+        cmd: str,
+        parameters: Optional[Iterable] = None,
+        commit: Optional[bool] = True,
+    ) -> list:
+        """Execute a parameterized statement.
+
+        Args:
+            cmd (str): SQL statement using '?' placeholders.
+            parameters (iterable, optional): Values bound to the placeholders.
+            commit (bool, optional): Whether or not to commit afterwards.
+                Default is True.
+
+        Returns:
+            data (list): Row(s) returned by the statement.
+        """
+        start = time.perf_counter()
+        async with self.connection.execute(cmd, parameters or ()) as cursor:
+            data = await cursor.fetchall()
+        await self._record(cmd, start, parameters)
+
+        if commit:
+            await self.commit()
+
+        return data
+
+    @check_database_statement
+    @locked
+    async def execute_many(
+        self,
+        cmd: str,
+        parameters: Iterable,
+        commit: Optional[bool] = True,
+    ) -> int:
+        """Execute a parameterized statement once per set of parameters.
+
+        Args:
+            cmd (str): SQL statement using '?' placeholders.
+            parameters (iterable): Sequence of values for each execution.
+            commit (bool, optional): Whether or not to commit afterwards.
+                Default is True.
+
+        Returns:
+            (int): The number of modified rows.
+        """
+        start = time.perf_counter()
+        async with self.connection.executemany(cmd, parameters) as cursor:
+            rowcount = cursor.rowcount
+        await self._record(cmd, start, parameters, many=True)
+
+        if commit:
+            await self.commit()
+
+        return rowcount
+
+    async def iter_chunks(
+        self,
+        table: str,
+        columns: Optional[list] = None,
+        where: Optional[str] = None,
+        parameters: Optional[Iterable] = None,
+        key: Optional[str] = 'id',
+        after: Optional[Any] = None,
+        chunk_size: Optional[int] = None,
+        tuples: Optional[bool] = False,
+    ) -> AsyncIterator[list]:
+        """Read a table in chunks, ordered by a unique key.
+
+        Each chunk is its own 'WHERE key > last key LIMIT n' query
+        (keyset pagination), so no statement stays open between chunks,
+        writes can run in between, and only one chunk is held in memory.
+
+        Args:
+            table (str): Table name.
+            columns (list, optional): Columns to select.
+                Default is '*' (all).
+            where (str, optional): Extra condition using '?' placeholders.
+            parameters (iterable, optional): Values bound to the
+                placeholders of the condition.
+            key (str, optional): Unique, indexed column to paginate on.
+                Default is 'id'.
+            after (any, optional): Only read the rows with a key above it.
+                Default is all the rows.
+            chunk_size (int, optional): Rows per chunk.
+                Default is 'database_chunk_size' from the config.
+            tuples (bool, optional): Return plain tuples of the selected
+                columns instead of rows. Default is False.
+                Rows also hold the key if it wasn't one of the columns.
+
+        Yields:
+            (list): Chunk of rows, or tuples if 'tuples' is set.
+
+        Raises:
+            BotDBError: If a chunk cannot be read.
+        """
+        chunk_size = chunk_size or self.chunk_size
+
+        # The key is needed to find the next chunk, so it is selected in
+        # front of the columns if they don't include it.
+        select = list(columns or [])
+        if select and key not in select:
+            select.insert(0, key)
+        trim = len(select) > len(columns or [])
+        projection = ', '.join(select) or '*'
+
+        parameters = list(parameters or [])
+
+        # Every chunk is read from the connection the iteration started on,
+        # so a snapshot swap (see AnalyticsDatabase) can't split it.
+        connection = self.connection
+
+        while True:
+            conditions = [f'({where})'] if where else []
+            values = list(parameters)
+            if after is not None:
+                conditions.insert(0, f'{key} > ?')
+                values.insert(0, after)
+
+            where_cmd = ''
+            if conditions:
+                where_cmd = ' WHERE {}'.format(' AND '.join(conditions))
+
+            cmd = (
+                f'SELECT {projection} FROM {table}{where_cmd} '
+                f'ORDER BY {key} LIMIT ?;'
+            )
+
+            try:
+                async with self.hold():
+                    start = time.perf_counter()
+                    async with connection.execute(
+                        cmd, values + [chunk_size]
+                    ) as cursor:
+                        if tuples:
+                            cursor.row_factory = None
+                        chunk = await cursor.fetchall()
+                        names = [d[0] for d in cursor.description]
+                    await self._record(cmd, start, values + [chunk_size])
+
+            except Exception as e:
+                raise BotDBError(
+                    'Unable to read {} after {}: {}'.format(
+                        table, after, getattr(e, 'message', repr(e))
+                    )
+                )
+
+            if not chunk:
+                return
+
+            after = chunk[-1][names.index(key)]
+            if tuples and trim:
+                chunk = [row[1:] for row in chunk]
+
+            yield chunk
+
+            if len(chunk) < chunk_size:
+                return
+
+    async def iter_rows(self, table: str, **kwargs) -> AsyncIterator:
+        """Read a table row by row, fetching it in chunks.
+
+        Args:
+            table (str): Table name.
+            kwargs: Options of iter_chunks().
+
+        Yields:
+            (sqlite3.Row|tuple): Row, or tuple if 'tuples' is set.
+
+        Raises:
+            BotDBError: If a chunk cannot be read.
+        """
+        async for chunk in self.iter_chunks(table, **kwargs):
+            for row in chunk:
+                yield row
+
     @check_database_response
+    @locked
     async def commit(self) -> None:
-        """Commit to database."""
-        await self.connection.commit()
+        """Commit to database.
+
+        Inside a transaction() the commit is left to the transaction.
+        """
+        if not self.transaction_depth:
+            await self.connection.commit()
 
     @check_database_response
+    @locked
+    async def rollback(self) -> None:
+        """Roll back the current transaction."""
+        await self.connection.rollback()
+
+    @check_database_response
+    @locked
     async def close(self) -> None:
         """Close database."""
         await self.connection.close()
 
     @check_database_response
+    @locked
     async def insert(self, table: str, data: dict) -> None:
         """Add a new entry into the database.
 
@@ -274,10 +799,40 @@ class Database(object):
             values='", "'.join(values),
         )
 
-        await self.cursor.execute(cmd)
+        await self._run(cmd)
         await self.commit()
 
     @check_database_response
+    @locked
+    async def upsert_last_row(self, table: str, data: dict) -> None:
+        """Update the last row of a table in place.
+
+        If the table is empty, a new row is inserted instead.
+
+        Args:
+            table (str): Table name.
+            data (dict): Dictionary of column: value.
+        """
+        fields = ', '.join([f'{key} = ?' for key in data])
+        values = [str(data[key]) for key in data]
+
+        cmd = (
+            f'UPDATE {table} SET {fields} '
+            f'WHERE id = (SELECT MAX(id) FROM {table});'
+        )
+        start = time.perf_counter()
+        async with self.connection.execute(cmd, values) as cursor:
+            updated = cursor.rowcount
+        await self._record(cmd, start, values)
+
+        if not updated:
+            await self.insert(table, data)
+            return
+
+        await self.commit()
+
+    @check_database_response
+    @locked
     async def update(self, table: str, data: dict, conditions: dict) -> None:
         """Update the database.
 
@@ -303,10 +858,11 @@ class Database(object):
             targets=', '.join(targets),
         )
 
-        await self.cursor.execute(cmd)
+        await self._run(cmd)
         await self.commit()
 
     @check_database_response
+    @locked
     async def delete(self, table: str, conditions: dict) -> None:
         """Delete a row from the database.
 
@@ -325,22 +881,25 @@ class Database(object):
             targets=', '.join(targets),
         )
 
-        await self.cursor.execute(cmd)
+        await self._run(cmd)
         await self.commit()
 
-    @check_database_response
-    async def create_table(self, name: str, fields: dict = None) -> None:
-        """Create a table in the database.
+    @staticmethod
+    def create_table_statement(name: str, fields: dict = None) -> str:
+        """Build the statement creating a plugin table.
 
         Args:
             name (str): Table name.
             fields (dict): Dictionary of fields: data types.
                 If not given, only defaults will be used.
+
+        Returns:
+            (str): SQL statement.
         """
         base_cmd = [
             'id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT',
             'last_user_id INTEGER NOT NULL',
-            'last_run TEXT DEFAULT "1970-01-01 00:00:00"',
+            'last_run INTEGER NOT NULL DEFAULT 0',
         ]
 
         if not fields:
@@ -350,15 +909,27 @@ class Database(object):
             data_types = fields[key]
             base_cmd.append(f'{key} {data_types}')
 
-        cmd = (
+        return (
             f'CREATE TABLE IF NOT EXISTS {name} ('
             + ', '.join(base_cmd)
             + ', FOREIGN KEY(last_user_id) REFERENCES users(id));'
         )
-        await self.cursor.execute(cmd)
+
+    @check_database_response
+    @locked
+    async def create_table(self, name: str, fields: dict = None) -> None:
+        """Create a table in the database.
+
+        Args:
+            name (str): Table name.
+            fields (dict): Dictionary of fields: data types.
+                If not given, only defaults will be used.
+        """
+        await self._run(self.create_table_statement(name, fields))
         await self.commit()
 
     @check_database_response
+    @locked
     async def drop_table(self, name: str) -> None:
         """Drop a table from the database.
 
@@ -366,41 +937,22 @@ class Database(object):
             name (str): Table name.
         """
         cmd = f'DROP TABLE {name};'
-        await self.cursor.execute(cmd)
+        await self._run(cmd)
         await self.commit()
 
     @check_database_response
-    async def _backup_db(self) -> None:
-        """Backup the database."""
-        time = str(datetime.now())
-        backup_db_path = os.path.join(
-            os.path.dirname(self.db_path), f'backup_{time}.db'
-        )
-        backup_db = await self._connect_to_db(backup_db_path)
-        await self.connection.backup(backup_db)
-
-    @check_database_response
-    async def _create_default_tables(self) -> None:
-        """Create the users table."""
-        db_script = os.path.join(
-            os.path.dirname(__file__), 'create_tables.sql'
-        )
-        async with aiofiles.open(db_script, 'r') as in_file:
-            await self.cursor.executescript(await in_file.read())
-
-    @check_database_response
+    @locked
     async def _get_tables(self) -> list:
         """Get all the tables.
 
         Returns:
             (list): List of tables in the database.
         """
-        await self.cursor.execute(
-            'SELECT name FROM sqlite_master WHERE type="table";'
-        )
+        await self._run('SELECT name FROM sqlite_master WHERE type="table";')
         return [table[0] for table in await self.cursor.fetchall()]
 
     @check_database_response
+    @locked
     async def count_rows(self, table: str) -> int:
         """Count the number of rows in a table.
 
@@ -410,10 +962,11 @@ class Database(object):
         Returns:
             (int): The number of rows in the table.
         """
-        result = await self.cursor.execute(f'SELECT COUNT(*) FROM {table}')
+        result = await self._run(f'SELECT COUNT(*) FROM {table}')
         return (await result.fetchone())[0]
 
     @check_database_response
+    @locked
     async def add_column(
         self, table: str, column: str, data_type: str
     ) -> None:
@@ -425,8 +978,42 @@ class Database(object):
             data_type (str): Data type of the new column.
         """
         cmd = f'ALTER TABLE {table} ADD {column} {data_type};'
-        await self.cursor.execute(cmd)
+        await self._run(cmd)
+        await self.commit()
+
+    @staticmethod
+    def convert_timestamps_statement(table: str, column: str) -> str:
+        """Build the statement converting text timestamps in a column.
+
+        Only rows still holding a formatted date are rewritten, so this is
+        a no-op once the table has been converted.
+
+        Args:
+            table (str): Table name.
+            column (str): Column holding the timestamps.
+
+        Returns:
+            (str): SQL statement.
+        """
+        return (
+            f'UPDATE {table} SET {column} = COALESCE(to_epoch_ms('
+            f'NULLIF({column}, "1970-01-01 00:00:00")), 0) '
+            f'WHERE {column} GLOB "[0-9][0-9][0-9][0-9]-*";'
+        )
+
+    @check_database_response
+    @locked
+    async def convert_timestamps(self, table: str, column: str) -> None:
+        """Convert text timestamps in a column to epoch milliseconds.
+
+        Args:
+            table (str): Table name.
+            column (str): Column holding the timestamps.
+        """
+        await self._run(self.convert_timestamps_statement(table, column))
+        await self.commit()
 
+    @locked
     async def get_last_row(self, table: str) -> dict:
         """Get the last row from the table.
 
@@ -0,0 +1,421 @@
+"""Columnar export of the stream history.
+
+Copies the stream history tables into Parquet (or Arrow IPC) files so they
+can be loaded for analysis without going through the bot database:
+    <export_path>/<table>/date=<YYYY-MM-DD>/part-<first id>-<last id>.parquet
+
+The history tables only ever get new rows, so each export only reads the
+rows added since the last one (tracked in the export_state table) and
+appends them as new files, partitioned by stream date. The row of a stream
+that is still live keeps changing until the stream is settled, so it is left
+for a later export. The users table is updated in place, so it is written
+out as a single snapshot instead.
+
+Columns are typed from the table declarations. Timestamps are stored as
+int64 milliseconds since the epoch, the same as in the database.
+
+Exports require pyarrow, which is optional. An export can also be run by
+hand from the 'twitch_bot' folder:
+    python -m database.export
+"""
+
+import asyncio
+import os
+
+from types import SimpleNamespace
+
+import time_utils
+
+from database import database_utils
+from log import LOG
+
+# Export settings of the history tables:
+#   date: Timestamp column whose local date is used to partition the rows.
+#   timestamps: Output column: source column.
+#   open (optional): Condition matching a row that is still being written.
+#       Only the latest row can be open, a new stream settles the others.
+HISTORY_TABLES = {
+    'stream_events': {
+        'date': 'stream_start',
+        'timestamps': {
+            'stream_start': 'stream_start',
+            'stream_end': 'stream_end',
+        },
+        'open': 'stream_end <= stream_start',
+    },
+    'stream_stats': {
+        'date': 'stream_start',
+        'timestamps': {
+            'stream_start': 'stream_start',
+            'stream_end': 'stream_end',
+        },
+        'open': 'stream_end <= stream_start',
+    },
+    'viewer_stats': {
+        'date': 'sample_time',
+        'timestamps': {'timestamp': 'sample_time'},
+    },
+}
+
+SNAPSHOT_TABLES = {
+    'users': {
+        'timestamps': {
+            'ban_until': 'ban_until',
+            'first_join_time': 'first_join_time',
+            'last_join_time': 'last_join_time',
+            'last_leave_time': 'last_leave_time',
+        },
+    },
+}
+
+EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrow'}
+
+
+class StreamExporter(object):
+    """Stream Exporter Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(StreamExporter, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (StreamExporter): Class instance.
+        """
+        self.db = bot.db
+
+        config = bot.twitch_config
+
+        self.enabled = config.get('export_enabled', True)
+        # File format, either 'parquet' or 'arrow' (IPC).
+        self.format = config.get('export_format', 'parquet')
+        if self.format not in EXTENSIONS:
+            LOG.warning(f'Unknown export format {self.format}, using parquet.')
+            self.format = 'parquet'
+        # Rows read and written per file.
+        self.chunk_size = config.get('export_chunk_size', 10000)
+
+        self.export_dir = os.path.join(
+            os.path.dirname(self.db.db_path),
+            config.get('export_path', 'exports'),
+        )
+
+        self.lock = asyncio.Lock()
+        # Running background exports, kept so they aren't garbage collected.
+        self.tasks = set()
+
+        return self
+
+    async def _get_column_types(self, table: str) -> dict:
+        """Get the declared column types of a table.
+
+        Args:
+            table (str): Table name.
+
+        Returns:
+            (dict): Dictionary of column: 'int', 'float' or 'string'.
+        """
+        columns = await self.db.execute(
+            f'PRAGMA table_info({table});', commit=False
+        )
+
+        types = {}
+        for column in columns or []:
+            declared = (column['type'] or '').upper()
+            if 'INT' in declared:
+                types[column['name']] = 'int'
+            elif any(t in declared for t in ['REAL', 'FLOA', 'DOUB']):
+                types[column['name']] = 'float'
+            else:
+                types[column['name']] = 'string'
+
+        return types
+
+    @staticmethod
+    def _to_columns(rows: list, types: dict, timestamps: dict) -> dict:
+        """Convert rows to typed columns.
+
+        Args:
+            rows (list): Rows from the database.
+            types (dict): Declared column types.
+            timestamps (dict): Output column: source column.
+
+        Returns:
+            columns (dict): Dictionary of column: (type, values).
+        """
+        timestamp_sources = set(timestamps.values())
+
+        columns = {}
+        for column, column_type in types.items():
+            # Replaced by the timestamp columns.
+            if column in timestamp_sources:
+                continue
+
+            cast = {'int': int, 'float': float}.get(column_type, str)
+            values = []
+            for row in rows:
+                try:
+                    values.append(
+                        None if row[column] is None else cast(row[column])
+                    )
+                except (TypeError, ValueError):
+                    values.append(None)
+
+            columns[column] = (column_type, values)
+
+        for column, source in timestamps.items():
+            columns[column] = ('timestamp', [row[source] for row in rows])
+
+        return columns
+
+    @staticmethod
+    def _to_arrow(columns: dict) -> object:
+        """Build an Arrow table from typed columns.
+
+        Args:
+            columns (dict): Dictionary of column: (type, values).
+
+        Returns:
+            (pyarrow.Table): The table.
+        """
+        import pyarrow
+
+        arrow_types = {
+            'int': pyarrow.int64(),
+            'float': pyarrow.float64(),
+            'string': pyarrow.string(),
+            'timestamp': pyarrow.int64(),
+        }
+        return pyarrow.table(
+            {
+                name: pyarrow.array(values, type=arrow_types[column_type])
+                for name, (column_type, values) in columns.items()
+            }
+        )
+
+    def _open_writer(self, path: str, schema: object) -> object:
+        """Open a file writer in the export format.
+
+        Args:
+            path (str): Output path.
+            schema (pyarrow.Schema): Schema of the tables to write.
+
+        Returns:
+            (object): Writer with write_table() and close().
+        """
+        import pyarrow.ipc
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if self.format == 'arrow':
+            return pyarrow.ipc.new_file(path, schema)
+
+        import pyarrow.parquet
+
+        return pyarrow.parquet.ParquetWriter(path, schema)
+
+    def _write(self, path: str, columns: dict) -> None:
+        """Write typed columns to a file.
+
+        Runs in a thread, since encoding and compression are CPU bound.
+
+        Args:
+            path (str): Output path.
+            columns (dict): Dictionary of column: (type, values).
+        """
+        table = self._to_arrow(columns)
+        temp_path = f'{path}.tmp'
+
+        writer = self._open_writer(temp_path, table.schema)
+        writer.write_table(table)
+        writer.close()
+
+        # Only expose complete files to readers.
+        os.replace(temp_path, path)
+
+    async def export_history(self, table: str) -> int:
+        """Append the rows added to a history table since the last export.
+
+        Args:
+            table (str): Table name, one of HISTORY_TABLES.
+
+        Returns:
+            exported (int): Number of rows exported.
+        """
+        settings = HISTORY_TABLES[table]
+        types = await self._get_column_types(table)
+        if not types:
+            return 0
+
+        state = await self.db.execute(
+            'SELECT last_id FROM export_state WHERE table_name = ?;',
+            [table],
+            commit=False,
+        )
+        last_id = state[0][0] if state else 0
+        exported = 0
+
+        # Leave the latest row out while its stream is still live.
+        where, parameters = None, None
+        if settings.get('open'):
+            latest = await self.db.execute(
+                f'SELECT id FROM {table} WHERE id = '
+                f'(SELECT MAX(id) FROM {table}) AND {settings["open"]};',
+                commit=False,
+            )
+            if latest:
+                where, parameters = 'id < ?', [latest[0][0]]
+
+        async for rows in self.db.iter_chunks(
+            table,
+            where=where,
+            parameters=parameters,
+            after=last_id,
+            chunk_size=self.chunk_size,
+        ):
+            # Group the chunk by stream date.
+            partitions = {}
+            for row in rows:
+                date = (
+                    time_utils.local_date(row[settings['date']]) or 'unknown'
+                )
+                partitions.setdefault(date, []).append(row)
+
+            for date, partition_rows in partitions.items():
+                first, last = partition_rows[0]['id'], partition_rows[-1]['id']
+                path = os.path.join(
+                    self.export_dir,
+                    table,
+                    f'date={date}',
+                    f'part-{first:010d}-{last:010d}.'
+                    f'{EXTENSIONS[self.format]}',
+                )
+                columns = self._to_columns(
+                    partition_rows, types, settings['timestamps']
+                )
+                await asyncio.to_thread(self._write, path, columns)
+
+            # Files are named by id range, so if the bot stops before this is
+            # saved the next export rewrites the same files.
+            last_id = rows[-1]['id']
+            await self.db.execute(
+                'INSERT INTO export_state (table_name, last_id, exported_at) '
+                'VALUES (?, ?, ?) ON CONFLICT (table_name) DO UPDATE SET '
+                'last_id = excluded.last_id, '
+                'exported_at = excluded.exported_at;',
+                [table, last_id, time_utils.now_ms()],
+            )
+            exported += len(rows)
+
+        return exported
+
+    async def export_snapshot(self, table: str) -> int:
+        """Write a full snapshot of a table.
+
+        Args:
+            table (str): Table name, one of SNAPSHOT_TABLES.
+
+        Returns:
+            exported (int): Number of rows exported.
+        """
+        settings = SNAPSHOT_TABLES[table]
+        types = await self._get_column_types(table)
+        if not types:
+            return 0
+
+        path = os.path.join(
+            self.export_dir, table, f'{table}.{EXTENSIONS[self.format]}'
+        )
+        temp_path = f'{path}.tmp'
+
+        # Written chunk by chunk, so only one chunk is ever in memory.
+        writer = None
+        exported = 0
+        try:
+            async for rows in self.db.iter_chunks(
+                table, chunk_size=self.chunk_size
+            ):
+                arrow_table = self._to_arrow(
+                    self._to_columns(rows, types, settings['timestamps'])
+                )
+                if writer is None:
+                    writer = await asyncio.to_thread(
+                        self._open_writer, temp_path, arrow_table.schema
+                    )
+
+                await asyncio.to_thread(writer.write_table, arrow_table)
+                exported += len(rows)
+
+        finally:
+            if writer is not None:
+                await asyncio.to_thread(writer.close)
+
+        if not exported:
+            return 0
+
+        # Only expose complete files to readers.
+        os.replace(temp_path, path)
+
+        return exported
+
+    async def export(self) -> None:
+        """Export all the stream history tables."""
+        if not self.enabled:
+            return
+
+        try:
+            import pyarrow  # noqa
+        except Exception:
+            LOG.warning('pyarrow is not installed, skipping the export.')
+            return
+
+        # Exports can be triggered while one is still running.
+        async with self.lock:
+            try:
+                exported = {}
+                for table in HISTORY_TABLES:
+                    exported[table] = await self.export_history(table)
+                for table in SNAPSHOT_TABLES:
+                    exported[table] = await self.export_snapshot(table)
+
+            except Exception as e:
+                LOG.error(
+                    'Unable to export the stream history: {}'.format(
+                        getattr(e, 'message', repr(e))
+                    )
+                )
+                return
+
+        LOG.info(f'Exported stream history: {exported}')
+
+    def start_export(self) -> asyncio.Task:
+        """Run an export in the background.
+
+        Returns:
+            (asyncio.Task): Export task.
+        """
+        task = asyncio.create_task(self.export())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+        return task
+
+
+async def run_export() -> None:
+    """Run an export outside of the bot."""
+    db = await database_utils.Database().init()
+
+    exporter = await StreamExporter().init(
+        SimpleNamespace(db=db, twitch_config=db.twitch_config)
+    )
+    await exporter.export()
+    await db.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(run_export())
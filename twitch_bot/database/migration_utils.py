@@ -0,0 +1,350 @@
+"""Migration Utils.
+
+Versioned schema migrations for the bot database.
+
+Migrations are ordered SQL files named '<version>_<description>.sql':
+-   Core migrations live in 'database/migrations'.
+-   Plugin migrations live in 'plugins/_migrations/<PluginClass>'.
+
+The applied version of each component is stored in the schema_version table.
+Each migration runs in a single transaction together with its version bump,
+so a failed migration leaves the schema at the previous version. When every
+component is current, startup does not run any DDL at all.
+
+Migrations can be previewed with a dry run, which applies every pending
+migration in one transaction that is rolled back at the end, so migrations
+can build on the ones before them:
+    python -m database.migration_utils --dry-run
+"""
+
+import aiofiles
+import argparse
+import asyncio
+import os
+import re
+import sqlite3
+
+from typing import Optional
+
+import time_utils
+
+from exceptions.exceptions import BotDBError
+from log import LOG
+
+CORE_COMPONENT = 'core'
+
+CORE_MIGRATIONS_PATH = os.path.join(os.path.dirname(__file__), 'migrations')
+PLUGIN_MIGRATIONS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'plugins', '_migrations'
+)
+
+MIGRATION_RE = re.compile(r'^(?P<version>\d+)_(?P<name>\w+)\.sql$')
+
+CREATE_SCHEMA_VERSION = (
+    'CREATE TABLE IF NOT EXISTS schema_version ('
+    'component TEXT NOT NULL PRIMARY KEY, '
+    'version INTEGER NOT NULL DEFAULT 0, '
+    'applied_at INTEGER NOT NULL DEFAULT 0);'
+)
+
+
+async def find_migrations(path: str) -> list:
+    """Find the migration files in a folder.
+
+    Args:
+        path (str): Folder containing the migration files.
+
+    Returns:
+        (list): Sorted list of (version, name, path) tuples.
+    """
+    if not os.path.isdir(path):
+        return []
+
+    migrations = []
+    for file_name in os.listdir(path):
+        match = re.match(MIGRATION_RE, file_name)
+        if not match:
+            continue
+
+        migrations.append(
+            (
+                int(match.group('version')),
+                match.group('name'),
+                os.path.join(path, file_name),
+            )
+        )
+
+    return sorted(migrations)
+
+
+async def split_statements(script: str) -> list:
+    """Split a SQL script into individual statements.
+
+    Args:
+        script (str): SQL script.
+
+    Returns:
+        statements (list): List of complete SQL statements.
+    """
+    statements = []
+    statement = ''
+
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            statements.append(statement.strip())
+            statement = ''
+
+    if statement.strip():
+        statements.append(statement.strip())
+
+    return statements
+
+
+class Migrator(object):
+    """Schema migration runner."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(Migrator, self).__init__()
+
+    async def init(self, db: object, dry_run: bool = False) -> object:
+        """Async init.
+
+        Args:
+            db (Database): Database instance.
+            dry_run (bool): Roll back migrations instead of committing them.
+
+        Returns:
+            self (Migrator): Class instance.
+        """
+        self.db = db
+        self.dry_run = dry_run
+        self.versions = await self.get_versions()
+
+        return self
+
+    async def get_versions(self) -> dict:
+        """Get the applied schema versions.
+
+        Returns:
+            (dict): Dictionary of component: version.
+        """
+        connection = self.db.connection
+        async with connection.execute(
+            'SELECT name FROM sqlite_master '
+            'WHERE type = "table" AND name = "schema_version";'
+        ) as cursor:
+            exists = await cursor.fetchone()
+
+        if not exists:
+            return {}
+
+        async with connection.execute(
+            'SELECT component, version FROM schema_version;'
+        ) as cursor:
+            return {row[0]: row[1] for row in await cursor.fetchall()}
+
+    async def pending(self, component: str, path: str) -> list:
+        """Get the migrations that have not been applied to a component.
+
+        Args:
+            component (str): Component name.
+            path (str): Folder containing the migration files.
+
+        Returns:
+            (list): Sorted list of (version, name, path) tuples.
+        """
+        current = self.versions.get(component, 0)
+        return [m for m in await find_migrations(path) if m[0] > current]
+
+    async def apply(
+        self, component: str, version: int, name: str, path: str
+    ) -> None:
+        """Apply a single migration in its own transaction.
+
+        In a dry run, the migrations share one transaction that finish()
+        rolls back.
+
+        Args:
+            component (str): Component name.
+            version (int): Migration version.
+            name (str): Migration description.
+            path (str): Path to the migration file.
+
+        Raises:
+            BotDBError: If the migration fails.
+        """
+        async with aiofiles.open(path, 'r') as in_file:
+            statements = await split_statements(await in_file.read())
+
+        # Plugin migrations can run on a reload, with the other tasks using
+        # the connection.
+        async with self.db.hold():
+            await self._apply(component, version, name, statements)
+
+    async def _apply(
+        self, component: str, version: int, name: str, statements: list
+    ) -> None:
+        """Apply the statements of a migration.
+
+        Args:
+            component (str): Component name.
+            version (int): Migration version.
+            name (str): Migration description.
+            statements (list): SQL statements.
+
+        Raises:
+            BotDBError: If the migration fails.
+        """
+        connection = self.db.connection
+        if connection.in_transaction and not self.dry_run:
+            await connection.commit()
+
+        prefix = '[dry run] ' if self.dry_run else ''
+        LOG.info(f'{prefix}Migrating {component} to {version}: {name}')
+
+        try:
+            if not connection.in_transaction:
+                await connection.execute('BEGIN;')
+            await connection.execute(CREATE_SCHEMA_VERSION)
+
+            for statement in statements:
+                LOG.debug(f'{prefix}{statement}')
+                await connection.execute(statement)
+
+            await connection.execute(
+                'INSERT INTO schema_version (component, version, applied_at) '
+                'VALUES (?, ?, ?) ON CONFLICT (component) DO UPDATE SET '
+                'version = excluded.version, '
+                'applied_at = excluded.applied_at;',
+                [component, version, time_utils.now_ms()],
+            )
+
+        except Exception as e:
+            await connection.rollback()
+            raise BotDBError(
+                f'Migration {component} {version} ({name}) failed: '
+                f'{getattr(e, "message", repr(e))}'
+            )
+
+        if self.dry_run:
+            return
+
+        await connection.commit()
+        self.versions[component] = version
+
+    async def finish(self) -> None:
+        """Roll back the migrations applied by a dry run."""
+        if self.dry_run and self.db.connection.in_transaction:
+            await self.db.connection.rollback()
+
+    async def migrate(self, component: str, path: str) -> int:
+        """Apply all the pending migrations of a component.
+
+        Args:
+            component (str): Component name.
+            path (str): Folder containing the migration files.
+
+        Returns:
+            (int): Number of migrations applied.
+        """
+        migrations = await self.pending(component, path)
+
+        for version, name, migration_path in migrations:
+            await self.apply(component, version, name, migration_path)
+
+        return len(migrations)
+
+    async def migrate_core(self) -> int:
+        """Apply all the pending core migrations.
+
+        Returns:
+            (int): Number of migrations applied.
+        """
+        return await self.migrate(CORE_COMPONENT, CORE_MIGRATIONS_PATH)
+
+    async def migrate_plugins(self, plugins: dict) -> int:
+        """Apply all the pending plugin migrations.
+
+        Args:
+            plugins (dict): Loaded plugins by category.
+
+        Returns:
+            applied (int): Number of migrations applied.
+        """
+        plugin_names = {
+            plugin.__name__
+            for category in plugins.values()
+            for plugin in category.values()
+        }
+
+        applied = 0
+        for plugin_name in sorted(plugin_names):
+            applied += await self.migrate(
+                plugin_name, os.path.join(PLUGIN_MIGRATIONS_PATH, plugin_name)
+            )
+
+        return applied
+
+
+async def run_migrations(
+    dry_run: Optional[bool] = False, plugins: Optional[bool] = True
+) -> None:
+    """Run the migrations outside of the bot.
+
+    Args:
+        dry_run (bool, optional): Roll back instead of committing.
+        plugins (bool, optional): Include the plugin migrations.
+    """
+    # Imported here to avoid a circular import with the database module.
+    import plugin_loader
+
+    from database import database_utils
+
+    db = await database_utils.Database().init(migrate=False)
+    migrator = await Migrator().init(db, dry_run=dry_run)
+
+    try:
+        applied = await migrator.migrate_core()
+        if plugins:
+            applied += await migrator.migrate_plugins(
+                await plugin_loader.load_plugins()
+            )
+
+        LOG.info(
+            f'{applied} migrations {"checked" if dry_run else "applied"}.'
+        )
+
+    except BotDBError as e:
+        LOG.error(
+            'Unable to run the migrations: {}'.format(
+                getattr(e, 'message', repr(e))
+            )
+        )
+
+    finally:
+        await migrator.finish()
+        await db.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--dry-run',
+        help='Apply the migrations in a transaction and roll it back.',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--noplugins',
+        help='Only run the core migrations.',
+        action='store_true',
+    )
+    args = vars(parser.parse_args())
+
+    asyncio.run(
+        run_migrations(
+            dry_run=args.get('dry_run', False),
+            plugins=not args.get('noplugins', False),
+        )
+    )
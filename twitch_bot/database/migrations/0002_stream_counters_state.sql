@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS stream_counters_state (
+id INTEGER NOT NULL PRIMARY KEY CHECK (id = 1),
+last_seq INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO stream_counters_state (id, last_seq) VALUES (1, 0);
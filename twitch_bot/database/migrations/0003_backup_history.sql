@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS backup_history (
+id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+path TEXT NOT NULL,
+method TEXT NOT NULL,
+duration REAL NOT NULL DEFAULT 0,
+size INTEGER NOT NULL DEFAULT 0,
+compressed_size INTEGER NOT NULL DEFAULT 0,
+created TEXT NOT NULL DEFAULT "1970-01-01 00:00:00"
+);
@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS export_state (
+table_name TEXT NOT NULL PRIMARY KEY,
+last_id INTEGER NOT NULL DEFAULT 0,
+exported_at TEXT NOT NULL DEFAULT "1970-01-01 00:00:00"
+);
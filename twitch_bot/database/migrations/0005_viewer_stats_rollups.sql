@@ -0,0 +1,60 @@
+CREATE INDEX IF NOT EXISTS viewer_stats_time_index ON viewer_stats(date, time);
+CREATE TABLE IF NOT EXISTS viewer_stats_hourly (
+bucket TEXT NOT NULL PRIMARY KEY,
+samples INTEGER NOT NULL DEFAULT 0,
+min_count INTEGER NOT NULL DEFAULT 0,
+max_count INTEGER NOT NULL DEFAULT 0,
+sum_count INTEGER NOT NULL DEFAULT 0,
+last_count INTEGER NOT NULL DEFAULT 0,
+last_time TEXT NOT NULL DEFAULT "1970-01-01 00:00:00"
+);
+CREATE TABLE IF NOT EXISTS viewer_stats_daily (
+bucket TEXT NOT NULL PRIMARY KEY,
+samples INTEGER NOT NULL DEFAULT 0,
+min_count INTEGER NOT NULL DEFAULT 0,
+max_count INTEGER NOT NULL DEFAULT 0,
+sum_count INTEGER NOT NULL DEFAULT 0,
+last_count INTEGER NOT NULL DEFAULT 0,
+last_time TEXT NOT NULL DEFAULT "1970-01-01 00:00:00"
+);
+WITH samples AS (
+    SELECT
+        substr(date || ' ' || time, 1, 13) || ':00:00' AS bucket,
+        date || ' ' || time AS sample_time,
+        viewer_count,
+        ROW_NUMBER() OVER (
+            PARTITION BY substr(date || ' ' || time, 1, 13)
+            ORDER BY date || ' ' || time DESC
+        ) AS recency
+    FROM viewer_stats
+)
+INSERT OR REPLACE INTO viewer_stats_hourly
+SELECT
+    bucket,
+    COUNT(*),
+    MIN(viewer_count),
+    MAX(viewer_count),
+    SUM(viewer_count),
+    MAX(CASE WHEN recency = 1 THEN viewer_count END),
+    MAX(sample_time)
+FROM samples GROUP BY bucket;
+WITH samples AS (
+    SELECT
+        date AS bucket,
+        date || ' ' || time AS sample_time,
+        viewer_count,
+        ROW_NUMBER() OVER (
+            PARTITION BY date ORDER BY time DESC
+        ) AS recency
+    FROM viewer_stats
+)
+INSERT OR REPLACE INTO viewer_stats_daily
+SELECT
+    bucket,
+    COUNT(*),
+    MIN(viewer_count),
+    MAX(viewer_count),
+    SUM(viewer_count),
+    MAX(CASE WHEN recency = 1 THEN viewer_count END),
+    MAX(sample_time)
+FROM samples GROUP BY bucket;
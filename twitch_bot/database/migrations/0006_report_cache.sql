@@ -0,0 +1,8 @@
+CREATE TABLE IF NOT EXISTS report_cache (
+stream_id INTEGER NOT NULL,
+report TEXT NOT NULL,
+fingerprint TEXT NOT NULL,
+artifacts TEXT,
+generated_at TEXT NOT NULL DEFAULT "1970-01-01 00:00:00",
+PRIMARY KEY (stream_id, report)
+);
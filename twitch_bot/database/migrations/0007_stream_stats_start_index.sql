@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS stream_stats_start_index ON stream_stats(stream_start);
@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS plugin_state (
+plugin TEXT NOT NULL,
+key TEXT NOT NULL,
+value TEXT,
+updated_at TEXT NOT NULL DEFAULT "1970-01-01 00:00:00",
+PRIMARY KEY (plugin, key)
+) WITHOUT ROWID;
@@ -0,0 +1,145 @@
+-- Timestamps become INTEGER milliseconds since the epoch. The text values
+-- are converted once by to_epoch_ms(), which the bot registers on its
+-- connection and which reads them as local times in the configured timezone.
+CREATE TABLE users_new (
+id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+username TEXT NOT NULL,
+user_id INTEGER NOT NULL,
+is_mod INTEGER DEFAULT 0,
+is_regular INTEGER DEFAULT 0,
+is_banned INTEGER DEFAULT 0,
+ban_until INTEGER NOT NULL DEFAULT 0,
+time_watched INTEGER DEFAULT 0,
+messages_sent_session INTEGER DEFAULT 0,
+messages_sent_total INTEGER DEFAULT 0,
+first_join_time INTEGER NOT NULL DEFAULT 0,
+last_join_time INTEGER NOT NULL DEFAULT 0,
+last_leave_time INTEGER NOT NULL DEFAULT 0,
+announce INTEGER DEFAULT 0,
+points INTEGER DEFAULT 0,
+loyalty_points INTEGER NOT NULL DEFAULT 0
+);
+INSERT INTO users_new
+SELECT
+    id,
+    username,
+    user_id,
+    is_mod,
+    is_regular,
+    is_banned,
+    COALESCE(to_epoch_ms(NULLIF(ban_until, '1970-01-01 00:00:00')), 0),
+    time_watched,
+    messages_sent_session,
+    messages_sent_total,
+    COALESCE(to_epoch_ms(NULLIF(first_join_time, '1970-01-01 00:00:00')), 0),
+    COALESCE(to_epoch_ms(NULLIF(last_join_time, '1970-01-01 00:00:00')), 0),
+    COALESCE(to_epoch_ms(NULLIF(last_leave_time, '1970-01-01 00:00:00')), 0),
+    announce,
+    points,
+    loyalty_points
+FROM users;
+DROP TABLE users;
+ALTER TABLE users_new RENAME TO users;
+CREATE UNIQUE INDEX IF NOT EXISTS users_index ON users(username, user_id);
+CREATE TABLE viewer_stats_new (
+id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+sample_time INTEGER NOT NULL,
+viewer_count INTEGER NOT NULL
+);
+INSERT INTO viewer_stats_new (id, sample_time, viewer_count)
+SELECT id, to_epoch_ms(date || ' ' || time), viewer_count FROM viewer_stats
+WHERE to_epoch_ms(date || ' ' || time) IS NOT NULL;
+DROP TABLE viewer_stats;
+ALTER TABLE viewer_stats_new RENAME TO viewer_stats;
+CREATE INDEX IF NOT EXISTS viewer_stats_time_index ON viewer_stats(sample_time);
+CREATE TABLE viewer_stats_hourly_new (
+bucket INTEGER NOT NULL PRIMARY KEY,
+samples INTEGER NOT NULL DEFAULT 0,
+min_count INTEGER NOT NULL DEFAULT 0,
+max_count INTEGER NOT NULL DEFAULT 0,
+sum_count INTEGER NOT NULL DEFAULT 0,
+last_count INTEGER NOT NULL DEFAULT 0,
+last_time INTEGER NOT NULL DEFAULT 0
+);
+INSERT INTO viewer_stats_hourly_new
+SELECT
+    to_epoch_ms(bucket),
+    samples,
+    min_count,
+    max_count,
+    sum_count,
+    last_count,
+    COALESCE(to_epoch_ms(last_time), 0)
+FROM viewer_stats_hourly
+WHERE to_epoch_ms(bucket) IS NOT NULL;
+DROP TABLE viewer_stats_hourly;
+ALTER TABLE viewer_stats_hourly_new RENAME TO viewer_stats_hourly;
+CREATE TABLE viewer_stats_daily_new (
+bucket INTEGER NOT NULL PRIMARY KEY,
+samples INTEGER NOT NULL DEFAULT 0,
+min_count INTEGER NOT NULL DEFAULT 0,
+max_count INTEGER NOT NULL DEFAULT 0,
+sum_count INTEGER NOT NULL DEFAULT 0,
+last_count INTEGER NOT NULL DEFAULT 0,
+last_time INTEGER NOT NULL DEFAULT 0
+);
+INSERT INTO viewer_stats_daily_new
+SELECT
+    to_epoch_ms(bucket),
+    samples,
+    min_count,
+    max_count,
+    sum_count,
+    last_count,
+    COALESCE(to_epoch_ms(last_time), 0)
+FROM viewer_stats_daily
+WHERE to_epoch_ms(bucket) IS NOT NULL;
+DROP TABLE viewer_stats_daily;
+ALTER TABLE viewer_stats_daily_new RENAME TO viewer_stats_daily;
+CREATE TABLE stream_stats_new (
+id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+bits INTEGER NOT NULL DEFAULT 0,
+chatters INTEGER NOT NULL DEFAULT 0,
+followers INTEGER NOT NULL DEFAULT 0,
+messages INTEGER NOT NULL DEFAULT 0,
+raids INTEGER NOT NULL DEFAULT 0,
+rewards INTEGER NOT NULL DEFAULT 0,
+stream_end INTEGER NOT NULL,
+stream_start INTEGER NOT NULL,
+subscribers INTEGER NOT NULL DEFAULT 0
+);
+INSERT INTO stream_stats_new
+SELECT
+    id,
+    bits,
+    chatters,
+    followers,
+    messages,
+    raids,
+    rewards,
+    COALESCE(to_epoch_ms(stream_end), 0),
+    COALESCE(to_epoch_ms(stream_start), 0),
+    subscribers
+FROM stream_stats;
+DROP TABLE stream_stats;
+ALTER TABLE stream_stats_new RENAME TO stream_stats;
+CREATE INDEX IF NOT EXISTS stream_stats_start_index ON stream_stats(stream_start);
+CREATE TABLE stream_events_new (
+id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+stream_end INTEGER NOT NULL,
+stream_start INTEGER NOT NULL,
+usernames TEXT
+);
+INSERT INTO stream_events_new
+SELECT
+    id,
+    COALESCE(to_epoch_ms(stream_end), 0),
+    COALESCE(to_epoch_ms(stream_start), 0),
+    usernames
+FROM stream_events;
+DROP TABLE stream_events;
+ALTER TABLE stream_events_new RENAME TO stream_events;
+UPDATE plugin_state
+SET value = COALESCE(to_epoch_ms(json_extract(value, '$')), 0)
+WHERE key = 'last_run' AND json_valid(value)
+AND json_type(value) = 'text';
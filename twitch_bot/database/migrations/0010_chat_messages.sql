@@ -0,0 +1,10 @@
+-- Archive of chat messages, filled by the bulk import.
+CREATE TABLE IF NOT EXISTS chat_messages (
+id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+sent_at INTEGER NOT NULL,
+username TEXT NOT NULL,
+user_id INTEGER NOT NULL DEFAULT 0,
+message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chat_messages_time_index ON chat_messages(sent_at);
+CREATE INDEX IF NOT EXISTS chat_messages_user_index ON chat_messages(username, sent_at);
@@ -0,0 +1,7 @@
+-- Fingerprints of the plugin schemas set up at startup, so plugins whose
+-- metadata didn't change are skipped.
+CREATE TABLE IF NOT EXISTS plugin_schema (
+plugin TEXT NOT NULL PRIMARY KEY,
+fingerprint TEXT NOT NULL,
+updated_at INTEGER NOT NULL DEFAULT 0
+);
@@ -0,0 +1,84 @@
+-- The bookkeeping timestamps become INTEGER milliseconds since the epoch,
+-- like the data timestamps in 0009. The tables are rebuilt since their TEXT
+-- columns would store the numbers as text.
+CREATE TABLE schema_version_new (
+component TEXT NOT NULL PRIMARY KEY,
+version INTEGER NOT NULL DEFAULT 0,
+applied_at INTEGER NOT NULL DEFAULT 0
+);
+INSERT INTO schema_version_new
+SELECT
+    component,
+    version,
+    COALESCE(to_epoch_ms(NULLIF(applied_at, '1970-01-01 00:00:00')), 0)
+FROM schema_version;
+DROP TABLE schema_version;
+ALTER TABLE schema_version_new RENAME TO schema_version;
+CREATE TABLE backup_history_new (
+id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+path TEXT NOT NULL,
+method TEXT NOT NULL,
+duration REAL NOT NULL DEFAULT 0,
+size INTEGER NOT NULL DEFAULT 0,
+compressed_size INTEGER NOT NULL DEFAULT 0,
+created INTEGER NOT NULL DEFAULT 0
+);
+INSERT INTO backup_history_new
+SELECT
+    id,
+    path,
+    method,
+    duration,
+    size,
+    compressed_size,
+    COALESCE(to_epoch_ms(NULLIF(created, '1970-01-01 00:00:00')), 0)
+FROM backup_history;
+DROP TABLE backup_history;
+ALTER TABLE backup_history_new RENAME TO backup_history;
+CREATE TABLE export_state_new (
+table_name TEXT NOT NULL PRIMARY KEY,
+last_id INTEGER NOT NULL DEFAULT 0,
+exported_at INTEGER NOT NULL DEFAULT 0
+);
+INSERT INTO export_state_new
+SELECT
+    table_name,
+    last_id,
+    COALESCE(to_epoch_ms(NULLIF(exported_at, '1970-01-01 00:00:00')), 0)
+FROM export_state;
+DROP TABLE export_state;
+ALTER TABLE export_state_new RENAME TO export_state;
+CREATE TABLE report_cache_new (
+stream_id INTEGER NOT NULL,
+report TEXT NOT NULL,
+fingerprint TEXT NOT NULL,
+artifacts TEXT,
+generated_at INTEGER NOT NULL DEFAULT 0,
+PRIMARY KEY (stream_id, report)
+);
+INSERT INTO report_cache_new
+SELECT
+    stream_id,
+    report,
+    fingerprint,
+    artifacts,
+    COALESCE(to_epoch_ms(NULLIF(generated_at, '1970-01-01 00:00:00')), 0)
+FROM report_cache;
+DROP TABLE report_cache;
+ALTER TABLE report_cache_new RENAME TO report_cache;
+CREATE TABLE plugin_state_new (
+plugin TEXT NOT NULL,
+key TEXT NOT NULL,
+value TEXT,
+updated_at INTEGER NOT NULL DEFAULT 0,
+PRIMARY KEY (plugin, key)
+) WITHOUT ROWID;
+INSERT INTO plugin_state_new
+SELECT
+    plugin,
+    key,
+    value,
+    COALESCE(to_epoch_ms(NULLIF(updated_at, '1970-01-01 00:00:00')), 0)
+FROM plugin_state;
+DROP TABLE plugin_state;
+ALTER TABLE plugin_state_new RENAME TO plugin_state;
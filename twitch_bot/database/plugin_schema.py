@@ -0,0 +1,276 @@
+"""Plugin Schema.
+
+Sets up the plugins at startup: creates the tables of the plugins with
+FIELDS, imports the state of older plugin tables and applies the RESET
+values.
+
+The schema of each plugin is fingerprinted from its metadata (table name
+and FIELDS) and the fingerprints are kept in the plugin_schema table. Only
+new plugins, plugins whose fingerprint changed and plugins whose table is
+missing run any DDL. Columns added to the FIELDS of an existing table are
+added with ALTER TABLE, other changes need a plugin migration.
+
+The DDL runs in a single transaction and the startup fails if it can't be
+applied, since the plugins and their migrations need the tables. The resets
+run in a second transaction, where a failed insert is logged and skipped.
+"""
+
+import hashlib
+import json
+
+from typing import Optional
+
+import time_utils
+
+from exceptions.exceptions import BotDBError
+from log import LOG
+
+# Bump to set up every plugin again, e.g. when the default columns change.
+SCHEMA_VERSION = 1
+
+UPSERT_SCHEMA = (
+    'INSERT INTO plugin_schema (plugin, fingerprint, updated_at) '
+    'VALUES (?, ?, ?) ON CONFLICT (plugin) DO UPDATE SET '
+    'fingerprint = excluded.fingerprint, updated_at = excluded.updated_at;'
+)
+
+
+def schema_fingerprint(table: Optional[str], fields: dict) -> str:
+    """Fingerprint the schema of a plugin.
+
+    Args:
+        table (str|None): Table of the plugin, None if it only has state.
+        fields (dict): Dictionary of fields: data types.
+
+    Returns:
+        (str): Fingerprint.
+    """
+    return hashlib.sha1(
+        json.dumps(
+            [SCHEMA_VERSION, table, fields], sort_keys=True, default=str
+        ).encode()
+    ).hexdigest()
+
+
+class PluginSchema(object):
+    """Plugin Schema Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(PluginSchema, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (PluginSchema): Class instance.
+        """
+        self.db = bot.db
+        self.plugin_state = bot.plugin_state
+
+        # Written as the last user of the reset rows.
+        self.bot_user_id = bot.BOT_USER_ID
+
+        return self
+
+    @staticmethod
+    def get_schemas(plugins: dict) -> dict:
+        """Get the schema of every plugin from its metadata.
+
+        Args:
+            plugins (dict): Plugins by category and command.
+
+        Returns:
+            (dict): Schemas by plugin name in the form:
+                {
+                    'plugin': plugin class,
+                    'table': str|None,
+                    'fields': dict,
+                    'fingerprint': str,
+                }
+        """
+        schemas = {}
+        for category in plugins:
+            for plugin in plugins[category].values():
+                # Plugins can be in more than one category.
+                name = plugin.__name__
+                if name in schemas:
+                    continue
+
+                # Plugins without fields keep everything in their state.
+                table = None
+                fields = {}
+                if hasattr(plugin, 'FIELDS'):
+                    table = getattr(plugin, 'TABLE', name)
+                    fields = plugin.FIELDS or {}
+
+                schemas[name] = {
+                    'plugin': plugin,
+                    'table': table,
+                    'fields': fields,
+                    'fingerprint': schema_fingerprint(table, fields),
+                }
+
+        return schemas
+
+    async def _get_changed(self, schemas: dict) -> list:
+        """Find the plugins that need to be set up.
+
+        Args:
+            schemas (dict): Schemas by plugin name.
+
+        Returns:
+            (list): Names of the new and changed plugins, or the plugins
+                whose table is missing.
+        """
+        rows = await self.db.execute(
+            'SELECT plugin, fingerprint FROM plugin_schema;', commit=False
+        )
+        fingerprints = {r['plugin']: r['fingerprint'] for r in rows or []}
+
+        rows = await self.db.execute(
+            'SELECT name FROM sqlite_master WHERE type = "table";',
+            commit=False,
+        )
+        tables = {row['name'] for row in rows or []}
+
+        return [
+            name
+            for name, schema in schemas.items()
+            if fingerprints.get(name) != schema['fingerprint']
+            or (schema['table'] and schema['table'] not in tables)
+        ]
+
+    async def _get_columns(self, table: str) -> set:
+        """Get the columns of a table.
+
+        Args:
+            table (str): Table name.
+
+        Returns:
+            (set): Column names, empty if the table doesn't exist.
+        """
+        rows = await self.db.execute(
+            f'PRAGMA table_info({table});', commit=False
+        )
+
+        return {row['name'] for row in rows or []}
+
+    async def _run(self, statements: list, fail: bool) -> int:
+        """Run statements in one transaction.
+
+        Args:
+            statements (list): List of (statement, parameters).
+            fail (bool): Roll back and raise on the first failed statement,
+                otherwise log it and carry on.
+
+        Returns:
+            (int): Number of failed statements.
+        """
+        failed = 0
+        async with self.db.transaction():
+            for cmd, parameters in statements:
+                result = await self.db.execute(cmd, parameters, commit=False)
+                if result is not None:
+                    continue
+
+                if fail:
+                    raise BotDBError(
+                        f'Unable to set up the plugins, failed on: {cmd}'
+                    )
+
+                LOG.error(f'Unable to reset a plugin, failed on: {cmd}')
+                failed += 1
+
+        return failed
+
+    async def bootstrap(
+        self, plugins: dict, reset: Optional[bool] = True
+    ) -> bool:
+        """Set up the plugins.
+
+        Args:
+            plugins (dict): Plugins by category and command.
+            reset (bool, optional): Apply the RESET values of the plugins.
+                Default is True, reloads skip it.
+
+        Returns:
+            (bool): True if the plugins were set up, False if some of the
+                resets failed.
+
+        Raises:
+            BotDBError: If the tables can't be set up.
+        """
+        schemas = self.get_schemas(plugins)
+        changed = await self._get_changed(schemas)
+
+        statements = []
+        now = time_utils.now_ms()
+        for name in changed:
+            table, fields = schemas[name]['table'], schemas[name]['fields']
+            if table:
+                create = self.db.create_table_statement(table, fields)
+                statements.append((create, []))
+
+                # CREATE TABLE leaves existing tables alone, add the new
+                # columns to them.
+                columns = await self._get_columns(table)
+                if columns:
+                    statements += [
+                        (f'ALTER TABLE {table} ADD COLUMN {key} {types};', [])
+                        for key, types in fields.items()
+                        if key not in columns
+                    ]
+
+                convert = self.db.convert_timestamps_statement(
+                    table, 'last_run'
+                )
+                statements.append((convert, []))
+            else:
+                # Pick up the state from the table older versions used.
+                await self.plugin_state.import_legacy(name)
+
+            statements.append(
+                (UPSERT_SCHEMA, [name, schemas[name]['fingerprint'], now])
+            )
+
+        resets = []
+        for name, schema in schemas.items():
+            if not reset or not hasattr(schema['plugin'], 'RESET'):
+                continue
+
+            reset_fields = dict(
+                schema['plugin'].RESET, last_user_id=self.bot_user_id
+            )
+            if schema['table']:
+                columns = ', '.join(reset_fields)
+                values = ', '.join(['?'] * len(reset_fields))
+                resets.append(
+                    (
+                        f'INSERT INTO {schema["table"]} ({columns}) '
+                        f'VALUES ({values});',
+                        list(reset_fields.values()),
+                    )
+                )
+            else:
+                # Reset the given keys in the plugin state.
+                await self.plugin_state.update(name, reset_fields)
+
+        # Imported state is written first, since the fingerprints mark the
+        # plugins as done.
+        await self.plugin_state.flush()
+
+        if statements:
+            await self._run(statements, fail=True)
+            LOG.debug(
+                f'Set up {len(changed)} of {len(schemas)} plugins with '
+                f'{len(statements)} statements.'
+            )
+
+        if not resets:
+            return True
+
+        return not await self._run(resets, fail=False)
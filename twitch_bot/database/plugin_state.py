@@ -0,0 +1,401 @@
+"""Plugin State.
+
+Key/value store for plugin state, kept in a single plugin_state table
+instead of one table per plugin.
+
+The state of a plugin is loaded into memory with one indexed query the first
+time it is used and served from memory after that. Changes are applied in
+memory immediately and written to the database in batches by a background
+task, so running a plugin never waits on the database.
+
+Values are stored as JSON, so anything JSON serializable can be kept. Every
+plugin run records 'last_user_id' and 'last_run' in its state, which is what
+the timeouts and interval timers check.
+
+Plugins with FIELDS still get their table, since those usually hold actual
+data (e.g. quotes). The state of older plugin tables is imported from their
+last row the first time the plugin starts without a table.
+"""
+
+import asyncio
+import json
+
+from typing import Any, Optional
+
+import time_utils
+
+from exceptions.exceptions import BotDBError
+from log import LOG
+
+UPSERT_STATE = (
+    'INSERT INTO plugin_state (plugin, key, value, updated_at) '
+    'VALUES (?, ?, ?, ?) ON CONFLICT (plugin, key) DO UPDATE SET '
+    'value = excluded.value, updated_at = excluded.updated_at;'
+)
+
+
+class PluginState(object):
+    """State of a single plugin, available to plugins as self.state."""
+
+    def __init__(self, store: object, plugin: str) -> None:
+        """Init.
+
+        Args:
+            store (PluginStateStore): Store holding the state.
+            plugin (str): Plugin (class) name.
+        """
+        super(PluginState, self).__init__()
+
+        self.store = store
+        self.plugin = plugin
+
+    async def get(self, key: str, default: Optional[Any] = None) -> Any:
+        """Get a value.
+
+        Args:
+            key (str): State key.
+            default (any, optional): Value returned if the key is not set.
+
+        Returns:
+            (any): The value.
+        """
+        return await self.store.get(self.plugin, key, default)
+
+    async def set(self, key: str, value: Any) -> None:
+        """Set a value.
+
+        Args:
+            key (str): State key.
+            value (any): JSON serializable value.
+        """
+        await self.store.set(self.plugin, key, value)
+
+    async def incr(self, key: str, amount: Optional[int] = 1) -> int:
+        """Increment a value.
+
+        Args:
+            key (str): State key.
+            amount (int, optional): Amount to add. Default is 1.
+
+        Returns:
+            (int): The new value.
+        """
+        return await self.store.incr(self.plugin, key, amount)
+
+    async def update(self, values: dict) -> None:
+        """Set several values.
+
+        Args:
+            values (dict): Dictionary of key: value.
+        """
+        await self.store.update(self.plugin, values)
+
+    async def delete(self, key: str) -> None:
+        """Delete a value.
+
+        Args:
+            key (str): State key.
+        """
+        await self.store.delete(self.plugin, key)
+
+    async def items(self) -> dict:
+        """Get all the values.
+
+        Returns:
+            (dict): Copy of the state as key: value.
+        """
+        return await self.store.items(self.plugin)
+
+
+class PluginStateStore(object):
+    """Plugin State Store Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(PluginStateStore, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (PluginStateStore): Class instance.
+        """
+        self.db = bot.db
+
+        # Maximum time in seconds before changes are written.
+        self.flush_interval = bot.twitch_config.get(
+            'plugin_state_flush_interval', 5
+        )
+        # Number of changed keys that triggers an early write.
+        self.max_pending = bot.twitch_config.get(
+            'plugin_state_max_pending', 100
+        )
+
+        # State by plugin in the form {plugin: {key: value}}.
+        self.states = {}
+
+        # Changed and deleted keys by plugin waiting to be written.
+        self.dirty = {}
+        self.deleted = {}
+        self.flush_event = asyncio.Event()
+
+        return self
+
+    def namespace(self, plugin: str) -> PluginState:
+        """Get the state of a single plugin.
+
+        Args:
+            plugin (str): Plugin (class) name.
+
+        Returns:
+            (PluginState): State bound to the plugin.
+        """
+        return PluginState(self, plugin)
+
+    async def _load(self, plugin: str) -> dict:
+        """Get the state of a plugin, loading it on first use.
+
+        Args:
+            plugin (str): Plugin (class) name.
+
+        Returns:
+            (dict): The cached state.
+        """
+        if plugin in self.states:
+            return self.states[plugin]
+
+        rows = await self.db.execute(
+            'SELECT key, value FROM plugin_state WHERE plugin = ?;',
+            [plugin],
+            commit=False,
+        )
+
+        state = {}
+        for row in rows or []:
+            try:
+                state[row['key']] = json.loads(row['value'])
+            except (TypeError, ValueError):
+                state[row['key']] = row['value']
+
+        # Another task may have loaded it while this one waited.
+        return self.states.setdefault(plugin, state)
+
+    async def _mark(self, plugin: str, key: str) -> None:
+        """Mark a key as changed.
+
+        Args:
+            plugin (str): Plugin (class) name.
+            key (str): State key.
+        """
+        self.dirty.setdefault(plugin, set()).add(key)
+        self.deleted.get(plugin, set()).discard(key)
+
+        if sum(len(keys) for keys in self.dirty.values()) >= self.max_pending:
+            self.flush_event.set()
+
+    async def get(
+        self, plugin: str, key: str, default: Optional[Any] = None
+    ) -> Any:
+        """Get a value.
+
+        Args:
+            plugin (str): Plugin (class) name.
+            key (str): State key.
+            default (any, optional): Value returned if the key is not set.
+
+        Returns:
+            (any): The value.
+        """
+        return (await self._load(plugin)).get(key, default)
+
+    async def set(self, plugin: str, key: str, value: Any) -> None:
+        """Set a value.
+
+        Args:
+            plugin (str): Plugin (class) name.
+            key (str): State key.
+            value (any): JSON serializable value.
+        """
+        (await self._load(plugin))[key] = value
+        await self._mark(plugin, key)
+
+    async def incr(
+        self, plugin: str, key: str, amount: Optional[int] = 1
+    ) -> int:
+        """Increment a value.
+
+        Args:
+            plugin (str): Plugin (class) name.
+            key (str): State key.
+            amount (int, optional): Amount to add. Default is 1.
+
+        Returns:
+            (int): The new value.
+        """
+        state = await self._load(plugin)
+        state[key] = int(state.get(key) or 0) + amount
+        await self._mark(plugin, key)
+
+        return state[key]
+
+    async def update(self, plugin: str, values: dict) -> None:
+        """Set several values.
+
+        Args:
+            plugin (str): Plugin (class) name.
+            values (dict): Dictionary of key: value.
+        """
+        state = await self._load(plugin)
+        for key, value in values.items():
+            state[key] = value
+            await self._mark(plugin, key)
+
+    async def delete(self, plugin: str, key: str) -> None:
+        """Delete a value.
+
+        Args:
+            plugin (str): Plugin (class) name.
+            key (str): State key.
+        """
+        (await self._load(plugin)).pop(key, None)
+        self.dirty.get(plugin, set()).discard(key)
+        self.deleted.setdefault(plugin, set()).add(key)
+
+    async def items(self, plugin: str) -> dict:
+        """Get all the values of a plugin.
+
+        Args:
+            plugin (str): Plugin (class) name.
+
+        Returns:
+            (dict): Copy of the state as key: value.
+        """
+        return dict(await self._load(plugin))
+
+    async def import_legacy(self, plugin: str) -> bool:
+        """Import the state of a plugin from the last row of its old table.
+
+        Only runs if the plugin has no state yet. The old table is left in
+        place and can be dropped once the bot has run with the new state.
+
+        Args:
+            plugin (str): Plugin (class) name, which is also the table name.
+
+        Returns:
+            (bool): True if state was imported, otherwise False.
+        """
+        if await self.items(plugin):
+            return False
+
+        table = await self.db.execute(
+            'SELECT name FROM sqlite_master WHERE type = "table" '
+            'AND name = ?;',
+            [plugin],
+            commit=False,
+        )
+        if not table:
+            return False
+
+        last_row = await self.db.execute(
+            f'SELECT * FROM {plugin} ORDER BY id DESC LIMIT 1;', commit=False
+        )
+        if not last_row:
+            return False
+
+        state = {k: v for k, v in dict(last_row[0]).items() if k != 'id'}
+        if state.get('last_run'):
+            state['last_run'] = time_utils.to_epoch_ms(state['last_run'])
+
+        await self.update(plugin, state)
+        LOG.info(f'Imported the state of {plugin} from its table.')
+
+        return True
+
+    async def flush(self) -> None:
+        """Write the changed keys to the database in one transaction."""
+        if not self.dirty and not self.deleted:
+            return
+
+        dirty, self.dirty = self.dirty, {}
+        deleted, self.deleted = self.deleted, {}
+
+        now = time_utils.now_ms()
+        upserts = []
+        for plugin, keys in dirty.items():
+            state = self.states.get(plugin, {})
+            for key in keys:
+                if key not in state:
+                    continue
+
+                # One value that can't be stored mustn't hold back the rest.
+                try:
+                    value = json.dumps(state[key])
+
+                except (TypeError, ValueError) as e:
+                    LOG.error(
+                        'Unable to store the state {} of {}: {}'.format(
+                            key, plugin, getattr(e, 'message', repr(e))
+                        )
+                    )
+                    continue
+
+                upserts.append((plugin, key, value, now))
+        deletes = [
+            (plugin, key) for plugin, keys in deleted.items() for key in keys
+        ]
+
+        async def restore() -> None:
+            """Keep the changes for the next attempt."""
+            for plugin, keys in dirty.items():
+                self.dirty.setdefault(plugin, set()).update(keys)
+            for plugin, keys in deleted.items():
+                self.deleted.setdefault(plugin, set()).update(keys)
+
+        try:
+            async with self.db.transaction():
+                self.db.on_rollback(restore)
+                if upserts:
+                    result = await self.db.execute_many(
+                        UPSERT_STATE, upserts, commit=False
+                    )
+                    if result is None:
+                        raise BotDBError('Unable to write the plugin state.')
+                if deletes:
+                    result = await self.db.execute_many(
+                        'DELETE FROM plugin_state '
+                        'WHERE plugin = ? AND key = ?;',
+                        deletes,
+                        commit=False,
+                    )
+                    if result is None:
+                        raise BotDBError('Unable to delete the plugin state.')
+
+        except BotDBError as e:
+            LOG.error(
+                'Unable to flush the plugin state: {}'.format(
+                    getattr(e, 'message', repr(e))
+                )
+            )
+            return
+
+        LOG.debug(
+            f'Flushed {len(upserts)} plugin state changes and '
+            f'{len(deletes)} deletions.'
+        )
+
+    async def run(self) -> None:
+        """Asynchronous task for flushing the plugin state."""
+        LOG.debug('Running plugin state loop.')
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self.flush_event.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+            self.flush_event.clear()
+            await self.flush()
@@ -0,0 +1,239 @@
+"""Retention and compaction for the plugin tables.
+
+Every run of a plugin with FIELDS appends a row to its table to record who
+ran it and when. Only the last row is ever read back, so older rows are
+trimmed in the background according to a retention policy:
+
+-   rows: Keep the last N rows.
+-   days: Keep the rows from the last N days.
+-   state: Keep only the last row, which is updated in place.
+-   all: Keep everything.
+
+The default policy is set in the bot config and can be overridden per plugin
+with a RETENTION attribute or in the config by plugin (class) name.
+"""
+
+import asyncio
+
+import time_utils
+
+from log import LOG
+
+RETENTION_MODES = ['rows', 'days', 'state', 'all']
+
+
+class RetentionManager(object):
+    """Retention Manager Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(RetentionManager, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (RetentionManager): Class instance.
+        """
+        self.bot = bot
+        self.db = bot.db
+
+        config = bot.twitch_config
+
+        # Time in minutes between compaction passes.
+        self.interval = config.get('retention_interval', 60)
+        # Number of rows deleted per transaction.
+        self.batch_size = config.get('retention_batch_size', 500)
+        # Time in seconds to wait between batches so other writes can run.
+        self.batch_pause = config.get('retention_batch_pause', 0.05)
+        # Number of free pages to reclaim after a compaction pass.
+        self.vacuum_pages = config.get('retention_vacuum_pages', 1000)
+
+        self.default_policy = config.get(
+            'retention_policy', {'mode': 'rows', 'keep': 100}
+        )
+        self.overrides = config.get('retention_overrides') or {}
+
+        return self
+
+    async def get_policy(self, plugin: object) -> dict:
+        """Get the retention policy for a plugin.
+
+        Args:
+            plugin (BasePlugin): Plugin class or instance.
+
+        Returns:
+            policy (dict): Retention policy in the form:
+                {'mode': mode, 'keep': value, 'include_table': bool}
+        """
+        plugin_name = getattr(plugin, '__name__', plugin.__class__.__name__)
+
+        policy = dict(self.default_policy)
+        policy.update(getattr(plugin, 'RETENTION', {}))
+        policy.update(self.overrides.get(plugin_name, {}))
+
+        if policy.get('mode') not in RETENTION_MODES:
+            LOG.warning(
+                f'Unknown retention mode for {plugin_name}: '
+                f'{policy.get("mode")}, keeping all rows.'
+            )
+            policy['mode'] = 'all'
+
+        return policy
+
+    async def get_tables(self) -> dict:
+        """Get the tables to compact and their retention policies.
+
+        Returns:
+            tables (dict): Dictionary of table name: policy.
+        """
+        tables = {}
+
+        for category in self.bot.plugins:
+            for plugin in self.bot.plugins[category].values():
+                policy = await self.get_policy(plugin)
+                if policy['mode'] == 'all':
+                    continue
+
+                tables[plugin.__name__] = policy
+
+                # Custom tables usually hold actual data, so only compact
+                # them if the plugin explicitly asks for it.
+                if hasattr(plugin, 'TABLE') and policy.get('include_table'):
+                    tables[plugin.TABLE] = policy
+
+        return tables
+
+    async def get_cutoff(self, table: str, policy: dict) -> int:
+        """Get the id below which rows can be deleted.
+
+        The last row is always kept since it holds the plugin state.
+
+        Args:
+            table (str): Table name.
+            policy (dict): Retention policy.
+
+        Returns:
+            (int): Cutoff id, or 0 if nothing should be deleted.
+        """
+        last_row = await self.db.execute(
+            f'SELECT MAX(id) FROM {table};', commit=False
+        )
+        if not last_row or last_row[0][0] is None:
+            return 0
+
+        last_id = last_row[0][0]
+
+        if policy['mode'] == 'state':
+            return last_id
+
+        if policy['mode'] == 'rows':
+            keep = max(int(policy.get('keep', 1)), 1)
+            data = await self.db.execute(
+                f'SELECT id FROM {table} ORDER BY id DESC LIMIT 1 OFFSET ?;',
+                [keep - 1],
+                commit=False,
+            )
+            return data[0][0] if data else 0
+
+        # Otherwise keep the rows from the last N days.
+        # Tables created before the epoch timestamps declare last_run as
+        # TEXT, so it is cast for the comparison.
+        cutoff_time = time_utils.now_ms() - policy.get('keep', 30) * 86400000
+        data = await self.db.execute(
+            f'SELECT MAX(id) FROM {table} '
+            'WHERE CAST(last_run AS INTEGER) < ?;',
+            [cutoff_time],
+            commit=False,
+        )
+        if not data or data[0][0] is None:
+            return 0
+
+        return min(data[0][0] + 1, last_id)
+
+    async def compact_table(self, table: str, policy: dict) -> int:
+        """Delete the rows falling outside of the retention policy.
+
+        Rows are deleted in small batches, each in its own transaction, so
+        that the write lock is never held for long.
+
+        Args:
+            table (str): Table name.
+            policy (dict): Retention policy.
+
+        Returns:
+            deleted (int): Number of rows deleted.
+        """
+        cutoff = await self.get_cutoff(table, policy)
+        if not cutoff:
+            return 0
+
+        count = await self.db.execute(
+            f'SELECT COUNT(*) FROM {table} WHERE id < ?;',
+            [cutoff],
+            commit=False,
+        )
+        remaining = count[0][0] if count else 0
+        deleted = 0
+
+        cmd = (
+            f'DELETE FROM {table} WHERE id IN '
+            f'(SELECT id FROM {table} WHERE id < ? ORDER BY id LIMIT ?);'
+        )
+
+        while remaining > 0:
+            await self.db.execute(cmd, [cutoff, self.batch_size])
+            batch = min(remaining, self.batch_size)
+            remaining -= batch
+            deleted += batch
+
+            # Yield so queued chat and event writes can get in between.
+            await asyncio.sleep(self.batch_pause)
+
+        return deleted
+
+    async def compact(self) -> None:
+        """Compact all the plugin tables and reclaim the free pages."""
+        tables = await self.get_tables()
+        existing_tables = await self.db._get_tables() or []
+
+        total = 0
+        for table, policy in tables.items():
+            if table not in existing_tables:
+                continue
+
+            deleted = await self.compact_table(table, policy)
+            if deleted:
+                LOG.debug(f'Compacted {deleted} rows from {table}.')
+
+            total += deleted
+
+        if total:
+            LOG.info(f'Compacted {total} rows from the plugin tables.')
+            await self.vacuum()
+
+    async def vacuum(self) -> None:
+        """Run an incremental vacuum to return free pages to the filesystem.
+
+        This only works if the database uses incremental auto vacuum.
+        """
+        auto_vacuum = await self.db.execute(
+            'PRAGMA auto_vacuum;', commit=False
+        )
+        if not auto_vacuum or auto_vacuum[0][0] != 2:
+            LOG.debug('Incremental vacuum is not enabled, skipping.')
+            return
+
+        await self.db.execute(
+            f'PRAGMA incremental_vacuum({int(self.vacuum_pages)});'
+        )
+
+    async def run(self) -> None:
+        """Asynchronous task for compacting the plugin tables."""
+        LOG.debug('Running retention loop.')
+        while True:
+            await asyncio.sleep(self.interval * 60)
+            await self.compact()
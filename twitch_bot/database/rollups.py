@@ -0,0 +1,242 @@
+"""Viewer stats rollups.
+
+Keeps hourly and daily summaries (min, max, average and last viewer count)
+of the raw viewer_stats samples in their own tables. The summaries are
+updated in the same transaction as the raw samples are written, so they
+never need to be rebuilt, and raw samples can expire after a configurable
+number of days while the summaries are kept.
+
+Range queries read from the coarsest table that still fits the requested
+resolution, so a month long graph reads ~30 daily rows instead of tens of
+thousands of samples.
+
+Sample times and buckets are epoch milliseconds. Buckets start on the local
+hour or day, so the daily rollups follow the configured timezone.
+"""
+
+import asyncio
+
+from datetime import datetime
+from typing import Optional, Union
+
+import time_utils
+
+from exceptions.exceptions import BotDBError
+from log import LOG
+
+# Rollup tables, coarsest first, with their resolution in seconds.
+ROLLUPS = [
+    ('viewer_stats_daily', 86400),
+    ('viewer_stats_hourly', 3600),
+]
+
+UPSERT_ROLLUP = (
+    'INSERT INTO {table} (bucket, samples, min_count, max_count, sum_count, '
+    'last_count, last_time) VALUES (?, ?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT (bucket) DO UPDATE SET '
+    'samples = samples + excluded.samples, '
+    'min_count = min(min_count, excluded.min_count), '
+    'max_count = max(max_count, excluded.max_count), '
+    'sum_count = sum_count + excluded.sum_count, '
+    'last_count = CASE WHEN excluded.last_time >= last_time '
+    'THEN excluded.last_count ELSE last_count END, '
+    'last_time = max(last_time, excluded.last_time);'
+)
+
+
+def bucket_start(timestamp: int, resolution: int) -> int:
+    """Get the start of the rollup bucket holding a timestamp.
+
+    Args:
+        timestamp (int): Milliseconds since the epoch.
+        resolution (int): Bucket width in seconds, an hour or a day.
+
+    Returns:
+        (int): Start of the local hour or day in epoch milliseconds.
+    """
+    start = time_utils.from_epoch_ms(timestamp).replace(
+        minute=0, second=0, microsecond=0
+    )
+    if resolution >= 86400:
+        start = start.replace(hour=0)
+
+    return time_utils.to_epoch_ms(start)
+
+
+class ViewerRollups(object):
+    """Viewer Rollups Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(ViewerRollups, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (ViewerRollups): Class instance.
+        """
+        self.db = bot.db
+
+        # Number of days raw samples are kept, 0 keeps them forever.
+        self.raw_days = bot.twitch_config.get('viewer_stats_raw_days', 30)
+
+        return self
+
+    async def add_samples(self, samples: list) -> bool:
+        """Write raw viewer count samples and update the rollups.
+
+        Args:
+            samples (list): List of (epoch ms, viewer_count) tuples.
+
+        Returns:
+            (bool): True if the samples were written, otherwise False.
+        """
+        if not samples:
+            return True
+
+        samples = sorted(samples)
+
+        # Summarize the batch per bucket first, so each bucket is only
+        # written once.
+        rollups = {}
+        for table, resolution in ROLLUPS:
+            buckets = rollups.setdefault(table, {})
+            for sample_time, count in samples:
+                count = int(count)
+                sample_time = int(sample_time)
+                bucket = bucket_start(sample_time, resolution)
+
+                summary = buckets.setdefault(
+                    bucket, [0, count, count, 0, count, sample_time]
+                )
+                summary[0] += 1
+                summary[1] = min(summary[1], count)
+                summary[2] = max(summary[2], count)
+                summary[3] += count
+                summary[4] = count
+                summary[5] = sample_time
+
+        try:
+            async with self.db.transaction():
+                result = await self.db.execute_many(
+                    'INSERT INTO viewer_stats (sample_time, viewer_count) '
+                    'VALUES (?, ?);',
+                    [(int(t), int(count)) for t, count in samples],
+                    commit=False,
+                )
+                if result is None:
+                    raise BotDBError('Unable to write the viewer samples.')
+
+                for table, buckets in rollups.items():
+                    result = await self.db.execute_many(
+                        UPSERT_ROLLUP.format(table=table),
+                        [[bucket] + row for bucket, row in buckets.items()],
+                        commit=False,
+                    )
+                    if result is None:
+                        raise BotDBError(f'Unable to update {table}.')
+
+        except BotDBError as e:
+            LOG.error(
+                'Unable to write the viewer stats: {}'.format(
+                    getattr(e, 'message', repr(e))
+                )
+            )
+            return False
+
+        return True
+
+    async def expire(self) -> int:
+        """Delete the raw samples older than the raw horizon.
+
+        Returns:
+            (int): Number of samples deleted.
+        """
+        if not self.raw_days:
+            return 0
+
+        cutoff = time_utils.now_ms() - self.raw_days * 86400000
+        # The count comes from the DELETE's own cursor, a separate changes()
+        # could report another statement run in between.
+        deleted = await self.db.execute_many(
+            'DELETE FROM viewer_stats WHERE sample_time < ?;', [[cutoff]]
+        )
+        if deleted:
+            LOG.debug(f'Expired {deleted} raw viewer stats samples.')
+
+        return deleted or 0
+
+    async def query(
+        self,
+        start: Union[datetime, int],
+        end: Union[datetime, int],
+        resolution: Optional[int] = 0,
+    ) -> list:
+        """Get the viewer counts for a time range.
+
+        Reads from the coarsest table whose resolution fits the requested
+        one. Raw samples are used for finer resolutions, unless part of the
+        range has already expired, in which case the hourly rollup is used.
+
+        Args:
+            start (datetime|int): Start of the range, as a local time or in
+                epoch milliseconds.
+            end (datetime|int): End of the range.
+            resolution (int, optional): Wanted resolution in seconds.
+                Default is 0, the finest available.
+
+        Returns:
+            (list): List of dictionaries in the form:
+                {'time': int (epoch ms), 'min': int, 'max': int,
+                    'avg': float, 'last': int}
+        """
+        start = time_utils.to_epoch_ms(start)
+        end = time_utils.to_epoch_ms(end)
+        raw_horizon = time_utils.now_ms() - self.raw_days * 86400000
+
+        for table, table_resolution in ROLLUPS:
+            if resolution >= table_resolution or (
+                self.raw_days
+                and start < raw_horizon
+                and table == 'viewer_stats_hourly'
+            ):
+                rows = await self.db.execute(
+                    'SELECT bucket, min_count, max_count, '
+                    'CAST(sum_count AS REAL) / samples, last_count '
+                    f'FROM {table} WHERE bucket >= ? AND bucket <= ? '
+                    'ORDER BY bucket;',
+                    [bucket_start(start, table_resolution), end],
+                    commit=False,
+                )
+                break
+        else:
+            rows = await self.db.execute(
+                'SELECT sample_time, viewer_count, viewer_count, '
+                'viewer_count, viewer_count FROM viewer_stats '
+                'WHERE sample_time >= ? AND sample_time <= ? '
+                'ORDER BY sample_time;',
+                [start, end],
+                commit=False,
+            )
+
+        return [
+            {
+                'time': row[0],
+                'min': row[1],
+                'max': row[2],
+                'avg': row[3],
+                'last': row[4],
+            }
+            for row in rows or []
+        ]
+
+    async def run(self) -> None:
+        """Asynchronous task for expiring the raw samples."""
+        LOG.debug('Running viewer stats rollup loop.')
+        while True:
+            await self.expire()
+            await asyncio.sleep(3600)
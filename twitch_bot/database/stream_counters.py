@@ -0,0 +1,344 @@
+"""Stream Counters.
+
+In-memory counters for the current row of the stream_stats table.
+
+Increments are applied in memory and written to the database atomically
+(SET field = field + delta) by a background task. Writes happen at least
+every flush interval, or sooner if enough increments are pending, which
+bounds how stale the database can be.
+
+Every increment is also journaled with a sequence number. Journal lines are
+buffered in memory and appended to the journal file in a thread every journal
+interval, so the chat path never waits on the disk. The last flushed sequence
+number is committed in the same transaction as the counters, so after a crash
+the journal can be replayed without applying any increment twice. At most one
+journal interval of increments can be lost.
+
+Pending increments are kept by stream session, like the journal, so
+increments are always written to the session they were made in.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+from typing import Optional
+
+import time_utils
+
+from exceptions.exceptions import BotDBError
+from log import LOG
+
+COUNTER_FIELDS = [
+    'bits',
+    'followers',
+    'messages',
+    'raids',
+    'rewards',
+    'subscribers',
+]
+
+
+class StreamCounters(object):
+    """Stream Counters Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(StreamCounters, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (StreamCounters): Class instance.
+        """
+        self.db = bot.db
+
+        # Maximum time in seconds before pending increments are written.
+        self.flush_interval = bot.twitch_config.get(
+            'counter_flush_interval', 5
+        )
+        # Number of pending increments that triggers an early write.
+        self.max_pending = bot.twitch_config.get('counter_max_pending', 500)
+        # Time in seconds between journal writes.
+        self.journal_interval = bot.twitch_config.get(
+            'counter_journal_interval', 1
+        )
+
+        self.journal_path = os.path.join(
+            os.path.dirname(self.db.db_path), 'stream_counters.journal'
+        )
+        self.flushing_path = f'{self.journal_path}.flushing'
+
+        # Pending increments in the form {session_id: {field: delta}}.
+        self.pending = {}
+        self.pending_count = 0
+        self.flush_event = asyncio.Event()
+
+        # Journal lines waiting to be written and the lock that keeps the
+        # journal writes and rotations in order.
+        self.journal_buffer = []
+        self.journal_lock = asyncio.Lock()
+
+        state = await self.db.execute(
+            'SELECT last_seq FROM stream_counters_state WHERE id = 1;',
+            commit=False,
+        )
+        self.sequence = state[0][0] if state else 0
+
+        # Recover any increments lost by a crash before picking up the
+        # current session.
+        await self.replay()
+
+        session = await self.db.execute(
+            'SELECT MAX(id) FROM stream_stats;', commit=False
+        )
+        self.session_id = session[0][0] if session else None
+
+        self.journal = open(self.journal_path, 'a')
+
+        return self
+
+    async def start_session(self) -> Optional[int]:
+        """Start a new stream session.
+
+        Pending increments are written to the previous session first.
+
+        Returns:
+            (int|None): Id of the new stream_stats row.
+        """
+        await self.flush()
+
+        now = time_utils.now_ms()
+        rows = await self.db.execute(
+            'INSERT INTO stream_stats (stream_end, stream_start) '
+            'VALUES (?, ?) RETURNING id;',
+            [now, now],
+        )
+        if rows:
+            self.session_id = rows[0][0]
+
+        return self.session_id
+
+    async def increment(self, field: str, amount: Optional[int] = 1) -> None:
+        """Increment a counter.
+
+        Args:
+            field (str): Counter name, one of COUNTER_FIELDS.
+            amount (int, optional): Amount to add. Default is 1.
+        """
+        if field not in COUNTER_FIELDS:
+            LOG.warning(f'{field} is not a known stream counter.')
+            return
+
+        self.sequence += 1
+        self.journal_buffer.append(
+            json.dumps([self.sequence, self.session_id, field, amount]) + '\n'
+        )
+
+        deltas = self.pending.setdefault(self.session_id, {})
+        deltas[field] = deltas.get(field, 0) + amount
+        self.pending_count += 1
+
+        if self.pending_count >= self.max_pending:
+            self.flush_event.set()
+
+    async def get(self, field: str) -> int:
+        """Get the current value of a counter, including pending increments.
+
+        Args:
+            field (str): Counter name, one of COUNTER_FIELDS.
+
+        Returns:
+            (int): Counter value.
+        """
+        if field not in COUNTER_FIELDS or not self.session_id:
+            return 0
+
+        rows = await self.db.execute(
+            f'SELECT {field} FROM stream_stats WHERE id = ?;',
+            [self.session_id],
+            commit=False,
+        )
+        value = rows[0][0] if rows else 0
+
+        return value + self.pending.get(self.session_id, {}).get(field, 0)
+
+    async def _apply(self, sessions: dict, seq: int) -> bool:
+        """Apply counter deltas and the sequence number in one transaction.
+
+        Args:
+            sessions (dict): Deltas by stream_stats id in the form:
+                {session_id: {field: delta}}
+            seq (int): Last sequence number included in the deltas.
+
+        Returns:
+            (bool): True if the deltas were committed, otherwise False.
+        """
+        try:
+            async with self.db.transaction():
+                for session_id, deltas in sessions.items():
+                    if not session_id:
+                        LOG.debug(
+                            f'No stream session, dropping counters: {deltas}'
+                        )
+                        continue
+
+                    assignments = ', '.join(
+                        [f'{field} = {field} + ?' for field in deltas]
+                    )
+                    result = await self.db.execute(
+                        f'UPDATE stream_stats SET {assignments} WHERE id = ?;',
+                        list(deltas.values()) + [session_id],
+                        commit=False,
+                    )
+                    if result is None:
+                        raise BotDBError(
+                            f'Unable to update stream {session_id}.'
+                        )
+
+                result = await self.db.execute(
+                    'UPDATE stream_counters_state SET last_seq = ? '
+                    'WHERE id = 1;',
+                    [seq],
+                    commit=False,
+                )
+                if result is None:
+                    raise BotDBError('Unable to update the sequence number.')
+
+        except BotDBError as e:
+            LOG.error(
+                'Unable to write the stream counters: {}'.format(
+                    getattr(e, 'message', repr(e))
+                )
+            )
+            return False
+
+        return True
+
+    def _write_journal(self, lines: list) -> None:
+        """Append lines to the journal file.
+
+        Args:
+            lines (list): Journal lines.
+        """
+        self.journal.write(''.join(lines))
+        self.journal.flush()
+
+    def _rotate_journal(self, lines: list) -> None:
+        """Write the last lines and move the journal aside for a flush.
+
+        Args:
+            lines (list): Journal lines not written yet.
+        """
+        self._write_journal(lines)
+        self.journal.close()
+
+        if os.path.exists(self.flushing_path):
+            # A previous write failed, so keep its segment for replay too.
+            with open(self.flushing_path, 'a') as out_file:
+                with open(self.journal_path, 'r') as in_file:
+                    out_file.write(in_file.read())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self.flushing_path)
+
+        self.journal = open(self.journal_path, 'a')
+
+    async def write_journal(self) -> None:
+        """Write the buffered journal lines to the journal file."""
+        async with self.journal_lock:
+            if not self.journal_buffer:
+                return
+
+            lines, self.journal_buffer = self.journal_buffer, []
+            await asyncio.to_thread(self._write_journal, lines)
+
+    async def flush(self) -> None:
+        """Write the pending increments to the database."""
+        if not self.pending:
+            return
+
+        async with self.journal_lock:
+            # Swap out the pending increments and the journal segment that
+            # holds them, so increments made during the write go to the next
+            # flush.
+            pending, self.pending = self.pending, {}
+            lines, self.journal_buffer = self.journal_buffer, []
+            self.pending_count = 0
+            sequence = self.sequence
+
+            await asyncio.to_thread(self._rotate_journal, lines)
+
+            if not await self._apply(pending, sequence):
+                # Put the increments back, the journal segment is kept for
+                # replay.
+                for session_id, deltas in pending.items():
+                    restored = self.pending.setdefault(session_id, {})
+                    for field, delta in deltas.items():
+                        restored[field] = restored.get(field, 0) + delta
+                return
+
+            os.remove(self.flushing_path)
+
+        LOG.debug(f'Flushed stream counters: {pending}')
+
+    async def replay(self) -> None:
+        """Apply any journaled increments that were never flushed."""
+        entries = []
+        for path in [self.flushing_path, self.journal_path]:
+            if not os.path.exists(path):
+                continue
+
+            with open(path, 'r') as in_file:
+                for line in in_file:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # A crash may leave a partially written last line.
+                        LOG.warning(f'Skipping corrupt journal line: {line}')
+
+        entries = [e for e in entries if e[0] > self.sequence]
+        if entries:
+            sessions = {}
+            for seq, session_id, field, amount in entries:
+                deltas = sessions.setdefault(session_id, {})
+                deltas[field] = deltas.get(field, 0) + amount
+
+            last_seq = max(e[0] for e in entries)
+            if not await self._apply(sessions, last_seq):
+                LOG.error('Unable to replay the stream counters journal.')
+                return
+
+            self.sequence = last_seq
+            LOG.info(f'Replayed {len(entries)} stream counter increments.')
+
+        for path in [self.flushing_path, self.journal_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def run(self) -> None:
+        """Asynchronous task for flushing the counters."""
+        LOG.debug('Running stream counters loop.')
+        last_flush = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self.flush_event.wait(), timeout=self.journal_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+            await self.write_journal()
+
+            if (
+                self.flush_event.is_set()
+                or time.monotonic() - last_flush >= self.flush_interval
+            ):
+                self.flush_event.clear()
+                await self.flush()
+                last_flush = time.monotonic()
@@ -0,0 +1,388 @@
+"""User Repository.
+
+Write-through, in-memory store of the users table rows for people in chat.
+
+Rows are loaded once (or created) with a single upsert and then served from
+memory. Changes are applied to the in-memory row immediately and written to
+the database in batches by a background task, so the chat path does not have
+to wait on the database. Counters are written as deltas (SET field = field +
+delta) so concurrent writers never lose increments.
+"""
+
+import asyncio
+import time
+
+from typing import Optional
+
+import time_utils
+
+from chat.presence_index import get_presence
+from exceptions.exceptions import BotDBError
+from log import LOG
+
+UPSERT_USER = (
+    'INSERT INTO users (username, user_id, last_join_time) VALUES (?, ?, ?) '
+    'ON CONFLICT (username, user_id) DO UPDATE SET username = '
+    'excluded.username RETURNING *;'
+)
+
+
+class UserRepository(object):
+    """User Repository Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(UserRepository, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (UserRepository): Class instance.
+        """
+        self.db = bot.db
+
+        # Time in seconds between flushes of the changed rows.
+        self.flush_interval = bot.twitch_config.get('user_flush_interval', 5)
+        # Time in minutes before a user who left chat is evicted.
+        self.idle_eviction = bot.twitch_config.get('user_idle_eviction', 30)
+
+        # Rows by username and a lookup of username by user id.
+        self.users = {}
+        self.user_ids = {}
+
+        # Changed fields by username waiting to be flushed.
+        self.dirty = {}
+
+        # Pending counter increments in the form {username: {field: delta}}.
+        self.deltas = {}
+
+        # Last time each user was accessed.
+        self.last_access = {}
+
+        return self
+
+    async def _cache_row(self, row: object) -> dict:
+        """Store a row from the database in memory.
+
+        Args:
+            row (sqlite3.Row): Row from the users table.
+
+        Returns:
+            row_dict (dict): The cached row.
+        """
+        row_dict = dict(row)
+        username = row_dict['username']
+
+        self.users[username] = row_dict
+        self.user_ids[int(row_dict['user_id'])] = username
+        self.last_access[username] = time.monotonic()
+
+        return row_dict
+
+    async def get(self, user_data: dict) -> Optional[dict]:
+        """Get the user data, adding the user if they do not exist.
+
+        Args:
+            user_data (dict): User data from Twitch.
+                Only 'login' and 'id' are required.
+
+        Returns:
+            (dict|None): The user row or None if it could not be loaded.
+        """
+        username = user_data['login']
+
+        if username in self.users:
+            self.last_access[username] = time.monotonic()
+            return self.users[username]
+
+        # Load the user, creating them if they do not exist, in one query.
+        rows = await self.db.execute(
+            UPSERT_USER,
+            [username, user_data['id'], time_utils.now_ms()],
+        )
+        if not rows:
+            LOG.error(f'Unable to load user {username}.')
+            return None
+
+        return await self._cache_row(rows[0])
+
+    async def get_by_login(self, username: str) -> Optional[dict]:
+        """Get the user data by username.
+
+        Unlike get(), unknown users are not added.
+
+        Args:
+            username (str): Username.
+
+        Returns:
+            (dict|None): The user row or None if the user does not exist.
+        """
+        if username in self.users:
+            self.last_access[username] = time.monotonic()
+            return self.users[username]
+
+        rows = await self.db.execute(
+            'SELECT * FROM users WHERE username = ?;', [username], commit=False
+        )
+        if not rows:
+            return None
+
+        return await self._cache_row(rows[0])
+
+    async def get_by_id(self, user_id: int) -> Optional[dict]:
+        """Get the user data by user id.
+
+        Unlike get(), unknown users are not added.
+
+        Args:
+            user_id (int): Twitch user id.
+
+        Returns:
+            (dict|None): The user row or None if the user does not exist.
+        """
+        username = self.user_ids.get(int(user_id))
+        if username in self.users:
+            self.last_access[username] = time.monotonic()
+            return self.users[username]
+
+        rows = await self.db.execute(
+            'SELECT * FROM users WHERE user_id = ?;', [user_id], commit=False
+        )
+        if not rows:
+            return None
+
+        return await self._cache_row(rows[0])
+
+    async def update(self, username: str, data: dict) -> None:
+        """Update a cached user row.
+
+        The change is written to the database on the next flush.
+
+        Args:
+            username (str): Username.
+            data (dict): Dictionary of column: value.
+        """
+        row = self.users.get(username)
+        if row is None:
+            row = await self.get_by_login(username)
+            if row is None:
+                LOG.warning(f'Cannot update unknown user {username}.')
+                return
+
+        row.update(data)
+        self.dirty.setdefault(username, set()).update(data.keys())
+        self.last_access[username] = time.monotonic()
+
+        # An explicit value replaces any pending increments of the field.
+        user_deltas = self.deltas.get(username, {})
+        for field in data:
+            user_deltas.pop(field, None)
+
+    async def increment(
+        self, username: str, field: str, amount: Optional[int] = 1
+    ) -> None:
+        """Increment a numeric field of a cached user row.
+
+        The increment is written as a delta on the next flush.
+
+        Args:
+            username (str): Username.
+            field (str): Column name.
+            amount (int, optional): Amount to add. Default is 1.
+        """
+        row = self.users.get(username) or await self.get_by_login(username)
+        if row is None:
+            LOG.warning(f'Cannot update unknown user {username}.')
+            return
+
+        row[field] = int(row[field] or 0) + amount
+        self.last_access[username] = time.monotonic()
+
+        # If the field already has an explicit value pending, fold the
+        # increment into it.
+        if field in self.dirty.get(username, set()):
+            return
+
+        user_deltas = self.deltas.setdefault(username, {})
+        user_deltas[field] = user_deltas.get(field, 0) + amount
+
+    async def credit(self, usernames: list, data: dict) -> None:
+        """Apply increments already written to the database to cached rows.
+
+        Args:
+            usernames (list): Usernames that were credited.
+            data (dict): Dictionary of column: amount added.
+        """
+        for username in usernames:
+            row = self.users.get(username)
+            if row is None:
+                continue
+
+            for field, amount in data.items():
+                row[field] = int(row[field] or 0) + amount
+
+    async def close_sessions(self, usernames: list, leave_time: int) -> bool:
+        """Close the chat sessions of users when the stream ends.
+
+        The session messages are added to the totals and the leave time is
+        set. Cached rows are changed in memory and written on the next
+        flush, the others are updated in the database. Run it in a
+        transaction to commit it together with other writes.
+
+        Args:
+            usernames (list): Usernames.
+            leave_time (int): Leave time in epoch milliseconds.
+
+        Returns:
+            (bool): True if the sessions were closed, otherwise False.
+        """
+        uncached = []
+        for username in usernames:
+            row = self.users.get(username)
+            if row is None:
+                uncached.append([leave_time, username])
+                continue
+
+            await self.update(
+                username,
+                {
+                    'last_leave_time': leave_time,
+                    'messages_sent_session': 0,
+                    'messages_sent_total': (
+                        int(row['messages_sent_total'] or 0)
+                        + int(row['messages_sent_session'] or 0)
+                    ),
+                },
+            )
+
+        if not uncached:
+            return True
+
+        result = await self.db.execute_many(
+            'UPDATE users SET last_leave_time = ?, messages_sent_total = '
+            'messages_sent_total + messages_sent_session, '
+            'messages_sent_session = 0 WHERE username = ?;',
+            uncached,
+            commit=False,
+        )
+        return result is not None
+
+    async def flush(self) -> bool:
+        """Write all changed rows to the database in a single transaction.
+
+        Inside another transaction, e.g. settling a stream, the rows are
+        written as part of it and put back if it is rolled back.
+
+        Returns:
+            (bool): True if the rows were written, otherwise False.
+        """
+        if not self.dirty and not self.deltas:
+            return True
+
+        # Swap out the pending changes so updates made during the flush are
+        # picked up by the next one.
+        dirty, self.dirty = self.dirty, {}
+        deltas, self.deltas = self.deltas, {}
+
+        # Group the rows by the set of changed fields so each group can be
+        # written with a single executemany.
+        statements = {}
+        for username, fields in dirty.items():
+            row = self.users.get(username)
+            if row is None:
+                continue
+
+            fields = tuple(sorted(fields))
+            assignments = ', '.join([f'{field} = ?' for field in fields])
+            statements.setdefault(assignments, []).append(
+                [row[field] for field in fields] + [row['id']]
+            )
+
+        for username, user_deltas in deltas.items():
+            row = self.users.get(username)
+            if row is None or not user_deltas:
+                continue
+
+            fields = tuple(sorted(user_deltas))
+            assignments = ', '.join([f'{f} = {f} + ?' for f in fields])
+            statements.setdefault(assignments, []).append(
+                [user_deltas[field] for field in fields] + [row['id']]
+            )
+
+        async def restore() -> None:
+            """Keep the changes around if the write is rolled back."""
+            await self._restore(dirty, deltas)
+
+        try:
+            async with self.db.transaction():
+                self.db.on_rollback(restore)
+                for assignments, parameters in statements.items():
+                    result = await self.db.execute_many(
+                        f'UPDATE users SET {assignments} WHERE id = ?;',
+                        parameters,
+                        commit=False,
+                    )
+                    if result is None:
+                        raise BotDBError('Unable to write the user updates.')
+
+        except BotDBError as e:
+            LOG.error(
+                'Unable to flush the users: {}'.format(
+                    getattr(e, 'message', repr(e))
+                )
+            )
+            return False
+
+        LOG.debug(f'Flushed {len(statements)} user updates to the database.')
+
+        return True
+
+    async def _restore(self, dirty: dict, deltas: dict) -> None:
+        """Merge changes from a failed flush back into the pending changes.
+
+        Args:
+            dirty (dict): Changed fields by username.
+            deltas (dict): Counter increments by username.
+        """
+        for username, fields in dirty.items():
+            self.dirty.setdefault(username, set()).update(fields)
+
+        for username, user_deltas in deltas.items():
+            pending = self.deltas.setdefault(username, {})
+            for field, delta in user_deltas.items():
+                if field in self.dirty.get(username, set()):
+                    continue
+
+                pending[field] = pending.get(field, 0) + delta
+
+    async def evict(self) -> None:
+        """Remove users who are no longer in chat and have been idle."""
+        present = get_presence()
+        cutoff = time.monotonic() - self.idle_eviction * 60
+
+        for username in list(self.users):
+            if (
+                username in present
+                or username in self.dirty
+                or username in self.deltas
+            ):
+                continue
+
+            if self.last_access.get(username, 0) > cutoff:
+                continue
+
+            row = self.users.pop(username)
+            self.user_ids.pop(int(row['user_id']), None)
+            self.last_access.pop(username, None)
+
+    async def run(self) -> None:
+        """Asynchronous task for flushing and evicting users."""
+        LOG.debug('Running user repository loop.')
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            await self.evict()
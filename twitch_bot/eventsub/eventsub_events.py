@@ -1,14 +1,17 @@
 """EventSub Events."""
 
+import time
+
 from datetime import datetime
 
 import api
+import time_utils
 import utils
 
-from chat.chat_events import PartEvent
+from chat.presence_index import get_presence
 from discord import discord_sender
 from events import Event
-from init import CACHE
+from exceptions.exceptions import BotDBError
 from log import LOG
 
 
@@ -117,12 +120,7 @@ class FollowEvent(EventSubEvent):
         )
 
         # Update the stream stats table.
-        last_row = dict(await bot.db.get_last_row('stream_stats'))
-        await bot.db.update(
-            'stream_stats',
-            {'followers': last_row['followers'] + 1},
-            {'id': last_row['id']},
-        )
+        await bot.counters.increment('followers')
 
         await bot.loyalty_manager.add_loyalty_points_for_event(
             self.user_name, 'follow'
@@ -182,12 +180,7 @@ class SubscribeEvent(EventSubEvent):
         await bot.send_message(message)
 
         # Update the stream stats table.
-        last_row = dict(await bot.db.get_last_row('stream_stats'))
-        await bot.db.update(
-            'stream_stats',
-            {'subscribers': last_row['subscribers'] + 1},
-            {'id': last_row['id']},
-        )
+        await bot.counters.increment('subscribers')
 
         await bot.loyalty_manager.add_loyalty_points_for_event(
             self.user_name, 'subscribe'
@@ -311,12 +304,7 @@ class SubscriptionMessageEvent(EventSubEvent):
         )
 
         # Update the stream stats table.
-        last_row = dict(await bot.db.get_last_row('stream_stats'))
-        await bot.db.update(
-            'stream_stats',
-            {'subscribers': last_row['subscribers'] + 1},
-            {'id': last_row['id']},
-        )
+        await bot.counters.increment('subscribers')
 
         await bot.loyalty_manager.add_loyalty_points_for_event(
             self.user_name, 'subscribe'
@@ -385,12 +373,7 @@ class CheerEvent(EventSubEvent):
         )
 
         # Update the stream stats table.
-        last_row = dict(await bot.db.get_last_row('stream_stats'))
-        await bot.db.update(
-            'stream_stats',
-            {'bits': last_row['bits'] + self.bits},
-            {'id': last_row['id']},
-        )
+        await bot.counters.increment('bits', self.bits)
 
         await bot.loyalty_manager.add_loyalty_points_for_event(
             self.user_name, 'cheer'
@@ -461,12 +444,7 @@ class RaidEvent(EventSubEvent):
         )
 
         # Update the stream stats table.
-        last_row = dict(await bot.db.get_last_row('stream_stats'))
-        await bot.db.update(
-            'stream_stats',
-            {'raids': last_row['raids'] + 1},
-            {'id': last_row['id']},
-        )
+        await bot.counters.increment('raids')
 
 
 class RewardRedemptionEvent(EventSubEvent):
@@ -520,12 +498,7 @@ class RewardRedemptionEvent(EventSubEvent):
         """
         LOG.debug(f'A RewardRedemptionEvent was received: {self}')
         # Update the stream stats table.
-        last_row = dict(await bot.db.get_last_row('stream_stats'))
-        await bot.db.update(
-            'stream_stats',
-            {'rewards': last_row['rewards'] + 1},
-            {'id': last_row['id']},
-        )
+        await bot.counters.increment('rewards')
 
         parts = self.reward_title.split(' ')
         command = parts[0].lower()
@@ -925,10 +898,10 @@ class StreamOnlineEvent(EventSubEvent):
         await discord_sender.send_online_announcement(channel_data)
 
         # Create a new stats entry.
-        await bot.db.insert(
-            'stream_stats',
-            {'stream_end': datetime.now(), 'stream_start': datetime.now()},
-        )
+        await bot.counters.start_session()
+
+        # Start sampling the viewer count.
+        await bot.viewer_sampler.start()
 
         # Connect OBS if it is not already connected.
         await bot.obs.obs_connection.connect()
@@ -977,51 +950,91 @@ class StreamOfflineEvent(EventSubEvent):
         # Disconnect OBS
         await self.bot.obs.obs_connection.disconnect()
 
-        # Update the stream stats database.
-        chatters_cache = await CACHE.get('chatters')
-        last_row = dict(await self.bot.db.get_last_row('stream_stats'))
-        await self.bot.db.update(
-            'stream_stats',
-            {
-                'chatters': len(chatters_cache.data),
-                'stream_end': str(datetime.now()),
-            },
-            {'id': last_row['id']},
-        )
+        # Write out the counters and viewer samples before finalizing the
+        # stream stats.
+        await self.bot.counters.flush()
+        await self.bot.viewer_sampler.stop()
+
+        # Finalize the stream stats and close the user sessions.
+        presence = get_presence()
+        settled = await self.settle_stream(len(presence.chatters))
+
+        # Append the finished stream to the columnar history export.
+        self.bot.exporter.start_export()
+
+        # Take a fresh analytics snapshot so the reports include the stream.
+        if self.bot.analytics is not self.bot.db:
+            await self.bot.analytics.refresh()
 
-        await self.part_all_users()
         await self.graph_stats()
 
-        # Clear the user cache.
-        user_cache = await CACHE.get('users')
-        user_cache.data = []
+        # Add the finished stream to the cached trends.
+        await self.bot.trends.get_trends()
 
-        # Clear the chatters cache.
-        chatters_cache.data = []
+        # Clear the users in chat and the chatters. If the stream couldn't be
+        # settled, the users in chat are kept so the presence tick still
+        # credits the time they watched.
+        if settled:
+            presence.clear()
+        else:
+            presence.chatters.clear()
 
         bot.running = False
 
         LOG.info('Stream Offline Event completed.')
 
-    async def part_all_users(self) -> None:
-        """Run the user part code for all users in chat."""
-        # Access cache of users in chat.
-        users = await CACHE.get('users')
-
-        for user in users.data:
-            # Skip the owner and bot
-            if user in [self.bot.owner, self.bot.username]:
-                continue
-
-            # Since we are using the existing part event, we create a dummy
-            # IRC message with the user in it since only the username matters
-            # here.
-            data = (
-                f':{user}!{user}@{user}.tmi.twitch.tv '
-                'PRIVMSG #descvert :dummy message'
+    async def settle_stream(self, chatters: int) -> bool:
+        """Settle everyone still in chat when the stream ends.
+
+        The watch time since the last presence tick and the message totals
+        of all present users are computed in memory and written together
+        with the final stream stats in a single transaction.
+
+        Args:
+            chatters (int): Number of users who chatted during the stream.
+
+        Returns:
+            (bool): True if the stream was settled, otherwise False.
+        """
+        start = time.monotonic()
+        now = time_utils.now_ms()
+        usernames = await self.bot.presence.get_present_users()
+
+        # The other tasks wait for the whole settlement. The user changes
+        # are kept in memory if it is rolled back, so they are written by the
+        # next user flush instead.
+        try:
+            async with self.bot.db.transaction():
+                result = await self.bot.db.execute(
+                    'UPDATE stream_stats SET chatters = ?, stream_end = ? '
+                    'WHERE id = ?;',
+                    [chatters, now, self.bot.counters.session_id],
+                    commit=False,
+                )
+                settled = (
+                    result is not None
+                    and await self.bot.presence.settle(usernames)
+                    and await self.bot.users.close_sessions(usernames, now)
+                    and await self.bot.users.flush()
+                )
+                if not settled:
+                    raise BotDBError('A write failed.')
+
+        except BotDBError as e:
+            LOG.error(
+                'Unable to settle the stream: {}'.format(
+                    getattr(e, 'message', repr(e))
+                )
             )
-            part_event = await PartEvent().init(data)
-            await part_event.run(self.bot)
+            return False
+
+        await self.bot.presence.apply_settle()
+        LOG.info(
+            f'Settled {len(usernames)} users in '
+            f'{time.monotonic() - start:.2f}s.'
+        )
+
+        return True
 
     async def graph_stats(self) -> None:
         """Graph the stream stats."""
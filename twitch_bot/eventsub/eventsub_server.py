@@ -141,11 +141,12 @@ async def is_message_unique(request: flask.request) -> bool:
         (bool): True if the message is unique, False otherwise.
     """
     message_id = request.headers.get('twitch-eventsub-message-id')
-    if await CACHE.exists(message_id):
+    messages = CACHE.namespace('eventsub/messages')
+    if message_id in messages:
         LOG.warning('Non-unique message received: discarding.')
         return False
 
-    await CACHE.add(key=message_id, data=request, duration=10)
+    messages.set(message_id, request, ttl=10 * 60)
     return True
 
 
@@ -5,8 +5,11 @@ import sys
 
 from cache import Cache
 from exceptions import excepthook
+from metrics import Metrics
 
-CACHE = Cache()
+METRICS = Metrics()
+
+CACHE = Cache(METRICS)
 
 EVENT_QUEUE = asyncio.Queue()
 
@@ -1,7 +1,5 @@
 """Loyalty Points system."""
 
-import api
-
 from configs import config_utils
 from log import LOG
 
@@ -44,14 +42,11 @@ class LoyaltyManager(object):
         Returns:
             int: Loyalty points.
         """
-        loyalty_points = await self.bot.db.read(
-            'users', ['loyalty_points'], {'username': username}
-        )
-
-        if not loyalty_points:
-            loyalty_points = ['0']
+        user_db_data = await self.bot.users.get_by_login(username)
+        if not user_db_data:
+            return 0
 
-        return int(loyalty_points[0])
+        return int(user_db_data['loyalty_points'])
 
     async def add_loyalty_points(self, username: str, points: int) -> None:
         """Add the loyalty points to the value in the database.
@@ -63,10 +58,7 @@ class LoyaltyManager(object):
             points (int): Loyalty points to add to the existing total.
                 This value can be negative to subtract points.
         """
-        loyalty_points = await self.get_loyalty_points(username) + points
-        await self.bot.db.update(
-            'users', {'loyalty_points': loyalty_points}, {'username': username}
-        )
+        await self.bot.users.increment(username, 'loyalty_points', points)
 
     async def add_loyalty_points_for_event(
         self, username: str, event: str, quantity: int = 0
@@ -106,20 +98,18 @@ class LoyaltyManager(object):
         Returns:
             points (int): Loyalty points.
         """
-        time_watched = await self.bot.db.read(
-            'users', ['time_watched'], {'username': username}
-        )
-
-        user_data = api.get_user_data(self.bot.auth, username)
+        user_db_data = await self.bot.users.get_by_login(username)
+        if not user_db_data:
+            return 0
 
-        subscriber_info = api.get_subscribers(
-            self.bot.auth, user_id=user_data['id']
+        intervals = int(
+            user_db_data['time_watched'] // self.bot.presence.view_interval
         )
 
-        if subscriber_info:
-            points = time_watched * self.event_points['subscriber_view']
+        if await self.bot.presence.is_subscriber(username):
+            points = intervals * self.event_points['subscriber_view']
         else:
-            points = time_watched * self.event_points['view']
+            points = intervals * self.event_points['view']
 
         return points
 
@@ -0,0 +1,294 @@
+"""Presence tracking.
+
+Credits watch time and view loyalty points to everyone present in chat on
+every tick of its own task, and the time since the last tick to users who
+leave. Each tick costs a fixed number of set-based UPDATEs no matter how many
+people are watching, and subscriber status is read from a local roster that
+is refreshed periodically instead of per user.
+"""
+
+import asyncio
+import time
+
+import api
+import time_utils
+
+from chat.presence_index import get_presence
+from configs import config_utils
+from exceptions.exceptions import BotDBError
+from log import LOG
+
+# SQLite limits the number of bound parameters, so large audiences are
+# updated in chunks of this many users.
+CHUNK_SIZE = 500
+
+
+class PresenceTracker(object):
+    """Presence Tracker Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(PresenceTracker, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (PresenceTracker): Class instance.
+        """
+        self.bot = bot
+        self.db = bot.db
+
+        loyalty_config = await config_utils.load_config_file('loyalty')
+        self.event_points = loyalty_config['event_points']
+        # Time in minutes a user needs to be present to earn view points.
+        self.view_interval = loyalty_config.get('view_interval', 10)
+
+        # Time in minutes between subscriber roster refreshes.
+        self.roster_refresh = bot.twitch_config.get(
+            'subscriber_roster_refresh', 30
+        )
+        self.subscribers = set()
+        self.roster_time = None
+
+        # Time in seconds between presence ticks.
+        self.tick_interval = bot.twitch_config.get(
+            'presence_tick_interval', 60
+        )
+        # Time of the last tick in epoch milliseconds.
+        self.last_tick = time_utils.now_ms()
+        # Seconds not yet credited as watch time.
+        self.carry_seconds = 0
+        # Minutes not yet credited as view points.
+        self.carry_minutes = 0
+        # Settlement written but not committed yet.
+        self.pending_settle = None
+
+        return self
+
+    async def refresh_roster(self, force: bool = False) -> None:
+        """Refresh the local subscriber roster if it is out of date.
+
+        Args:
+            force (bool): Refresh even if the roster is still current.
+        """
+        now = time.monotonic()
+        if (
+            not force
+            and self.roster_time
+            and now - self.roster_time < self.roster_refresh * 60
+        ):
+            return
+
+        subscribers = await api.get_subscribers(self.bot.auth)
+        self.subscribers = {
+            s.get('user_login', '').lower() for s in subscribers or []
+        }
+        self.roster_time = now
+        LOG.debug(f'Subscriber roster refreshed: {len(self.subscribers)}')
+
+    async def is_subscriber(self, username: str) -> bool:
+        """Check the local roster for the subscriber status of a user.
+
+        Args:
+            username (str): Username.
+
+        Returns:
+            (bool): True if the user is a subscriber, otherwise False.
+        """
+        return username.lower() in self.subscribers
+
+    async def get_present_users(self) -> list:
+        """Get the users currently in chat, excluding the owner and bot.
+
+        Returns:
+            (list): List of usernames.
+        """
+        excluded = {self.bot.owner, self.bot.username}
+        return [u for u in get_presence() if u not in excluded]
+
+    async def _credit(
+        self, usernames: list, minutes: int, points: int
+    ) -> bool:
+        """Write watch time and loyalty points of a group of users.
+
+        Run it in a transaction, the cached rows are credited by the caller
+        once it is committed.
+
+        Args:
+            usernames (list): Usernames to credit.
+            minutes (int): Minutes of watch time to add.
+            points (int): Loyalty points to add.
+
+        Returns:
+            (bool): True if the users were credited, otherwise False.
+        """
+        for index in range(0, len(usernames), CHUNK_SIZE):
+            chunk = usernames[index : index + CHUNK_SIZE]
+            placeholders = ', '.join(['?'] * len(chunk))
+            result = await self.db.execute(
+                'UPDATE users SET time_watched = time_watched + ?, '
+                'loyalty_points = loyalty_points + ? '
+                f'WHERE username IN ({placeholders});',
+                [minutes, points] + chunk,
+                commit=False,
+            )
+            if result is None:
+                return False
+
+        return True
+
+    async def tick(self) -> None:
+        """Credit everyone present for the time since the last tick."""
+        usernames = await self.get_present_users()
+        if usernames:
+            await self.refresh_roster()
+
+        previous = (self.last_tick, self.carry_seconds, self.carry_minutes)
+
+        async def restore() -> None:
+            """Credit the time on the next tick instead."""
+            self.last_tick, self.carry_seconds, self.carry_minutes = previous
+
+        # The time is taken inside the transaction, so a settlement can't
+        # credit it as well.
+        try:
+            async with self.db.transaction():
+                self.db.on_rollback(restore)
+
+                now = time_utils.now_ms()
+                elapsed = (now - self.last_tick) / 1000 + self.carry_seconds
+                self.last_tick = now
+
+                minutes = int(elapsed // 60)
+                self.carry_seconds = elapsed - minutes * 60
+                if not minutes or not usernames:
+                    return
+
+                # View points are earned for every full interval present.
+                self.carry_minutes += minutes
+                intervals = int(self.carry_minutes // self.view_interval)
+                self.carry_minutes -= intervals * self.view_interval
+
+                subscribers = []
+                viewers = []
+                for username in usernames:
+                    if username.lower() in self.subscribers:
+                        subscribers.append(username)
+                    else:
+                        viewers.append(username)
+
+                credits = [
+                    (
+                        subscribers,
+                        self.event_points.get('subscriber_view', 0)
+                        * intervals,
+                    ),
+                    (viewers, self.event_points.get('view', 0) * intervals),
+                ]
+                for group, points in credits:
+                    if not await self._credit(group, minutes, points):
+                        raise BotDBError('Unable to credit the users in chat.')
+
+        except BotDBError as e:
+            LOG.error(
+                'Unable to run the presence tick: {}'.format(
+                    getattr(e, 'message', repr(e))
+                )
+            )
+            return
+
+        # Keep the cached rows in line with what was just committed.
+        for group, points in credits:
+            await self.bot.users.credit(
+                group, {'time_watched': minutes, 'loyalty_points': points}
+            )
+
+        LOG.debug(
+            f'Presence tick: {len(usernames)} users, {minutes} minutes, '
+            f'{intervals} intervals.'
+        )
+
+    async def part(self, username: str) -> None:
+        """Remove a user from chat, crediting the time since the last tick.
+
+        Partial view point intervals are dropped, like at the end of a
+        stream.
+
+        Args:
+            username (str): Username.
+        """
+        session = get_presence().part(username)
+        if session is None or username in {self.bot.owner, self.bot.username}:
+            return
+
+        now = time_utils.now_ms()
+        if session.joined_at > self.last_tick:
+            seconds = (now - session.joined_at) / 1000
+        else:
+            seconds = (now - self.last_tick) / 1000 + self.carry_seconds
+
+        minutes = int(seconds // 60)
+        if minutes:
+            await self.bot.users.increment(username, 'time_watched', minutes)
+
+    async def settle(self, usernames: list) -> bool:
+        """Credit the watch time since the last tick when the stream ends.
+
+        Run it in the caller's transaction, and call apply_settle once that
+        is committed. Until then the cached rows are left alone, and the
+        tick is put back if the settlement is rolled back.
+
+        Args:
+            usernames (list): Usernames present at the end of the stream.
+
+        Returns:
+            (bool): True if the users were credited, otherwise False.
+        """
+        now = time_utils.now_ms()
+        elapsed = (now - self.last_tick) / 1000 + self.carry_seconds
+        minutes = int(elapsed // 60)
+        self.pending_settle = None
+
+        if minutes and usernames:
+            if not await self._credit(usernames, minutes, 0):
+                return False
+
+        previous = (self.last_tick, self.carry_seconds, self.carry_minutes)
+
+        async def restore() -> None:
+            """Credit the time on the next tick instead."""
+            self.pending_settle = None
+            self.last_tick, self.carry_seconds, self.carry_minutes = previous
+
+        # Partial view point intervals are dropped and the tick starts over.
+        self.db.on_rollback(restore)
+        self.last_tick = now
+        self.carry_seconds = 0
+        self.carry_minutes = 0
+        self.pending_settle = (usernames, minutes)
+
+        return True
+
+    async def apply_settle(self) -> None:
+        """Apply a committed settlement to the cached rows."""
+        if self.pending_settle is None:
+            return
+
+        usernames, minutes = self.pending_settle
+        self.pending_settle = None
+
+        if minutes and usernames:
+            await self.bot.users.credit(
+                usernames, {'time_watched': minutes, 'loyalty_points': 0}
+            )
+
+    async def run(self) -> None:
+        """Asynchronous task for the presence ticks."""
+        LOG.debug('Running presence loop.')
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            await self.tick()
@@ -0,0 +1,229 @@
+"""Metrics.
+
+In-process counters and latency histograms, e.g. the timing of every SQL
+statement shape. They are kept in memory and read with snapshot(), which the
+console and the logs use.
+
+Recording only updates a few numbers and does no I/O, so it is synchronous
+and cheap enough to call on every statement.
+"""
+
+import bisect
+
+from typing import Optional
+
+# Upper bounds of the histogram buckets in milliseconds, the last bucket
+# holds everything slower.
+LATENCY_BUCKETS = (
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+)
+
+
+class Histogram(object):
+    """Fixed bucket histogram."""
+
+    def __init__(self, buckets: Optional[tuple] = LATENCY_BUCKETS) -> None:
+        """Init.
+
+        Args:
+            buckets (tuple, optional): Sorted upper bounds of the buckets.
+                Default is LATENCY_BUCKETS.
+        """
+        super(Histogram, self).__init__()
+
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a value.
+
+        Args:
+            value (float): Observed value.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> float:
+        """Estimate a percentile from the buckets.
+
+        Args:
+            percent (float): Percentile between 0 and 100.
+
+        Returns:
+            (float): Upper bound of the bucket holding the percentile,
+                or the maximum if it is in the last bucket.
+        """
+        if not self.count:
+            return 0.0
+
+        rank = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if index < len(self.buckets):
+                    return min(float(self.buckets[index]), self.max)
+                break
+
+        return self.max
+
+    def snapshot(self) -> dict:
+        """Get the current values.
+
+        Returns:
+            (dict): Count, total, mean, max, p50, p95 and p99.
+        """
+        return {
+            'count': self.count,
+            'total': round(self.total, 3),
+            'mean': round(self.total / self.count, 3) if self.count else 0.0,
+            'max': round(self.max, 3),
+            'p50': round(self.percentile(50), 3),
+            'p95': round(self.percentile(95), 3),
+            'p99': round(self.percentile(99), 3),
+        }
+
+
+class Metrics(object):
+    """Registry of named counters, gauges and histograms.
+
+    Every metric can be split by a label (e.g. a statement shape or a cache
+    namespace), stored as {name: {label: value}}.
+    """
+
+    def __init__(self) -> None:
+        """Init."""
+        super(Metrics, self).__init__()
+
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def incr(
+        self,
+        name: str,
+        label: Optional[str] = None,
+        amount: Optional[float] = 1,
+    ) -> None:
+        """Increment a counter.
+
+        Args:
+            name (str): Metric name.
+            label (str, optional): Label to split the metric by.
+            amount (float, optional): Amount to add. Default is 1.
+        """
+        counter = self.counters.setdefault(name, {})
+        counter[label] = counter.get(label, 0) + amount
+
+    def set(
+        self, name: str, value: float, label: Optional[str] = None
+    ) -> None:
+        """Set a gauge.
+
+        Args:
+            name (str): Metric name.
+            value (float): Current value.
+            label (str, optional): Label to split the metric by.
+        """
+        self.gauges.setdefault(name, {})[label] = value
+
+    def observe(
+        self, name: str, value: float, label: Optional[str] = None
+    ) -> None:
+        """Record a value in a histogram.
+
+        Args:
+            name (str): Metric name.
+            value (float): Observed value, in milliseconds for timings.
+            label (str, optional): Label to split the metric by.
+        """
+        histograms = self.histograms.setdefault(name, {})
+        histogram = histograms.get(label)
+        if histogram is None:
+            histogram = histograms[label] = Histogram()
+
+        histogram.observe(value)
+
+    def snapshot(self) -> dict:
+        """Get the current values of all the metrics.
+
+        Returns:
+            (dict): Metrics in the form:
+                {
+                    'counters': {name: {label: value}},
+                    'gauges': {name: {label: value}},
+                    'histograms': {name: {label: Histogram.snapshot()}},
+                }
+        """
+        return {
+            'counters': {
+                name: dict(values) for name, values in self.counters.items()
+            },
+            'gauges': {
+                name: dict(values) for name, values in self.gauges.items()
+            },
+            'histograms': {
+                name: {
+                    label: histogram.snapshot()
+                    for label, histogram in values.items()
+                }
+                for name, values in self.histograms.items()
+            },
+        }
+
+    def top(
+        self,
+        name: str,
+        key: Optional[str] = 'total',
+        limit: Optional[int] = 10,
+    ) -> list:
+        """Get the labels of a histogram with the highest values.
+
+        Args:
+            name (str): Histogram name.
+            key (str, optional): Value of the snapshot to sort by.
+                Default is 'total' (e.g. total time spent).
+            limit (int, optional): Number of labels. Default is 10.
+
+        Returns:
+            (list): Tuples of (label, snapshot), highest first.
+        """
+        snapshots = [
+            (label, histogram.snapshot())
+            for label, histogram in self.histograms.get(name, {}).items()
+        ]
+        snapshots.sort(key=lambda item: item[1][key], reverse=True)
+
+        return snapshots[:limit]
+
+    def reset(self, name: Optional[str] = None) -> None:
+        """Clear metrics.
+
+        Args:
+            name (str, optional): Metric to clear. Default is all of them.
+        """
+        for metrics in (self.counters, self.gauges, self.histograms):
+            if name is None:
+                metrics.clear()
+            else:
+                metrics.pop(name, None)
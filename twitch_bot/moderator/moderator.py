@@ -2,9 +2,10 @@
 
 from configs import config_utils
 
-from datetime import datetime
 from typing import Callable
 
+import time_utils
+
 from log import LOG
 
 URL_REGEX = r'[a-zA-Z0-9@:%_\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}'
@@ -82,9 +83,10 @@ class Moderator(object):
                 return True
 
         # Get the user data from the database.
-        user_db_data = await self.bot.db.read(
-            'users', queries={'user_id': user['id']}
-        )
+        user_db_data = await self.bot.users.get_by_id(user['id'])
+        if not user_db_data:
+            return False
+
         is_mod = user_db_data['is_mod']
         is_regular = user_db_data['is_regular']
 
@@ -123,7 +125,9 @@ class Moderator(object):
         # if it exists.
         if hasattr(plugin, 'GLOBAL_COOLDOWN'):
             cooldown = plugin.GLOBAL_COOLDOWN
-            db_data = await self.bot.db.read(table, columns=['last_run'])
+            db_data = await self.bot.plugin_state.items(plugin.__name__)
+            if not db_data.get('last_run'):
+                return True
 
         # Check for the 'USER_COOLDOWN' attribute and get its value
         # if it exists.
@@ -139,9 +143,9 @@ class Moderator(object):
 
         # Compare the current time to the last run time and see if it is
         # longer than the cooldown.
-        last_run = datetime.fromisoformat(db_data['last_run'])
-        elapsed = datetime.now() - last_run
-        if elapsed.seconds / 60 > cooldown:
+        last_run = time_utils.to_epoch_ms(db_data['last_run']) or 0
+        elapsed = (time_utils.now_ms() - last_run) / 60000
+        if elapsed > cooldown:
             return True
         else:
             return False
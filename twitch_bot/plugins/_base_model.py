@@ -8,10 +8,11 @@ class AbstractPluginModel(Model):
     """Abstract table model for all plugins."""
 
     id = fields.IntField(pk=True)
-    last_user_id = fields.ForeignKeyField(
-        'models.User', related_name='user_id'
-    )
-    last_run = fields.CharField(max_length=255, default='1970-01-01 00:00:00')
+    # Twitch user id of the user who last ran the plugin. It isn't a foreign
+    # key, since user ids are only unique together with the username.
+    last_user_id = fields.IntField(default=0)
+    # Epoch milliseconds.
+    last_run = fields.BigIntField(default=0)
 
     class Meta:
         abstract = True
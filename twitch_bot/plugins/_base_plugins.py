@@ -10,6 +10,10 @@ class BasePlugin(object):
     # (Do not include the '!')
     COMMAND = 'command_string'
 
+    # Read-only plugins with heavy queries can set this to run them on the
+    # analytics snapshot instead of the main database.
+    ANALYTICS = False
+
     def __init__(self):
         """Init."""
         super(BasePlugin, self).__init__()
@@ -42,7 +46,8 @@ class BasePlugin(object):
         self.command = command
         self.command_args = command_args
 
-        self.db = bot.db
+        self.db = bot.analytics if self.ANALYTICS else bot.db
+        self.state = bot.plugin_state.namespace(self.__class__.__name__)
         self.send_message = self.bot.connection.send_message
 
         return self
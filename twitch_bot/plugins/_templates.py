@@ -9,7 +9,8 @@ from tortoise import fields
 from plugins._base_model import AbstractPluginModel
 from plugins._base_plugins import BaseCommandPlugin
 
-# The CACHE is available for random data storage.
+# The CACHE is available for random data storage, use a namespace such as
+# CACHE.namespace('plugins/template').
 from init import CACHE
 
 
@@ -59,9 +60,27 @@ class TemplateCommandPlugin(BaseCommandPlugin):
     USER_TIMEOUT = 0
 
     # This will add a new row in the database setting the given fields to
-    # the given values. If not provided, no action is taken.
+    # the given values when the bot starts. Plugins without FIELDS reset
+    # these keys in their plugin state instead. If not provided, no action is
+    # taken.
     RESET = {'field1': 'value1', 'field2': 'value2'}
 
+    # This controls how many rows are kept in the plugin table.
+    # Accepted modes are 'rows' and 'days' (keep the last N of either),
+    # 'state' (keep a single row updated in place) and 'all'.
+    # If not provided, the retention policy from the bot config is used.
+    RETENTION = {'mode': 'rows', 'keep': 100}
+
+    # This runs self.db queries on a periodically refreshed read-only
+    # snapshot of the database, so heavy reads never hold up chat writes.
+    # Only use it for plugins that don't write through self.db.
+    ANALYTICS = False
+
     async def run(self):
         """Run function"""
         # Your code goes here.
+
+        # Values kept between runs (and restarts) go in the plugin state,
+        # which doesn't need a table, e.g.:
+        # count = await self.state.incr('count')
+        # await self.state.set('last_message', ' '.join(self.command_args))
@@ -2,9 +2,8 @@
 
 from log import LOG
 
-from datetime import datetime
-
 import api
+import time_utils
 import utils
 
 from plugins._base_plugins import BaseCommandPlugin
@@ -28,7 +27,7 @@ class AccountAgeCommand(BaseCommandPlugin):
             return -1
 
         created_at_dt = await utils.parse_datetime(created_at)
-        delta = datetime.now() - created_at_dt
+        delta = time_utils.local_now() - created_at_dt
         dt_string = await utils.display_from_seconds(delta.total_seconds())
 
         await self.send_message(f'Your account is {dt_string} old.')
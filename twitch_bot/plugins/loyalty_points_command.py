@@ -1,34 +1,9 @@
-"""Loyalty Points plugins."""
+"""Loyalty Points plugins.
 
-import api
+View points for everyone in chat are credited by the presence tick.
+"""
 
-from init import CACHE
-
-from plugins._base_plugins import BaseCommandPlugin, BaseIntervalPlugin
-
-
-class UpdateLoyalty(BaseIntervalPlugin):
-    """Update loyalty plugin.
-
-    Used to tell the streamer to save their work.
-    """
-
-    ALLOWED = ['bot']
-    COMMAND = 'update_loyalty'
-    INTERVAL = 10
-
-    async def run(self) -> None:
-        """Uptdate the amount of loyalty points for everyone in the chat."""
-        users_cache = await CACHE.get('users')
-        usernames = users_cache.data
-        subscribers = await api.get_subscribers(self.bot.auth)
-
-        for username in usernames:
-            event = 'subscriber_view' if username in subscribers else 'view'
-
-            await self.bot.loyalty_manager.add_loyalty_points_for_event(
-                username, event
-            )
+from plugins._base_plugins import BaseCommandPlugin
 
 
 class RedeemLoyalty(BaseCommandPlugin):
@@ -1,16 +1,6 @@
 """Pancake plugin."""
 
-from tortoise import fields
-
 from plugins._base_plugins import BaseCommandPlugin
-from plugins._base_model import AbstractPluginModel
-
-
-class PancakeModel(AbstractPluginModel):
-    stack = fields.IntField(default=0)
-
-    class Meta:
-        table = 'PancakeCommand'
 
 
 class PancakeCommand(BaseCommandPlugin):
@@ -26,30 +16,21 @@ class PancakeCommand(BaseCommandPlugin):
     """
 
     COMMAND = 'pancake'
-    FIELDS = {'stack': 'INT DEFAULT 0'}
     RESET = {'stack': 0}
     TIMEOUT = 5
 
-    async def run(self) -> dict:
+    async def run(self) -> None:
         """Pancake game."""
-        # If there is no data, the stack is created as a normal DB entry
-        if not self.last_row:
-            return {'stack': 1}
-
-        row_dict = dict(self.last_row)
-        current_stack = row_dict.get('stack')
-
-        if int(self.user.get('id')) == int(row_dict.get('last_user_id')):
+        last_user_id = await self.state.get('last_user_id')
+        if last_user_id and int(self.user.get('id')) == int(last_user_id):
             user_name = self.user.get('name')
             await self.send_message(
                 f'{user_name} cannot add to the stack until someone else does.'
             )
             return -1
 
-        new_stack = current_stack + 1
+        new_stack = await self.state.incr('stack')
         await self.send_message(
             f'PANCAKEBUNNY There are now {new_stack} pancakes on the stack! '
             'PANCAKEBUNNY'
         )
-
-        return {'stack': new_stack}
@@ -4,6 +4,9 @@ from typing import Optional
 from plugins._base_plugins import BaseCommandPlugin
 from init import CACHE
 
+# Holds the Queue while one is running.
+QUEUE = CACHE.namespace('plugins/queue')
+
 
 class Queue(object):
     """Queue storage object.
@@ -81,13 +84,13 @@ class QueueCommand(BaseCommandPlugin):
 
     async def run(self) -> None:
         """Queue command."""
-        if not await CACHE.exists('queue'):
-            await CACHE.add('queue', Queue(), overwrite=False)
+        if 'queue' not in QUEUE:
+            QUEUE.set('queue', Queue(), overwrite=False)
             await self.send_message('Queue has been created.')
             return
 
-        queue = await CACHE.get('queue').data
-        if not queue.is_open:
+        queue = QUEUE.get('queue')
+        if not await queue.is_open:
             await queue.reopen()
             await self.send_message('Queue has been reopened.')
             return
@@ -104,10 +107,10 @@ class ListQueueCommand(BaseCommandPlugin):
 
     async def run(self) -> None:
         """Queue command."""
-        if not await CACHE.exists('queue'):
+        if 'queue' not in QUEUE:
             return -1
 
-        members = ', '.join(await CACHE.get('queue').data.members)
+        members = ', '.join(QUEUE.get('queue').members)
         if not members:
             await self.send_message('Queue is empty.')
         else:
@@ -121,11 +124,11 @@ class JoinQueueCommand(BaseCommandPlugin):
 
     async def run(self) -> None:
         """Join queue command."""
-        if not await CACHE.exists('queue'):
+        if 'queue' not in QUEUE:
             return -1
 
-        queue = await CACHE.get('queue').data
-        if not queue.is_open:
+        queue = QUEUE.get('queue')
+        if not await queue.is_open:
             await self.send_message('Queue is closed.')
             return -1
 
@@ -150,10 +153,10 @@ class LeaveQueueCommand(BaseCommandPlugin):
 
     async def run(self) -> None:
         """Leave queue command."""
-        if not await CACHE.exists('queue'):
+        if 'queue' not in QUEUE:
             return -1
 
-        queue = await CACHE.get('queue').data
+        queue = QUEUE.get('queue')
         if self.user['name'] in queue.members:
             await queue.remove(self.user['name'])
             await self.send_message(
@@ -169,16 +172,18 @@ class NextQueueCommand(BaseCommandPlugin):
 
     async def run(self) -> None:
         """Next queue command."""
-        if not await CACHE.exists('queue'):
+        if 'queue' not in QUEUE:
             return -1
 
-        queue = await CACHE.get('queue').data
+        queue = QUEUE.get('queue')
         await queue.next()
-        if await queue.current:
-            await self.send_message('@{} is now up.'.format(queue.current))
+        current = await queue.current
+        if current:
+            await self.send_message('@{} is now up.'.format(current))
 
-        if await queue.next_up:
-            await self.send_message('@{} is next.'.format(queue.next_up))
+        next_up = await queue.next_up
+        if next_up:
+            await self.send_message('@{} is next.'.format(next_up))
 
 
 class CloseQueueCommand(BaseCommandPlugin):
@@ -189,11 +194,11 @@ class CloseQueueCommand(BaseCommandPlugin):
 
     async def run(self) -> None:
         """Close queue command."""
-        if not await CACHE.exists('queue'):
+        if 'queue' not in QUEUE:
             return -1
 
-        queue = await CACHE.get('queue').data
-        if not queue.is_open:
+        queue = QUEUE.get('queue')
+        if not await queue.is_open:
             await self.send_message('Queue is already closed.')
             return -1
 
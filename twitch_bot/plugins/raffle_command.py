@@ -5,6 +5,9 @@ from random import randint
 from init import CACHE
 from plugins._base_plugins import BaseCommandPlugin
 
+# Holds 'open' and the entered 'users' while a raffle is underway.
+RAFFLE = CACHE.namespace('plugins/raffle')
+
 
 class RaffleCommand(BaseCommandPlugin):
     """Raffle plugin."""
@@ -22,8 +25,9 @@ class RaffleCommand(BaseCommandPlugin):
             return -1
 
         if self.command_args[0] == 'start':
-            if not await CACHE.exists('raffle'):
-                await CACHE.add('raffle', data={'open': True, 'users': []})
+            if 'users' not in RAFFLE:
+                RAFFLE.set('open', True)
+                RAFFLE.set('users', [])
                 await self.send_message(
                     'The raffle has started. Use "!enter" to join.'
                 )
@@ -33,27 +37,29 @@ class RaffleCommand(BaseCommandPlugin):
                 await self.send_message('Raffle already underway.')
                 return -1
 
-        raffle = await CACHE.get('raffle')
+        if 'users' not in RAFFLE:
+            await self.send_message('There are no raffles at this time.')
+            return -1
 
         if self.command_args[0] == 'open':
-            raffle.data['open'] = True
+            RAFFLE.set('open', True)
             await self.send_message('Raffle is open for entries.')
             return
 
         if self.command_args[0] == 'close':
-            raffle.data['open'] = False
+            RAFFLE.set('open', False)
             await self.send_message('Raffle is closed.')
             return
 
         if self.command_args[0] == 'choose':
-            if raffle.data['open']:
+            if RAFFLE.get('open'):
                 await self.send_message(
                     'Raffle is still open. '
                     'Please close it before choosing a winner.'
                 )
                 return -1
 
-            users = raffle.data['users']
+            users = RAFFLE.get('users')
             if not users:
                 await self.send_message(
                     'The raffle has no entries, nobody wins.'
@@ -75,20 +81,18 @@ class EnterRaffleCommand(BaseCommandPlugin):
 
     async def run(self) -> None:
         """Enter an ongoing raffle."""
-        if not await CACHE.exists('raffle'):
+        if 'users' not in RAFFLE:
             await self.send_message('There are no raffles at this time.')
             return -1
 
-        raffle = await CACHE.get('raffle')
-
-        if raffle.data['open'] is False:
+        if RAFFLE.get('open') is False:
             await self.send_message(
                 'The raffle is closed to additional entries.'
             )
             return -1
 
         username = self.user['name']
-        users = raffle.data['users']
+        users = RAFFLE.get('users')
         if username not in users:
             users.append(username)
             await self.send_message(f'{username} has entered the raffle.')
@@ -107,18 +111,16 @@ class ExitRaffleCommand(BaseCommandPlugin):
 
     async def run(self) -> None:
         """Exit an ongoing raffle."""
-        if not await CACHE.exists('raffle'):
+        if 'users' not in RAFFLE:
             await self.send_message('There are no raffles at this time.')
             return -1
 
-        raffle = await CACHE.get('raffle')
-
-        if raffle.data['open'] is False:
+        if RAFFLE.get('open') is False:
             await self.send_message('The raffle is closed.')
             return -1
 
         username = self.user['name']
-        users = raffle.data['users']
+        users = RAFFLE.get('users')
         if username in users:
             users.remove(username)
             await self.send_message(f'{username} has exited the raffle.')
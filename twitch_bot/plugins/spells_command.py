@@ -3,6 +3,9 @@
 from init import CACHE
 from plugins._base_plugins import BaseCommandPlugin
 
+# Holds the potion being brewed as 'components' and the 'users' who added them.
+POTION = CACHE.namespace('plugins/powerpuff')
+
 
 class PowerpuffCommand(BaseCommandPlugin):
     """Powerpuff plugin."""
@@ -12,34 +15,36 @@ class PowerpuffCommand(BaseCommandPlugin):
 
     async def run(self) -> None:
         """Make the Powerpuff Girls."""
-        if not await CACHE.exists('powerpuff'):
-            await CACHE.add('powerpuff', data={'components': [], 'users': []})
+        if 'users' not in POTION:
+            POTION.set('components', [])
+            POTION.set('users', [])
 
-        potion = await CACHE.get('powerpuff')
-        if self.user['name'] in potion.data['users'] or not self.bot.owner:
+        components = POTION.get('components')
+        users = POTION.get('users')
+        if self.user['name'] in users or not self.bot.owner:
             await self.send_message('You already added a component.')
             return -1
 
         component = self.command_args[0]
-        if component in potion.data['components']:
+        if component in components:
             await self.send_message('That component has already been added.')
             return -1
 
-        potion.data['users'].append(self.user['name'])
-        potion.data['components'].append(component)
-        potion.data['users'].sort()
-        potion.data['components'].sort()
+        users.append(self.user['name'])
+        components.append(component)
+        users.sort()
+        components.sort()
 
         self.send_message(f'{component} has been added.')
 
         needed_components = ['chemical x', 'everything nice', 'spice', 'sugar']
         needed_components.sort()
 
-        if not potion.data['components'] == needed_components:
+        if not components == needed_components:
             return
 
         await self.send_message('Thus the Powerpuff Girls were born!')
-        potion.data = {'components': [], 'users': []}
+        POTION.clear()
 
 
 class MagicMissileCommand(BaseCommandPlugin):
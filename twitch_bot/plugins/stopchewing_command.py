@@ -7,6 +7,8 @@ class StopChewing(BaseCommandPlugin):
     """Count every time I tell the bun to stop chewing on the carpet."""
 
     COMMAND = 'chew'
+    # The counter is the number of rows, so never compact the table.
+    RETENTION = {'mode': 'all'}
 
     async def run(self) -> None:
         """Stop chewing counter.
@@ -1,45 +1,52 @@
 """Stream Stats plugin."""
 
-from datetime import datetime
+import time_utils
+import utils
 
-from tortoise import fields
+from plugins._base_plugins import BaseCommandPlugin
 
-import utils
 
-from plugins._base_model import AbstractPluginModel
-from plugins._base_plugins import BaseCommandPlugin, BaseIntervalPlugin
+class StatsCommand(BaseCommandPlugin):
+    """Stats plugin.
 
+    Answers from the viewer counts sampled in memory, so it never has to
+    wait on the API or the database.
+    """
 
-class QuoteModel(AbstractPluginModel):
-    date = fields.CharField(max_length=255, null=False)
-    time = fields.CharField(max_length=255, null=False)
-    viewer_count = fields.IntField(null=False)
+    COMMAND = 'stats'
 
-    class Meta:
-        table = 'viewer_count'
+    async def run(self) -> None:
+        """Send the viewer stats for the stream."""
+        summary = await self.bot.viewer_sampler.summary()
+        if not summary:
+            await self.send_message('No viewer stats yet.')
+            return -1
 
+        duration = await utils.display_from_seconds(
+            (time_utils.now_ms() - summary['since']) // 1000
+        )
+        await self.send_message(
+            f'Viewers: {summary["current"]} now, {summary["peak"]} peak, '
+            f'{summary["average"]:.0f} average over the last {duration}.'
+        )
 
-class ViewerCountCommand(BaseIntervalPlugin):
-    """Viewer count plugin."""
 
-    COMMAND = 'viewer_count'
-    ALLOWED = ['bot']
-    INTERVAL = 10
-    TABLE = 'viewer_count'
-    FIELDS = {
-        'date': 'TEXT NOT NULL',
-        'time': 'TEXT NOT NULL',
-        'viewer_count': 'INTEGER NOT NULL',
-    }
+class TrendsCommand(BaseCommandPlugin):
+    """Trends plugin.
 
-    async def run(self) -> dict:
-        """Count the number of viewers and save it to a database."""
-        now = datetime.now()
-        date = str(now.date())
-        time = f'{now.hour}:{now.minute}'
-        viewer_count = await utils.get_viewer_count(self.bot)
+    Compares the latest week of streams to the previous one.
+    """
+
+    COMMAND = 'trends'
+
+    async def run(self) -> None:
+        """Send the stream trends for the latest week."""
+        trends = await self.bot.trends.get_trends()
+        if not trends:
+            await self.send_message('No stream trends yet.')
+            return -1
 
-        return {'date': date, 'time': time, 'viewer_count': viewer_count}
+        await self.send_message(self.bot.trends.format_week(trends[0]))
 
 
 class GraphStatsCommand(BaseCommandPlugin):
@@ -49,6 +56,6 @@ class GraphStatsCommand(BaseCommandPlugin):
     ALLOWED = ['bot']
 
     async def run(self) -> None:
-        """Graph the viewer count over time and save the graph as an image."""
-        await utils.graph_stream_stats(self.bot)
-        await utils.generate_stats_markdown(self.bot)
+        """Graph the viewer count over time and save the stream recap."""
+        if not await self.bot.reports.generate():
+            return -1
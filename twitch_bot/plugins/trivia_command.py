@@ -9,6 +9,9 @@ import server_utils
 from init import CACHE
 from plugins._base_plugins import BaseCommandPlugin
 
+# Holds the 'correct_answer' of the open question.
+TRIVIA = CACHE.namespace('plugins/trivia')
+
 
 class TriviaCommand(BaseCommandPlugin):
     """Trivia plugin."""
@@ -28,7 +31,7 @@ class TriviaCommand(BaseCommandPlugin):
 
     async def generate_question(self) -> None:
         """Generate a question and cache the answer."""
-        if await CACHE.exists('trivia'):
+        if 'correct_answer' in TRIVIA:
             await self.send_message(
                 'Show the answer with "!trivia answer" before getting a new '
                 'question.'
@@ -53,7 +56,7 @@ class TriviaCommand(BaseCommandPlugin):
             unescape(i) for i in results.get('incorrect_answers')
         ]
 
-        await CACHE.add('trivia', {'correct_answer': correct_answer})
+        TRIVIA.set('correct_answer', correct_answer)
 
         answers = incorrect_answers
         answers.append(correct_answer)
@@ -69,13 +72,11 @@ class TriviaCommand(BaseCommandPlugin):
 
     async def show_answer(self) -> None:
         """Retrieve the answer from the cache and print it."""
-        trivia_cache = await CACHE.get('trivia')
-        if not trivia_cache:
+        correct_answer = TRIVIA.get('correct_answer')
+        if correct_answer is None:
             await self.send_message('No trivia running.')
             return -1
 
-        correct_answer = trivia_cache.data.get('correct_answer')
-
         await self.send_message(f'The correct answer is: {correct_answer}.')
 
-        await CACHE.delete('trivia')
+        TRIVIA.delete('correct_answer')
@@ -0,0 +1,327 @@
+"""Stream recap reports.
+
+Builds the end of stream recap (viewer graph and stats markdown) without
+blocking the event loop:
+
+1.  The viewer samples of the stream are loaded with a single query straight
+    into NumPy arrays and resampled to a fixed resolution.
+2.  The graph and markdown are rendered in a worker process, since
+    matplotlib is slow and not safe to use from multiple threads.
+
+Reports are cached by stream id together with a fingerprint of their data,
+so they are only rendered again when the data has changed.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+import numpy
+
+import time_utils
+
+from log import LOG
+
+REPORT_NAME = 'recap'
+
+REPORT_PATH = os.path.join(
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ),
+    'stream_stats',
+)
+
+
+def resample(
+    times: numpy.ndarray, counts: numpy.ndarray, resolution: int
+) -> tuple:
+    """Average samples into fixed width time bins.
+
+    Args:
+        times (numpy.ndarray): Sample times in seconds.
+        counts (numpy.ndarray): Viewer counts.
+        resolution (int): Bin width in seconds.
+
+    Returns:
+        (tuple): Bin start times and average counts, empty bins removed.
+    """
+    if not times.size:
+        return times, counts
+
+    bins = ((times - times[0]) // resolution).astype(numpy.int64)
+    totals = numpy.bincount(bins, weights=counts)
+    samples = numpy.bincount(bins)
+    filled = samples > 0
+
+    bin_times = times[0] + numpy.arange(totals.size) * resolution
+    return bin_times[filled], totals[filled] / samples[filled]
+
+
+def render_report(report: dict) -> dict:
+    """Render the graph and markdown of a report.
+
+    Runs in a worker process, so everything it needs is passed in.
+
+    Args:
+        report (dict): Report data in the form:
+            {
+                'stream_id': int,
+                'date': str,
+                'timezone': zoneinfo.ZoneInfo|None,
+                'path': str,
+                'stats': dict,
+                'times': numpy.ndarray,
+                'counts': numpy.ndarray,
+                'summary': dict,
+            }
+
+    Returns:
+        (dict): Paths of the rendered artifacts.
+    """
+    import matplotlib
+
+    matplotlib.use('Agg')
+    from matplotlib import pyplot
+
+    date = report['date']
+    # Several streams can start on the same day, keep them apart.
+    name = f'{date}_{report["stream_id"]}'
+    os.makedirs(report['path'], exist_ok=True)
+    graph_file = f'viewer_count_{name}.png'
+    graph_path = os.path.join(report['path'], graph_file)
+    doc_path = os.path.join(report['path'], f'stream_stats_{name}.md')
+
+    if report['times'].size:
+        font_dict = {
+            'family': 'sans-serif',
+            'color': 'black',
+            'weight': 'normal',
+            'size': 12,
+        }
+
+        # Plot the local times, the worker doesn't share the timezone set
+        # in the bot.
+        x_values = [
+            datetime.fromtimestamp(t, report['timezone']).replace(tzinfo=None)
+            for t in report['times']
+        ]
+
+        figure = pyplot.figure(figsize=(20, 6), tight_layout=True, dpi=100)
+        pyplot.plot(
+            x_values,
+            report['counts'],
+            color='purple',
+            linestyle='solid',
+            linewidth=1,
+        )
+        pyplot.title('Viewer Stats', fontdict=font_dict)
+        pyplot.xlabel('Time', fontdict=font_dict)
+        pyplot.ylabel('Viewer Count', fontdict=font_dict)
+        pyplot.xticks(rotation=45, horizontalalignment='center', alpha=0.7)
+        pyplot.grid(
+            color='black',
+            linestyle='--',
+            linewidth=0.5,
+            axis='both',
+            alpha=0.1,
+        )
+
+        pyplot.gca().spines['top'].set_alpha(0.0)
+        pyplot.gca().spines['bottom'].set_alpha(0.3)
+        pyplot.gca().spines['right'].set_alpha(0.0)
+        pyplot.gca().spines['left'].set_alpha(0.3)
+
+        pyplot.savefig(graph_path, dpi=100)
+        pyplot.close(figure)
+
+    doc = [f'# Stream Stats for {date} #']
+    doc.append('## Viewer Count ##')
+    if report['times'].size:
+        doc.append(f'![stats]({graph_file})')
+    for item, value in report['summary'].items():
+        doc.append(f'-   **{item}**: {value}')
+    doc.append('## Interactions ##')
+    for item in sorted(report['stats']):
+        if item in ['id', 'stream_end', 'stream_start']:
+            continue
+
+        doc.append(f'-   **{item}**: {report["stats"][item]}')
+
+    with open(doc_path, 'w') as out_file:
+        out_file.write('\n'.join(doc))
+
+    artifacts = {'markdown': doc_path}
+    # Only list the graph if it was drawn, the cache checks every path.
+    if report['times'].size:
+        artifacts['graph'] = graph_path
+
+    return artifacts
+
+
+class StreamReporter(object):
+    """Stream Reporter Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(StreamReporter, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (StreamReporter): Class instance.
+        """
+        self.db = bot.db
+        # The samples are read from the analytics snapshot.
+        self.analytics = bot.analytics
+
+        # Width in seconds of the points on the viewer graph.
+        self.resolution = bot.twitch_config.get('report_resolution', 60)
+
+        # Created on first use, so the worker only exists if reports are.
+        self.executor = None
+
+        return self
+
+    async def load_samples(self, start: int, end: int) -> tuple:
+        """Load the viewer samples of a time range into arrays.
+
+        Args:
+            start (int): Start of the range in epoch milliseconds.
+            end (int): End of the range in epoch milliseconds.
+
+        Returns:
+            (tuple): Sample times in epoch seconds and viewer counts.
+        """
+        rows = await self.analytics.execute(
+            'SELECT sample_time / 1000, viewer_count FROM viewer_stats '
+            'WHERE sample_time >= ? AND sample_time <= ? '
+            'ORDER BY sample_time;',
+            [start, end],
+            commit=False,
+        )
+
+        samples = numpy.array(
+            [tuple(row) for row in rows or []], dtype=numpy.int64
+        ).reshape(-1, 2)
+
+        return samples[:, 0], samples[:, 1].astype(float)
+
+    async def generate(self, stream_id: Optional[int] = None) -> dict:
+        """Generate the recap of a stream if its data changed.
+
+        Args:
+            stream_id (int, optional): Id of the stream_stats row.
+                Default is the latest stream.
+
+        Returns:
+            (dict): Paths of the report artifacts.
+        """
+        if stream_id:
+            rows = await self.db.execute(
+                'SELECT * FROM stream_stats WHERE id = ?;',
+                [stream_id],
+                commit=False,
+            )
+        else:
+            rows = await self.db.execute(
+                'SELECT * FROM stream_stats ORDER BY id DESC LIMIT 1;',
+                commit=False,
+            )
+        if not rows:
+            LOG.warning('No stream to report on.')
+            return {}
+
+        stats = dict(rows[0])
+        stream_id = stats['id']
+
+        times, counts = await self.load_samples(
+            stats['stream_start'], stats['stream_end']
+        )
+
+        fingerprint = hashlib.sha1(
+            json.dumps(stats, sort_keys=True).encode()
+            + times.tobytes()
+            + counts.tobytes()
+        ).hexdigest()
+
+        cached = await self.db.execute(
+            'SELECT fingerprint, artifacts FROM report_cache '
+            'WHERE stream_id = ? AND report = ?;',
+            [stream_id, REPORT_NAME],
+            commit=False,
+        )
+        if cached and cached[0]['fingerprint'] == fingerprint:
+            artifacts = json.loads(cached[0]['artifacts'])
+            if all(os.path.exists(p) for p in artifacts.values()):
+                LOG.debug(f'Stream {stream_id} recap is up to date.')
+                return artifacts
+
+        bin_times, bin_counts = resample(times, counts, self.resolution)
+        summary = {}
+        if counts.size:
+            summary = {
+                'peak_viewers': int(counts.max()),
+                'average_viewers': round(float(counts.mean()), 1),
+                'samples': int(counts.size),
+            }
+
+        report = {
+            'stream_id': stream_id,
+            'date': time_utils.local_date(stats['stream_start']),
+            'timezone': time_utils.TIMEZONE,
+            'path': REPORT_PATH,
+            'stats': stats,
+            'times': bin_times,
+            'counts': bin_counts,
+            'summary': summary,
+        }
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=1)
+
+        try:
+            artifacts = await asyncio.get_running_loop().run_in_executor(
+                self.executor, render_report, report
+            )
+
+        except Exception as e:
+            LOG.error(
+                'Unable to render the stream recap: {}'.format(
+                    getattr(e, 'message', repr(e))
+                )
+            )
+            return {}
+
+        await self.db.execute(
+            'INSERT INTO report_cache '
+            '(stream_id, report, fingerprint, artifacts, generated_at) '
+            'VALUES (?, ?, ?, ?, ?) ON CONFLICT (stream_id, report) DO UPDATE '
+            'SET fingerprint = excluded.fingerprint, '
+            'artifacts = excluded.artifacts, '
+            'generated_at = excluded.generated_at;',
+            [
+                stream_id,
+                REPORT_NAME,
+                fingerprint,
+                json.dumps(artifacts),
+                time_utils.now_ms(),
+            ],
+        )
+        LOG.info(f'Generated the recap for stream {stream_id}.')
+
+        return artifacts
+
+    async def close(self) -> None:
+        """Shut down the worker process."""
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
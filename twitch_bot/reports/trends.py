@@ -0,0 +1,249 @@
+"""Cross-stream trend reports.
+
+Compares the stream stats week over week: followers, messages and bits are
+totalled per week, while chatters and average viewers are averaged per
+stream so weeks with more streams don't look better by default.
+
+Everything is computed in a single SQL statement: the streams are found with
+a range scan on the stream start index, the average viewers of each stream
+come from the hourly viewer rollups, and the values of the previous week
+with streams are read with a LAG window. No table is ever loaded into Python.
+Weeks start on the local Monday, using the local_date() SQL function.
+
+The query runs on the analytics snapshot. Trends only change when a stream
+ends, so they are cached in report_cache under the latest stream and kept in
+memory for the command and console.
+"""
+
+import json
+
+from datetime import timedelta
+from typing import Optional
+
+import time_utils
+
+from log import LOG
+
+REPORT_NAME = 'trends'
+
+# Metrics in the order they are reported, with their display names.
+METRICS = {
+    'avg_viewers': 'avg viewers',
+    'chatters': 'chatters',
+    'followers': 'followers',
+    'messages': 'messages',
+    'bits': 'bits',
+}
+
+TRENDS_QUERY = '''
+WITH streams AS (
+    SELECT
+        date(local_date(s.stream_start), 'weekday 0', '-6 days') AS week,
+        s.chatters,
+        s.followers,
+        s.messages,
+        s.bits,
+        (
+            SELECT CAST(SUM(h.sum_count) AS REAL) / SUM(h.samples)
+            FROM viewer_stats_hourly h
+            WHERE h.bucket > s.stream_start - 3600000
+            AND h.bucket <= s.stream_end
+        ) AS avg_viewers
+    FROM stream_stats s
+    WHERE s.stream_start >= ?
+),
+weeks AS (
+    SELECT
+        week,
+        COUNT(*) AS streams,
+        AVG(avg_viewers) AS avg_viewers,
+        AVG(chatters) AS chatters,
+        SUM(followers) AS followers,
+        SUM(messages) AS messages,
+        SUM(bits) AS bits
+    FROM streams
+    GROUP BY week
+)
+SELECT
+    week,
+    streams,
+    avg_viewers,
+    LAG(avg_viewers) OVER previous AS prev_avg_viewers,
+    chatters,
+    LAG(chatters) OVER previous AS prev_chatters,
+    followers,
+    LAG(followers) OVER previous AS prev_followers,
+    messages,
+    LAG(messages) OVER previous AS prev_messages,
+    bits,
+    LAG(bits) OVER previous AS prev_bits
+FROM weeks
+WINDOW previous AS (ORDER BY week)
+ORDER BY week DESC
+LIMIT ?;
+'''
+
+
+def percent_change(
+    value: Optional[float], previous: Optional[float]
+) -> Optional[float]:
+    """Get the change between two values in percent.
+
+    Args:
+        value (float|None): New value.
+        previous (float|None): Old value.
+
+    Returns:
+        (float|None): Change in percent or None if it can't be computed.
+    """
+    if value is None or not previous:
+        return None
+
+    return round(100 * (value - previous) / previous, 1)
+
+
+class StreamTrends(object):
+    """Stream Trends Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(StreamTrends, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (StreamTrends): Class instance.
+        """
+        self.db = bot.db
+        # The trends are computed on the analytics snapshot.
+        self.analytics = bot.analytics
+
+        # Number of weeks covered by the report.
+        self.weeks = bot.twitch_config.get('trend_weeks', 12)
+
+        # Last computed trends, newest week first.
+        self.latest = []
+
+        return self
+
+    async def compute(self) -> list:
+        """Compute the weekly trends from the database.
+
+        Returns:
+            trends (list): List of dictionaries, newest week first, in the
+                form:
+                {'week': str, 'streams': int,
+                    <metric>: {'value': float, 'previous': float,
+                        'change': float}}
+        """
+        # Go one week further back, so the oldest week has a previous one.
+        start = time_utils.local_now() - timedelta(weeks=self.weeks + 1)
+        start -= timedelta(days=start.weekday())
+        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        rows = await self.analytics.execute(
+            TRENDS_QUERY,
+            [time_utils.to_epoch_ms(start), self.weeks],
+            commit=False,
+        )
+
+        trends = []
+        for row in rows or []:
+            week = {'week': row['week'], 'streams': row['streams']}
+            for metric in METRICS:
+                value, previous = row[metric], row[f'prev_{metric}']
+                week[metric] = {
+                    'value': value,
+                    'previous': previous,
+                    'change': percent_change(value, previous),
+                }
+
+            trends.append(week)
+
+        return trends
+
+    async def get_trends(self, refresh: Optional[bool] = False) -> list:
+        """Get the weekly trends, computing them only if a stream was added.
+
+        Args:
+            refresh (bool, optional): Ignore the cached trends.
+                Default is False.
+
+        Returns:
+            (list): Weekly trends, see compute().
+        """
+        # Read from the snapshot, so the trends are computed again once it
+        # includes a new stream.
+        latest = await self.analytics.execute(
+            'SELECT id, stream_end FROM stream_stats '
+            'ORDER BY id DESC LIMIT 1;',
+            commit=False,
+        )
+        if not latest:
+            return []
+
+        stream_id = latest[0]['id']
+        fingerprint = f'{latest[0]["stream_end"]}:{self.weeks}'
+
+        if not refresh:
+            cached = await self.db.execute(
+                'SELECT fingerprint, artifacts FROM report_cache '
+                'WHERE stream_id = ? AND report = ?;',
+                [stream_id, REPORT_NAME],
+                commit=False,
+            )
+            if cached and cached[0]['fingerprint'] == fingerprint:
+                self.latest = json.loads(cached[0]['artifacts'])
+                return self.latest
+
+        self.latest = await self.compute()
+        await self.db.execute(
+            'INSERT INTO report_cache '
+            '(stream_id, report, fingerprint, artifacts, generated_at) '
+            'VALUES (?, ?, ?, ?, ?) ON CONFLICT (stream_id, report) DO UPDATE '
+            'SET fingerprint = excluded.fingerprint, '
+            'artifacts = excluded.artifacts, '
+            'generated_at = excluded.generated_at;',
+            [
+                stream_id,
+                REPORT_NAME,
+                fingerprint,
+                json.dumps(self.latest),
+                time_utils.now_ms(),
+            ],
+        )
+        LOG.debug(f'Computed the stream trends after stream {stream_id}.')
+
+        return self.latest
+
+    @staticmethod
+    def format_week(week: dict) -> str:
+        """Format a week of trends as a single line.
+
+        Args:
+            week (dict): Week from get_trends().
+
+        Returns:
+            (str): Summary of the week.
+        """
+        parts = []
+        for metric, name in METRICS.items():
+            value = week[metric]['value']
+            if value is None:
+                continue
+
+            part = f'{name} {value:.0f}'
+            change = week[metric]['change']
+            if change is not None:
+                part += f' ({change:+.0f}%)'
+            parts.append(part)
+
+        streams = 'stream' if week['streams'] == 1 else 'streams'
+        return (
+            f'Week of {week["week"]}, {week["streams"]} {streams}: '
+            f'{", ".join(parts)}'
+        )
@@ -8,6 +8,7 @@ import ngrok
 
 from auth import Auth
 from bot import TwitchBot
+from cache_snapshot import CacheSnapshot
 from chat.chat_connection import ChatConnection
 from chat.chat_receiver import ChatReceiver
 from eventsub import eventsub_server
@@ -81,13 +82,9 @@ async def init() -> None:  # noqa
     # Get the arguments.
     args = get_args()
 
-    # Create a cache of user names in chat.
-    if not await CACHE.exists('users'):
-        await CACHE.add('users', data=[])
-
-    # Create a cache of chatters for stats.
-    if not await CACHE.exists('chatters'):
-        await CACHE.add('chatters', data=[])
+    # Restore the cache namespaces kept from the last run.
+    cache_snapshot = await CacheSnapshot().init()
+    await cache_snapshot.restore()
 
     # Create and initialize the authorization object.
     authorization = await Auth().init()
@@ -130,6 +127,7 @@ async def init() -> None:  # noqa
             ]
         )
 
+    ngrok_thread = flask_thread = None
     if not args.get('noeventsub', False):
         # Run the ngrok service.
         ngrok_process = await ngrok.Ngrok().init()
@@ -163,13 +161,53 @@ async def init() -> None:  # noqa
     # Add the cache cleaning task.
     tasks.append(asyncio.create_task(CACHE.clean_task()))
 
+    # Add the cache snapshot task.
+    tasks.append(asyncio.create_task(cache_snapshot.run()))
+
+    # Add the plugin table compaction task.
+    tasks.append(asyncio.create_task(bot.retention.run()))
+
+    # Add the raw viewer stats expiry task.
+    tasks.append(asyncio.create_task(bot.rollups.run()))
+
+    # Add the scheduled database backup task.
+    tasks.append(asyncio.create_task(bot.backups.run()))
+
+    # Add the analytics snapshot refresh task.
+    if bot.analytics is not bot.db:
+        tasks.append(asyncio.create_task(bot.analytics.run()))
+
+    # Add the presence tick task, crediting the users in chat.
+    tasks.append(asyncio.create_task(bot.presence.run()))
+
+    # Add the user data flushing task.
+    tasks.append(asyncio.create_task(bot.users.run()))
+
+    # Add the stream stats counters flushing task.
+    tasks.append(asyncio.create_task(bot.counters.run()))
+
+    # Add the plugin state flushing task.
+    tasks.append(asyncio.create_task(bot.plugin_state.run()))
+
+    # Ctrl-C cancels this task instead of raising KeyboardInterrupt here,
+    # so the shutdown also runs when the tasks are cancelled or fail.
     try:
         await asyncio.gather(*tasks)
 
-    except KeyboardInterrupt:
+    finally:
         await end_tasks(tasks)
-        ngrok_thread.stop()
-        flask_thread.stop()
+        await cache_snapshot.save()
+        await bot.users.flush()
+        await bot.counters.flush()
+        await bot.plugin_state.flush()
+        await bot.viewer_sampler.stop()
+        await bot.reports.close()
+        if bot.analytics is not bot.db:
+            await bot.analytics.close()
+        if ngrok_thread:
+            ngrok_thread.stop()
+        if flask_thread:
+            flask_thread.stop()
 
 
 if __name__ == "__main__":
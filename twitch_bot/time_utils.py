@@ -0,0 +1,179 @@
+"""Time Utils.
+
+Timestamps are stored in the database as INTEGER milliseconds since the
+epoch, so they compare and range scan as plain numbers and never need to be
+parsed on read.
+
+Local times are only needed for display and for grouping by day or week.
+They use the timezone set with 'timezone' in the bot config (an IANA name,
+e.g. 'America/Vancouver'), or the system timezone if it is not set, so
+daylight saving time is handled by zoneinfo instead of a fixed offset.
+
+These helpers are synchronous, since none of them do any I/O, and are also
+registered as SQL functions on the database connections.
+"""
+
+import re
+import time
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from log import LOG
+
+# Timezone of the local times, None is the system timezone.
+TIMEZONE = None
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Covers str(datetime), '%Y-%m-%d %H:%M:%S', dates and the Twitch format
+# (e.g. '2021-06-08T18:45:39.123456789Z').
+TIMESTAMP_RE = re.compile(
+    r'^(?P<date>\d{4}-\d{2}-\d{2})'
+    r'(?:[T ](?P<time>\d{2}:\d{2}(?::\d{2})?)(?:\.(?P<fraction>\d+))?)?'
+    r'\s*(?P<zone>Z|[+-]\d{2}:?\d{2})?$'
+)
+
+
+def set_timezone(name: Optional[str] = None) -> None:
+    """Set the timezone used for local times.
+
+    Args:
+        name (str, optional): IANA timezone name.
+            Default is the system timezone.
+    """
+    global TIMEZONE
+
+    if not name:
+        TIMEZONE = None
+        return
+
+    try:
+        TIMEZONE = ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        LOG.error(f'Unknown timezone {name}, using the system timezone.')
+        TIMEZONE = None
+
+
+def now_ms() -> int:
+    """Get the current time.
+
+    Returns:
+        (int): Milliseconds since the epoch.
+    """
+    return time.time_ns() // 1000000
+
+
+def local_now() -> datetime:
+    """Get the current local time.
+
+    Returns:
+        (datetime): Naive datetime in the local timezone.
+    """
+    return datetime.now(TIMEZONE).replace(tzinfo=None)
+
+
+def to_epoch_ms(value: Any) -> Optional[int]:
+    """Convert a timestamp to milliseconds since the epoch.
+
+    Naive datetimes and text timestamps without a timezone are local times.
+    Numbers are assumed to already be in milliseconds.
+
+    Args:
+        value (datetime|int|str): Timestamp.
+
+    Returns:
+        (int|None): Milliseconds since the epoch or None if not parsable.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    if not isinstance(value, datetime):
+        value = str(value).strip()
+        if value.lstrip('-').isdigit():
+            return int(value)
+
+        try:
+            # Fast path for the formats it reads, e.g. '%Y-%m-%d %H:%M:%S'.
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            value = _parse_timestamp(value)
+            if value is None:
+                return None
+
+    if value.tzinfo is None and TIMEZONE is not None:
+        value = value.replace(tzinfo=TIMEZONE)
+
+    # timestamp() reads naive datetimes in the system timezone.
+    seconds = int(value.replace(microsecond=0).timestamp())
+    return seconds * 1000 + value.microsecond // 1000
+
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    """Parse the timestamps datetime.fromisoformat() does not read.
+
+    Args:
+        value (str): Timestamp.
+
+    Returns:
+        (datetime|None): The timestamp or None if not parsable.
+    """
+    match = TIMESTAMP_RE.match(value)
+    if not match:
+        return None
+
+    try:
+        value = datetime.fromisoformat(
+            f'{match.group("date")} {match.group("time") or "00:00"}'
+        )
+    except ValueError:
+        return None
+
+    fraction = match.group('fraction')
+    if fraction:
+        value = value.replace(microsecond=int(fraction[:6].ljust(6, '0')))
+
+    zone = match.group('zone')
+    if zone == 'Z':
+        value = value.replace(tzinfo=timezone.utc)
+    elif zone:
+        offset = timedelta(hours=int(zone[1:3]), minutes=int(zone[-2:])) * (
+            -1 if zone[0] == '-' else 1
+        )
+        value = value.replace(tzinfo=timezone(offset))
+
+    return value
+
+
+def from_epoch_ms(timestamp: int) -> datetime:
+    """Convert milliseconds since the epoch to a local time.
+
+    Args:
+        timestamp (int): Milliseconds since the epoch.
+
+    Returns:
+        (datetime): Naive datetime in the local timezone.
+    """
+    timestamp = int(timestamp)
+    return datetime.fromtimestamp(timestamp // 1000, TIMEZONE).replace(
+        microsecond=timestamp % 1000 * 1000, tzinfo=None
+    )
+
+
+def local_date(timestamp: Optional[int]) -> Optional[str]:
+    """Get the local date of a timestamp.
+
+    Args:
+        timestamp (int|None): Milliseconds since the epoch.
+
+    Returns:
+        (str|None): Date as 'YYYY-MM-DD' or None if there is no timestamp.
+    """
+    if timestamp is None:
+        return None
+
+    return from_epoch_ms(timestamp).strftime('%Y-%m-%d')
@@ -2,6 +2,8 @@
 
 from datetime import datetime
 
+import time_utils
+
 from events import Event
 from log import LOG
 
@@ -32,6 +34,7 @@ class TimerEvent(Event):
             bot (Bot): Bot instance.
         """
         LOG.debug(f'A timer event was received: {self}.')
+
         interval_plugins = bot.plugins.get('interval', {})
         user = {'name': 'bot', 'id': 0}
 
@@ -55,23 +58,13 @@ class TimerEvent(Event):
             if silent and plugin_name not in bypass_silence_list:
                 continue
 
-            last_row = await bot.db.get_last_row(plugin_name)
-            if not last_row:
+            row_dict = await bot.plugin_state.items(plugin_name)
+            if not row_dict.get('last_run'):
                 await bot._run_plugin(plugin, self, user, '', '')
                 continue
 
-            row_dict = dict(last_row)
-            try:
-                last_run = datetime.strptime(
-                    row_dict.get('last_run'), '%Y-%m-%d %H:%M:%S'
-                )
-            except ValueError:
-                last_run = datetime.strptime(
-                    row_dict.get('last_run'), '%Y-%m-%d %H:%M:%S.%f'
-                )
-
-            delta = datetime.now() - last_run
-            delta_minutes = int(delta.seconds / 60)
+            delta = time_utils.now_ms() - row_dict['last_run']
+            delta_minutes = delta // 60000
             LOG.debug(f'delta_minutes: {delta_minutes}')
 
             if delta_minutes > plugin.INTERVAL:
@@ -1,15 +1,10 @@
 """Utilities."""
 
-import math
-import os
-import traceback
-
-from datetime import datetime, timedelta
-from matplotlib import pyplot
+from datetime import datetime
 
 import api
+import time_utils
 
-from configs import config_utils
 from log import LOG
 
 
@@ -22,39 +17,16 @@ async def parse_datetime(datetime_string: str) -> datetime:
         datetime_string (str): Datetime string.
 
     Returns:
-        datetime.datetime: Datetime in an object.
+        datetime.datetime: Naive datetime in the local timezone.
     """
-    config = await config_utils.load_config_file('bot_config')
-    datetime_string = datetime_string.rstrip('Z')
-
-    # Determine the format.
-    if ' ' in datetime_string:
-        datetime_format = '%Y-%m-%d %H:%M:%S'
-    else:
-        datetime_format = "%Y-%m-%dT%H:%M:%S"
-
-    try:
-        # The split is done to ignore milliseconds if present.
-        parsed_dt = datetime.strptime(
-            datetime_string.split('.')[0], datetime_format
-        )
-
-        # Times are given in GMT so offset the timezone by the offset.
-        timezone_offset = timedelta(hours=config.get('timezone_offset', 0))
-        dt = parsed_dt + timezone_offset
-
-    except (ValueError, IndexError):
+    timestamp = time_utils.to_epoch_ms(datetime_string)
+    if timestamp is None:
         LOG.error(
             f'datetime_string is in an unknown format {datetime_string}.'
         )
-        dt = datetime.now()
-
-    except Exception:
-        LOG.error(f'An unknown problem occured parsing {datetime_string}.')
-        traceback.print_exc()
-        dt = datetime.now()
+        return time_utils.local_now()
 
-    return dt
+    return time_utils.from_epoch_ms(timestamp)
 
 
 async def get_viewer_count(bot: object) -> int:
@@ -66,6 +38,11 @@ async def get_viewer_count(bot: object) -> int:
     Returns:
         (int): Current viewer count.
     """
+    # Use the latest sample while the stream is being sampled.
+    viewer_count = await bot.viewer_sampler.current()
+    if viewer_count is not None:
+        return viewer_count
+
     data = await api.get_stream_data(bot.auth, bot.broadcaster_id)
     if not data:
         return 0
@@ -91,7 +68,7 @@ async def get_follow_age(user_id: str, bot: object) -> str:
 
     LOG.debug(follow_data)
 
-    now = datetime.now()
+    now = time_utils.local_now()
     followed_at = await parse_datetime(follow_data.get('followed_at'))
     seconds = (now - followed_at).total_seconds()
 
@@ -152,7 +129,7 @@ async def get_uptime(bot: object) -> str:
         return 0
 
     started_at = await parse_datetime(started_at_string)
-    now = datetime.now()
+    now = time_utils.local_now()
     delta = now - started_at
     seconds = int(delta.total_seconds())
 
@@ -170,121 +147,11 @@ async def get_watch_time(bot: object, user: dict) -> str:
     Returns:
         (str): How long the user has been watching the stream.
     """
-    user_db_data = dict(
-        await bot.db.read(table='users', queries={'username': user['name']})
-    )
+    user_db_data = await bot.users.get_by_login(user['name'])
+    if not user_db_data:
+        return await display_from_seconds(0)
 
-    join_time = datetime.fromisoformat(user_db_data['last_join_time'])
-    now = datetime.now()
-    delta = now - join_time
-    seconds = int(delta.total_seconds())
+    join_time = user_db_data['last_join_time'] or time_utils.now_ms()
+    seconds = (time_utils.now_ms() - join_time) // 1000
 
     return await display_from_seconds(seconds)
-
-
-async def graph_stream_stats(bot: object) -> None:
-    """Graph the stream stats.
-
-    Args:
-        bot (TwitchBot): The bot instance.
-    """
-    stats_last_row = dict(await bot.db.get_last_row('stream_stats'))
-    stream_start = datetime.fromisoformat(stats_last_row.get('stream_start'))
-    stream_end = datetime.fromisoformat(stats_last_row.get('stream_end'))
-
-    data = await bot.db.read_range(
-        'viewer_count',
-        ranges=[
-            {
-                'key': 'date',
-                'start': str(stream_start.date()),
-                'end': str(stream_end.date()),
-            }
-        ],
-    )
-
-    x_values = []
-    y_values = []
-    count = 1
-    for row in data:
-        row_data = dict(row)
-        x_values.append(str(datetime.fromisoformat(row_data.get('last_run'))))
-        y_values.append(int(row_data.get('viewer_count')))
-        count += 1
-
-    # if not values['time'] or not values['viewer_count']:
-    if not x_values or not y_values:
-        LOG.warning('No data to graph.')
-        return
-
-    font_dict = {
-        'family': 'sans-serif',
-        'color': 'black',
-        'weight': 'normal',
-        'size': 12,
-    }
-
-    graph_path = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-        'stream_stats',
-    )
-
-    pyplot.figure(figsize=(20, 6), tight_layout=True, dpi=100)
-    pyplot.plot(
-        x_values, y_values, color='purple', linestyle='solid', linewidth=1
-    )
-    pyplot.title('Viewer Stats', fontdict=font_dict)
-    pyplot.xlabel('Time', fontdict=font_dict)
-    pyplot.ylabel('Viewer Count', fontdict=font_dict)
-    pyplot.xticks(rotation=45, horizontalalignment='center', alpha=0.7)
-    pyplot.yticks(
-        range(math.floor(min(y_values)), math.ceil(max(y_values)) + 1)
-    )
-    pyplot.grid(
-        color='black', linestyle='--', linewidth=0.5, axis='both', alpha=0.1
-    )
-
-    pyplot.gca().spines['top'].set_alpha(0.0)
-    pyplot.gca().spines['bottom'].set_alpha(0.3)
-    pyplot.gca().spines['right'].set_alpha(0.0)
-    pyplot.gca().spines['left'].set_alpha(0.3)
-
-    pyplot.savefig(
-        os.path.join(
-            graph_path, 'viewer_count_{}.png'.format(stream_start.date())
-        ),
-        dpi=100,
-    )
-
-    LOG.debug(x_values)
-    LOG.debug(y_values)
-
-
-async def generate_stats_markdown(bot: object) -> None:
-    """Generate a markdown document with the stream stats.
-
-    Args:
-        bot (TwitchBot): The bot instance.
-    """
-    stats_last_row = dict(await bot.db.get_last_row('stream_stats'))
-    stream_start = stats_last_row.get('stream_start')
-    stream_date = stream_start.split(' ')[0]
-
-    doc = [f'# Stream Stats for {stream_date} #']
-    doc.append('## Viewer Count ##')
-    doc.append(f'![stats](viewer_count_{stream_date}.png)')
-    doc.append('## Interactions ##')
-    for item in sorted(stats_last_row):
-        if item in ['id', 'stream_end', 'stream_start']:
-            continue
-
-        doc.append(f'-   **{item}**: {stats_last_row[item]}')
-
-    doc_path = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-        'stream_stats',
-        f'stream_stats_{stream_date}.md',
-    )
-
-    with open(doc_path, 'w') as out_file:
-        out_file.write('\n'.join(doc))
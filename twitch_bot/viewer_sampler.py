@@ -0,0 +1,199 @@
+"""Viewer count sampling.
+
+Samples the viewer count while the stream is live. Recent samples are kept
+in memory so viewer stats can be answered without an API call, and samples
+are written to the database in batches every few minutes instead of one row
+at a time. The samples are only served while sampling runs, so a stopped
+sampler never answers with the count of an earlier stream.
+"""
+
+import asyncio
+import collections
+
+from datetime import datetime
+from typing import Optional
+
+import api
+import time_utils
+
+from log import LOG
+
+
+class ViewerSampler(object):
+    """Viewer Sampler Class."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super(ViewerSampler, self).__init__()
+
+    async def init(self, bot: object) -> object:
+        """Async init.
+
+        Args:
+            bot (TwitchBot): Twitch bot instance.
+
+        Returns:
+            self (ViewerSampler): Class instance.
+        """
+        self.bot = bot
+
+        config = bot.twitch_config
+
+        # Time in seconds between samples.
+        self.interval = config.get('viewer_sample_interval', 60)
+        # Time in seconds between writes to the database.
+        self.flush_interval = config.get('viewer_flush_interval', 300)
+        # Number of recent samples kept in memory per channel.
+        self.buffer_size = config.get('viewer_buffer_size', 240)
+
+        # Channels (user ids) to sample. Only the bot's own channel is
+        # written to the database, the others are only kept in memory.
+        self.channels = [str(bot.broadcaster_id)] + [
+            str(c) for c in config.get('viewer_sample_channels') or []
+        ]
+        self.buffers = {
+            channel: collections.deque(maxlen=self.buffer_size)
+            for channel in self.channels
+        }
+
+        # Samples of the bot's channel waiting to be written.
+        self.pending = []
+        self.last_flush = datetime.now()
+
+        self.task = None
+
+        return self
+
+    async def sample(self) -> None:
+        """Sample the viewer count of all the channels with one request."""
+        try:
+            streams = await api.fetch_stream_data(self.bot.auth, self.channels)
+
+        except Exception as e:
+            LOG.error(
+                'Unable to sample the viewer count: {}'.format(
+                    getattr(e, 'message', repr(e))
+                )
+            )
+            return
+
+        # Whole seconds in epoch milliseconds.
+        now = time_utils.now_ms() // 1000 * 1000
+        counts = {
+            str(stream.get('user_id')): int(stream.get('viewer_count', 0))
+            for stream in streams
+        }
+
+        for channel, buffer in self.buffers.items():
+            # Offline channels are not included in the response.
+            if channel not in counts:
+                continue
+
+            buffer.append((now, counts[channel]))
+
+        broadcaster = str(self.bot.broadcaster_id)
+        if broadcaster in counts:
+            self.pending.append((now, counts[broadcaster]))
+
+    async def flush(self) -> None:
+        """Write the pending samples to the database."""
+        self.last_flush = datetime.now()
+        if not self.pending:
+            return
+
+        pending, self.pending = self.pending, []
+        if not await self.bot.rollups.add_samples(pending):
+            # Keep the samples for the next attempt.
+            self.pending = pending + self.pending
+            return
+
+        LOG.debug(f'Wrote {len(pending)} viewer count samples.')
+
+    def sampling(self) -> bool:
+        """Check if the sampling task is running.
+
+        Returns:
+            (bool): True if sampling, otherwise False.
+        """
+        return bool(self.task and not self.task.done())
+
+    async def current(self, channel: Optional[str] = None) -> Optional[int]:
+        """Get the latest sampled viewer count.
+
+        Args:
+            channel (str, optional): Channel user id.
+                Default is the bot's channel.
+
+        Returns:
+            (int|None): Viewer count or None if there are no samples or
+                sampling is stopped.
+        """
+        buffer = self.buffers.get(str(channel or self.bot.broadcaster_id))
+        if not buffer or not self.sampling():
+            return None
+
+        return buffer[-1][1]
+
+    async def summary(self, channel: Optional[str] = None) -> dict:
+        """Summarize the samples in memory.
+
+        Args:
+            channel (str, optional): Channel user id.
+                Default is the bot's channel.
+
+        Returns:
+            (dict): Dictionary in the form:
+                {'current': int, 'peak': int, 'low': int, 'average': float,
+                    'since': int (epoch ms)}
+                Empty if there are no samples or sampling is stopped.
+        """
+        buffer = self.buffers.get(str(channel or self.bot.broadcaster_id))
+        if not buffer or not self.sampling():
+            return {}
+
+        counts = [count for _, count in buffer]
+        return {
+            'current': counts[-1],
+            'peak': max(counts),
+            'low': min(counts),
+            'average': sum(counts) / len(counts),
+            'since': buffer[0][0],
+        }
+
+    async def start(self) -> None:
+        """Start sampling."""
+        if self.sampling():
+            return
+
+        for buffer in self.buffers.values():
+            buffer.clear()
+
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop sampling and write out the remaining samples.
+
+        The samples in memory are dropped, they belong to the stream that
+        ended.
+        """
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+        for buffer in self.buffers.values():
+            buffer.clear()
+
+        await self.flush()
+
+    async def run(self) -> None:
+        """Asynchronous task for sampling the viewer count."""
+        LOG.debug('Running viewer sampler loop.')
+        while True:
+            await self.sample()
+
+            if (
+                datetime.now() - self.last_flush
+            ).total_seconds() >= self.flush_interval:
+                await self.flush()
+
+            await asyncio.sleep(self.interval)